@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+Measure how long recording a sample and running every whole-fleet calculation of a
+:class:`warthog.history.StatsHistory` takes each tick, with NumPy (when installed) and
+without it.
+
+The history is filled with ``--samples`` samples of the active connections of
+``--servers`` servers before each tick is timed. The median of ``--ticks`` ticks is
+reported.
+
+Usage:
+
+    $ python bench/history.py [--servers N] [--samples N] [--ticks N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import warthog.client
+import warthog.core
+import warthog.history
+
+
+def sample(rand, servers):
+    """Get the stats of every server, as returned by get_node_stats."""
+    return dict((server, warthog.client.NodeStats(
+        server, warthog.core.STATUS_ENABLED, {'curr-conn': rand.randint(0, 500)}))
+                for server in servers)
+
+
+def tick(history, groups):
+    """Run every calculation once."""
+    history.rates(window=60.0)
+    history.ewma()
+    history.percentiles()
+    history.time_to_zero(window=60.0)
+    history.group_totals(groups)
+
+
+def median_ms(timings):
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warthog stats history benchmark')
+    parser.add_argument('--servers', type=int, default=10000, help='Servers per sample')
+    parser.add_argument('--samples', type=int, default=60, help='Samples kept')
+    parser.add_argument('--ticks', type=int, default=10, help='Ticks to time')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    opts = parser.parse_args()
+
+    rand = random.Random(opts.seed)
+    servers = ['app{0:06d}.example.com'.format(i) for i in range(opts.servers)]
+    groups = dict(('group{0}'.format(i), servers[i::50]) for i in range(50))
+    samples = [sample(rand, servers) for _ in range(opts.samples + opts.ticks)]
+
+    backends = [False] + ([True] if warthog.history.numpy is not None else [])
+    print('{0} servers, {1} samples kept, median of {2} ticks'.format(
+        opts.servers, opts.samples, opts.ticks))
+    print('{0:<8} {1:>12} {2:>12}'.format('backend', 'record (ms)', 'analyze (ms)'))
+
+    for use_numpy in backends:
+        history = warthog.history.StatsHistory(capacity=opts.samples, use_numpy=use_numpy)
+        for i, nodes in enumerate(samples[:opts.samples]):
+            history.record(nodes, timestamp=float(i))
+
+        record, analyze = [], []
+        for i, nodes in enumerate(samples[opts.samples:]):
+            start = time.time()
+            history.record(nodes, timestamp=float(opts.samples + i))
+            record.append(time.time() - start)
+
+            start = time.time()
+            tick(history, groups)
+            analyze.append(time.time() - start)
+
+        print('{0:<8} {1:>12.1f} {2:>12.1f}'.format(
+            'numpy' if use_numpy else 'python', median_ms(record), median_ms(analyze)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
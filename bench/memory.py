@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+Compare the memory used to hold the status and statistics of every server as the
+dictionaries returned by the bulk status and stats commands (what
+:meth:`warthog.client.WarthogClient.get_node_stats` keeps) against a compact
+:class:`warthog.core.FleetSnapshot`.
+
+Statistics are generated to look like what the load balancer returns for each server:
+a dozen integer counters under the same keys. Memory is measured with ``tracemalloc``
+(Python 3.4+) as the size of everything still allocated once each representation is
+built and the input it was built from is released.
+
+Usage:
+
+    $ python bench/memory.py [--servers N [N ...]]
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import warthog.client
+import warthog.core
+
+COUNTERS = [
+    'curr-conn', 'total-conn', 'fwd-pkt', 'rev-pkt', 'peak-conn', 'total_req',
+    'total_req_succ', 'curr_SSL_conn', 'total_SSL_conn', 'total_fwd_bytes',
+    'total_rev_bytes', 'response_time',
+]
+
+STATUSES = [warthog.core.STATUS_ENABLED] * 8 + [
+    warthog.core.STATUS_DISABLED, warthog.core.STATUS_DOWN]
+
+
+def payloads(rand, size):
+    """Get the bulk status and stats responses for a fleet as JSON text, the way they
+    arrive from the load balancer, so that nothing is shared between representations.
+    """
+    servers = ['app{0:06d}.example.com'.format(i) for i in range(size)]
+    statuses = dict((server, rand.choice(STATUSES)) for server in servers)
+    stats = dict((server, dict((counter, rand.randint(0, 2 ** 40)) for counter in COUNTERS))
+                 for server in servers)
+    return json.dumps(statuses), json.dumps(stats)
+
+
+def as_dicts(statuses, stats):
+    """Build what get_node_stats returns: a NodeStats with a dictionary per server."""
+    return dict((server, warthog.client.NodeStats(server, status, stats.get(server, {})))
+                for server, status in statuses.items())
+
+
+def as_snapshot(statuses, stats):
+    """Build a compact snapshot from the same responses."""
+    return warthog.core.FleetSnapshot(statuses, stats)
+
+
+def measure(build, status_text, stats_text):
+    """Get the bytes still allocated after building a representation from parsed
+    responses and releasing everything but the result.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    result = build(json.loads(status_text), json.loads(stats_text))
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warthog snapshot memory benchmark')
+    parser.add_argument('--servers', type=int, nargs='+', default=[10000, 100000],
+                        help='Fleet sizes to measure')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    opts = parser.parse_args()
+
+    print('{0:>8} {1:>12} {2:>12} {3:>11} {4:>12} {5:>8}'.format(
+        'servers', 'dicts (MB)', 'compact (MB)', 'dicts B/srv', 'compact B/srv', 'ratio'))
+
+    for size in opts.servers:
+        status_text, stats_text = payloads(random.Random(opts.seed), size)
+        dicts = measure(as_dicts, status_text, stats_text)
+        compact = measure(as_snapshot, status_text, stats_text)
+
+        print('{0:>8} {1:>12.1f} {2:>12.1f} {3:>11} {4:>12} {5:>7.1f}x'.format(
+            size, dicts / 1e6, compact / 1e6, dicts // size, compact // size,
+            float(dicts) / compact))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
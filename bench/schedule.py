@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+Simulate rolling deployments to compare the total rollout time of each
+:class:`warthog.client.DrainScheduler` strategy against deploying in list order.
+
+Each simulated server has a number of active connections that varies over time
+(most servers are lightly loaded, a few hold many long-lived connections). The time
+a server takes to drain is proportional to its connections when it is disabled and
+is followed by a fixed deploy time. Two rollout styles are simulated:
+
+* ``window``: a new server starts as soon as any other finishes, the way
+  :class:`warthog.rolling.RollingDeployment` works.
+* ``batch``: servers are deployed in fixed batches and each batch waits for the
+  slowest server in it, the way most hand written rolling loops work.
+
+Usage:
+
+    $ python bench/schedule.py [--servers N] [--max-unavailable N] [--trials N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+import warthog.client
+import warthog.core
+
+# Seconds to drain each active connection and to deploy to a server once drained
+SECONDS_PER_CONNECTION = 0.5
+
+DEPLOY_SECONDS = 30.0
+
+
+class SimulatedFleet(object):
+    """Servers with active connections that change over time and a client-like
+    interface for getting all of them with one "bulk" call.
+    """
+
+    def __init__(self, rand, size):
+        self.now = 0.0
+        self.servers = ['app{0:04d}.example.com'.format(i) for i in range(size)]
+        self._base = {}
+        self._phase = {}
+        for server in self.servers:
+            heavy = rand.random() < 0.1
+            self._base[server] = rand.lognormvariate(5.0 if heavy else 2.0, 0.5)
+            self._phase[server] = rand.uniform(0, 2 * math.pi)
+
+    def connections(self, server, when=None):
+        when = self.now if when is None else when
+        swing = 1 + 0.3 * math.sin(when / 120.0 + self._phase[server])
+        return int(self._base[server] * swing)
+
+    def duration(self, server, when):
+        return self.connections(server, when) * SECONDS_PER_CONNECTION + DEPLOY_SECONDS
+
+    # pylint: disable=missing-docstring
+    def get_node_states(self):
+        return dict((server, warthog.client.NodeState(
+            server, warthog.core.STATUS_ENABLED, self.connections(server)))
+                    for server in self.servers)
+
+
+def simulate_window(fleet, strategy, limit):
+    """Start a new server as soon as a slot is free, return the total time."""
+    scheduler = warthog.client.DrainScheduler(
+        fleet, fleet.servers, strategy=strategy, max_age=5.0, clock=lambda: fleet.now)
+    running = []
+
+    while scheduler or running:
+        for server in scheduler.next_batch(limit - len(running)):
+            heapq.heappush(running, fleet.now + fleet.duration(server, fleet.now))
+        fleet.now = heapq.heappop(running)
+
+    return fleet.now
+
+
+def simulate_batch(fleet, strategy, limit):
+    """Deploy fixed size batches, each waiting for its slowest server, return the total time."""
+    scheduler = warthog.client.DrainScheduler(
+        fleet, fleet.servers, strategy=strategy, max_age=5.0, clock=lambda: fleet.now)
+
+    while scheduler:
+        batch = scheduler.next_batch(limit)
+        fleet.now += max(fleet.duration(server, fleet.now) for server in batch)
+
+    return fleet.now
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warthog rolling schedule simulation')
+    parser.add_argument('--servers', type=int, default=200, help='Servers per rollout')
+    parser.add_argument('--max-unavailable', type=int, default=10, help='Servers at once')
+    parser.add_argument('--trials', type=int, default=20, help='Rollouts per strategy')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    opts = parser.parse_args()
+
+    print('{0} servers, {1} at once, {2} trials, mean total rollout time'.format(
+        opts.servers, opts.max_unavailable, opts.trials))
+    print('{0:<8} {1:<14} {2:>12} {3:>10}'.format('style', 'schedule', 'seconds', 'vs order'))
+
+    for style, simulate in (('window', simulate_window), ('batch', simulate_batch)):
+        baseline = None
+        for strategy in warthog.client.SCHEDULES:
+            total = 0.0
+            for trial in range(opts.trials):
+                fleet = SimulatedFleet(random.Random(opts.seed + trial), opts.servers)
+                total += simulate(fleet, strategy, opts.max_unavailable)
+
+            mean = total / opts.trials
+            baseline = mean if baseline is None else baseline
+            print('{0:<8} {1:<14} {2:>12.1f} {3:>+9.1f}%'.format(
+                style, strategy, mean, (mean - baseline) / baseline * 100))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+Measure the startup cost of the ``warthog`` CLI entry point for various commands.
+
+Each command is run several times in a fresh interpreter with ``python -X importtime``
+(Python 3.7+). The total import time of the ``warthog.cli`` module tree and the median
+wall-clock time of the whole process are compared against a fixed budget and the
+script exits with a non-zero status if any command is over budget.
+
+Usage:
+
+    $ python bench/startup.py [--runs N] [--scale FACTOR]
+
+The ``--scale`` option multiplies every budget, for running on slow machines.
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Command line arguments to run and the budget (in milliseconds) for the
+# import time of warthog.cli and the wall-clock time of the process. Commands
+# that don't talk to the load balancer should never load the HTTP stack.
+BUDGETS = [
+    (['--version'], 40, 150),
+    (['--help'], 40, 150),
+    (['config-path'], 40, 150),
+    (['default-config'], 40, 150),
+    (['status', '--help'], 40, 150),
+]
+
+# Modules that must not be imported for any of the commands above.
+FORBIDDEN_MODULES = ['requests', 'urllib3', 'warthog.transport']
+
+_RUNNER = (
+    "import sys; sys.argv = ['warthog'] + sys.argv[1:]; "
+    "import warthog.cli; warthog.cli.main()"
+)
+
+
+def _parse_import_times(stderr):
+    """Return a mapping of module name to cumulative import time in microseconds."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, rest = line.partition(':')
+        _, cumulative, name = [part.strip() for part in rest.split('|')]
+        times[name] = int(cumulative)
+    return times
+
+
+def measure(args, runs):
+    """Run the CLI with the given arguments several times and return the
+    import time of warthog.cli (ms), median wall-clock time (ms), and the set
+    of forbidden modules that were imported.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    walls = []
+    imports = []
+    loaded = set()
+
+    for _ in range(runs):
+        start = time.time()
+        proc = subprocess.Popen(
+            [sys.executable, '-X', 'importtime', '-c', _RUNNER] + args,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env,
+            universal_newlines=True)
+        _, stderr = proc.communicate()
+        walls.append((time.time() - start) * 1000)
+
+        times = _parse_import_times(stderr)
+        imports.append(times.get('warthog.cli', 0) / 1000.0)
+        loaded.update(mod for mod in FORBIDDEN_MODULES if mod in times)
+
+    walls.sort()
+    imports.sort()
+    return imports[len(imports) // 2], walls[len(walls) // 2], loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warthog CLI startup benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per command')
+    parser.add_argument('--scale', type=float, default=1.0, help='Budget multiplier')
+    opts = parser.parse_args()
+
+    failed = False
+    print('{0:<20} {1:>12} {2:>12}  {3}'.format('command', 'import ms', 'wall ms', 'result'))
+
+    for args, import_budget, wall_budget in BUDGETS:
+        import_ms, wall_ms, loaded = measure(args, opts.runs)
+        problems = []
+        if import_ms > import_budget * opts.scale:
+            problems.append('import > {0}ms'.format(import_budget * opts.scale))
+        if wall_ms > wall_budget * opts.scale:
+            problems.append('wall > {0}ms'.format(wall_budget * opts.scale))
+        if loaded:
+            problems.append('loaded ' + ', '.join(sorted(loaded)))
+
+        failed = failed or bool(problems)
+        print('{0:<20} {1:>12.1f} {2:>12.1f}  {3}'.format(
+            ' '.join(args), import_ms, wall_ms, '; '.join(problems) or 'ok'))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -40,6 +40,14 @@ def coverage():
         local("coverage report  --omit 'warthog/packages*' --show-missing")
 
 
+@task
+def bench():
+    local('python bench/startup.py')
+    local('python bench/schedule.py')
+    local('python bench/memory.py')
+    local('python bench/history.py')
+
+
 @task
 def push():
     local('git push origin')
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import stat
+import threading
+
+import mock
+import pytest
+
+import warthog.agent
+import warthog.client
+import warthog.exceptions
+
+
+@pytest.fixture
+def client():
+    return mock.Mock(spec=warthog.client.WarthogClient)
+
+
+@pytest.fixture
+def server(tmpdir, client):
+    path = str(tmpdir.join('agent.sock'))
+    agent_server = warthog.agent.AgentServer(socket_path=path, client_factory=lambda _: client)
+    thread = threading.Thread(target=agent_server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield agent_server
+
+    agent_server.shutdown()
+    agent_server.server_close()
+
+
+def test_error_round_trip():
+    err = warthog.exceptions.WarthogNoSuchNodeError(
+        'No such node', api_msg='Object does not exist', api_code=1023460352,
+        server='app1.example.com')
+    copy = warthog.agent.error_from_dict(warthog.agent.error_to_dict(err))
+
+    assert isinstance(copy, warthog.exceptions.WarthogNoSuchNodeError)
+    assert 'app1.example.com' == copy.server, 'Did not get expected server'
+    assert 1023460352 == copy.api_code, 'Did not get expected API code'
+
+
+def test_error_unknown_type():
+    err = warthog.agent.error_from_dict({'type': 'ConnectionError', 'msg': 'Oh no'})
+
+    assert isinstance(err, warthog.exceptions.WarthogAgentError)
+
+
+class TestAgent(object):
+    def test_is_running(self, server):
+        agent = warthog.agent.AgentClient(socket_path=server.socket_path)
+        assert agent.is_running(), 'Expected agent to be running'
+
+    def test_not_running(self, tmpdir):
+        agent = warthog.agent.AgentClient(socket_path=str(tmpdir.join('missing.sock')))
+        assert not agent.is_running(), 'Expected agent to not be running'
+
+    def test_get_status(self, server, client):
+        client.get_status.return_value = 'enabled'
+        agent = warthog.agent.AgentClient(socket_path=server.socket_path)
+
+        assert 'enabled' == agent.get_status('app1.example.com'), 'Did not get expected status'
+        client.get_status.assert_called_once_with('app1.example.com')
+
+    def test_disable_server_error(self, server, client):
+        client.disable_server.side_effect = warthog.exceptions.WarthogNoSuchNodeError(
+            'No such node', server='app1.example.com')
+        agent = warthog.agent.AgentClient(socket_path=server.socket_path)
+
+        with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError):
+            agent.disable_server('app1.example.com')
+
+    def test_unsupported_method(self, server):
+        agent = warthog.agent.AgentClient(socket_path=server.socket_path)
+
+        with pytest.raises(warthog.exceptions.WarthogAgentError):
+            # pylint: disable=protected-access
+            agent._request('close')
+
+    def test_client_per_config(self, tmpdir):
+        configs = []
+        path = str(tmpdir.join('agent.sock'))
+        agent_server = warthog.agent.AgentServer(
+            socket_path=path, client_factory=lambda c: configs.append(c) or mock.Mock())
+
+        agent_server.get_client('/etc/a.ini')
+        agent_server.get_client('/etc/a.ini')
+        agent_server.get_client('/etc/b.ini')
+        agent_server.server_close()
+
+        assert ['/etc/a.ini', '/etc/b.ini'] == configs, 'Expected one client per config'
+
+    def test_socket_private(self, server):
+        assert 0o600 == stat.S_IMODE(os.stat(server.socket_path).st_mode), \
+            'Expected socket mode 0600'
+
+    def test_refuses_running_agent(self, server):
+        with pytest.raises(warthog.exceptions.WarthogAgentError):
+            warthog.agent.AgentServer(socket_path=server.socket_path, client_factory=mock.Mock())
+
+        agent = warthog.agent.AgentClient(socket_path=server.socket_path)
+        assert agent.is_running(), 'Expected running agent to be left alone'
+
+    def test_replaces_stale_socket(self, tmpdir):
+        path = str(tmpdir.join('agent.sock'))
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        agent_server = warthog.agent.AgentServer(socket_path=path, client_factory=mock.Mock())
+        agent_server.server_close()
+
+    def test_default_client_factory_token_cache(self, tmpdir):
+        cache = mock.Mock()
+        path = str(tmpdir.join('agent.sock'))
+        with mock.patch('warthog.agent._default_client_factory') as factory:
+            agent_server = warthog.agent.AgentServer(socket_path=path, token_cache=cache)
+            agent_server.get_client('/etc/a.ini')
+            agent_server.server_close()
+
+        factory.assert_called_once_with('/etc/a.ini', token_cache=cache)
@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import io
+import json
+import subprocess
+import sys
+
 from click.testing import CliRunner
 
+import mock
 import pytest
 import click
 import requests
 
 import warthog.cli
+import warthog.client
 import warthog.exceptions
 
 
@@ -68,3 +75,484 @@ def test_error_wrapper_connection_error():
     with pytest.raises(click.ClickException):
         my_test_func('something')
 
+
+def test_logout_skips_running_agent(tmpdir):
+    import threading
+    import warthog.agent
+
+    agent_client = mock.Mock(spec=warthog.client.WarthogClient)
+    path = str(tmpdir.join('agent.sock'))
+    server = warthog.agent.AgentServer(socket_path=path, client_factory=lambda _: agent_client)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        with mock.patch('warthog.config.WarthogConfigLoader'), \
+                mock.patch('warthog.client.WarthogClient') as client_cls:
+            runner = CliRunner()
+            result = runner.invoke(warthog.cli.main, args=['--agent-socket', path, 'logout'])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 0 == result.exit_code, result.output
+    assert client_cls.return_value.logout.called, 'Expected logout with a direct client'
+    assert client_cls.call_args[1]['token_cache'] is not None, 'Expected the token cache'
+    assert not agent_client.method_calls, 'Expected the agent not to be used'
+
+
+def test_get_client_running_agent():
+    with mock.patch('warthog.agent.AgentClient') as agent_cls:
+        agent_cls.return_value.is_running.return_value = True
+        client = warthog.cli.get_client(None, agent_socket='/tmp/agent.sock')
+
+    agent_cls.assert_called_once_with(socket_path='/tmp/agent.sock', config=None)
+    assert isinstance(client, warthog.cli.WarthogClientFacade), 'Expected wrapped agent client'
+
+
+@pytest.mark.parametrize('args', [['--version'], ['config-path'], ['default-config']])
+def test_main_does_not_load_transport(args):
+    script = (
+        "import sys; sys.argv = ['warthog'] + sys.argv[1:]\n"
+        "import warthog.cli\n"
+        "try:\n"
+        "    warthog.cli.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "sys.stderr.write(str('requests' in sys.modules))\n")
+    proc = subprocess.Popen(
+        [sys.executable, '-c', script] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+
+    assert err.strip().endswith(b'False'), 'Expected requests to not be imported'
+
+
+def test_get_servers_from_file():
+    servers = warthog.cli.get_servers(
+        ['app1.example.com'], ['app2.example.com\n', '\n', '# comment\n', ' app3.example.com '])
+
+    assert ['app1.example.com', 'app2.example.com', 'app3.example.com'] == servers
+
+
+def test_get_servers_none():
+    with pytest.raises(click.UsageError):
+        warthog.cli.get_servers([], None)
+
+
+def test_status_multiple_servers():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_status.side_effect = lambda server: 'enabled'
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client) as get_client:
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['status', '-j', '2', 'app1.example.com', 'app2.example.com'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    assert 'app1.example.com: enabled' in result.output
+    assert 'app2.example.com: enabled' in result.output
+    get_client.assert_called_once_with(mock.ANY, shared_session=True)
+    assert client.close.called, 'Expected client to be closed'
+
+
+def test_disable_multiple_servers_failure():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.side_effect = lambda server: server == 'app1.example.com'
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['disable', 'app1.example.com', 'app2.example.com'])
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any server fails'
+    assert 'app2.example.com could not be disabled' in result.output
+    assert '1 of 2 servers failed' in result.output
+
+
+def test_status_ndjson_output():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_status.return_value = 'enabled'
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client) as get_client:
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['--output', 'ndjson', 'status', 'app1.example.com'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert 1 == len(records)
+    assert 'app1.example.com' == records[0]['server']
+    assert 'enabled' == records[0]['status']
+    assert records[0]['ok']
+    get_client.assert_called_once_with(mock.ANY, shared_session=False)
+
+
+def test_connections_json_output_error_code():
+    def get_connections(server):
+        if server == 'app2.example.com':
+            raise warthog.cli.error_wrapper(_raise_api_error)()
+        return 4
+
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_connections.side_effect = get_connections
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main,
+            args=['--output', 'json', 'connections', 'app1.example.com', 'app2.example.com'])
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any server fails'
+    records = dict((r['server'], r) for r in json.loads(result.output))
+    assert 4 == records['app1.example.com']['connections']
+    assert not records['app2.example.com']['ok']
+    assert 1023 == records['app2.example.com']['error_code']
+    assert 'WarthogNoSuchNodeError' == records['app2.example.com']['error_type']
+
+
+def _raise_api_error():
+    raise warthog.exceptions.WarthogNoSuchNodeError(
+        'No such server!', api_code=1023, server='app2.example.com')
+
+
+def test_record_writer_json_empty():
+    out = io.StringIO()
+    writer = warthog.cli.RecordWriter(warthog.cli.OUTPUT_JSON, stream=out)
+    writer.close()
+
+    assert '[]\n' == out.getvalue()
+
+
+def _node_states(*states):
+    return dict((s[0], warthog.client.NodeState(*s)) for s in states)
+
+
+def test_watch_changes():
+    previous = _node_states(('app1', 'enabled', 3), ('app2', 'enabled', 0))
+    rows = warthog.cli.watch_rows(_node_states(('app1', 'enabled', 3), ('app3', 'down', 0)))
+
+    changes = list(warthog.cli.watch_changes(previous, rows))
+
+    assert [
+        {'server': 'app3', 'status': 'down', 'connections': 0},
+        {'server': 'app2', 'status': None, 'connections': None},
+    ] == changes
+    assert warthog.client.NodeState('missing', None, None) == \
+        warthog.cli.watch_rows({}, ['missing'])[0]
+
+
+def test_watch_ndjson_change_feed():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_node_states.side_effect = [
+        _node_states(('app1', 'enabled', 3), ('app2', 'enabled', 1)),
+        _node_states(('app1', 'enabled', 3), ('app2', 'disabled', 0)),
+    ]
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main,
+            args=['--output', 'ndjson', 'watch', '--all', '--interval', '0', '--count', '2'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert ['app1', 'app2', 'app2'] == [r['server'] for r in records]
+    assert 'disabled' == records[2]['status']
+    assert client.close.called, 'Expected client to be closed'
+
+
+def test_watch_table():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_node_states.return_value = _node_states(('app1', 'enabled', 3))
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['watch', 'app1', 'app9', '--count', '1'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    assert 'app1    enabled              3' in result.output
+    assert 'app9    unknown              -' in result.output
+
+
+def test_watch_servers_and_all():
+    runner = CliRunner()
+    result = runner.invoke(warthog.cli.main, args=['watch', '--all', 'app1'])
+    assert 0 != result.exit_code, 'Expected non-zero exit code'
+
+
+def test_parse_batch_line():
+    assert warthog.cli.parse_batch_line('  # just a comment') is None
+    assert ('wait-drained', ['app1.example.com', '60']) == \
+        warthog.cli.parse_batch_line('wait-drained app1.example.com 60  # drain it')
+
+
+@pytest.mark.parametrize('line', ['restart app1', 'disable', 'wait-drained app1 soon'])
+def test_parse_batch_line_invalid(line):
+    with pytest.raises(ValueError):
+        warthog.cli.parse_batch_line(line)
+
+
+def test_batch():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.return_value = True
+    client.get_connections.side_effect = [3, 0]
+    client.get_status.side_effect = click.BadParameter("app2 doesn't appear to be a known node")
+    client.enable_server.return_value = True
+    script = '\n'.join([
+        'disable app1',
+        'wait-drained app1 60',
+        'status app2',
+        'enable app1',
+    ])
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client) as get_client:
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['batch', '--interval', '0'], input=script)
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any command fails'
+    assert 'disable app1: disabled' in result.output
+    assert 'wait-drained app1: drained' in result.output
+    assert 'status app2: error:' in result.output
+    assert 'enable app1: enabled' in result.output
+    get_client.assert_called_once_with(mock.ANY, shared_session=True)
+
+
+def test_batch_ndjson_output():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.return_value = True
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['--output', 'ndjson', 'batch'], input='disable app1\nbogus\n')
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any command fails'
+    first, second = [json.loads(line) for line in result.output.splitlines()]
+    assert 'disable' == first['command']
+    assert 'app1' == first['server']
+    assert 'disabled' == first['result']
+    assert not second['ok']
+    assert 2 == second['line']
+
+
+def test_batch_other_errors_fail_single_command():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.side_effect = [
+        warthog.exceptions.WarthogPermissionError('Not allowed', api_code=419545856),
+        requests.Timeout('Read timed out'),
+        KeyError('oper'),
+        True,
+    ]
+    script = 'disable app1\ndisable app2\ndisable app3\ndisable app4\n'
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['--output', 'ndjson', 'batch'], input=script)
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any command fails'
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [False, False, False, True] == [r['ok'] for r in records]
+    assert 'WarthogPermissionError' == records[0]['error_type']
+    assert 419545856 == records[0]['error_code']
+    assert 'Timeout' == records[1]['error_type']
+    assert client.close.called
+
+
+def test_batch_other_errors_stop_on_error():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.side_effect = [True, warthog.exceptions.WarthogApiError('Bad gateway')]
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['batch', '--stop-on-error'],
+            input='disable app1\ndisable app2\ndisable app3\n')
+
+    assert 1 == result.exit_code, 'Expected exit code 1 when any command fails'
+    assert 'disable app2: error: Bad gateway' in result.output
+    assert 2 == client.disable_server.call_count
+
+
+def _node_stats():
+    return {
+        'app2': warthog.client.NodeStats('app2', 'disabled', {'curr-conn': 0, 'total-conn': 7}),
+        'app1': warthog.client.NodeStats('app1', 'enabled', {'curr-conn': 4, 'total-conn': 9}),
+    }
+
+
+def test_snapshot_ndjson_gzip(tmpdir):
+    import gzip
+
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_node_stats.return_value = _node_stats()
+    out = str(tmpdir.join('snap.ndjson.gz'))
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=['snapshot', '--out', out])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    with gzip.open(out, 'rb') as handle:
+        records = [json.loads(line.decode('utf-8')) for line in handle]
+    assert ['app1', 'app2'] == [r['server'] for r in records]
+    assert 'disabled' == records[1]['status']
+    assert 4 == records[0]['stats']['curr-conn']
+
+
+def test_snapshot_csv(tmpdir):
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_node_stats.return_value = _node_stats()
+    out = tmpdir.join('snap.csv')
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=['snapshot', '--out', str(out)])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    assert [
+        'server,status,curr-conn,total-conn',
+        'app1,enabled,4,9',
+        'app2,disabled,0,7',
+    ] == out.read().splitlines()
+
+
+def test_snapshot_csv_gzip_round_trip(tmpdir):
+    nodes = _node_stats()
+    nodes[u'app3-\u00e9'] = warthog.client.NodeStats(u'app3-\u00e9', 'enabled', {'curr-conn': 1})
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.get_node_stats.return_value = nodes
+    out = str(tmpdir.join('snap.csv.gz'))
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=['snapshot', '--out', out])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    snapshot = warthog.cli.read_snapshot(out)
+    assert [u'app1', u'app2', u'app3-\u00e9'] == sorted(snapshot)
+    assert {'curr-conn': 1} == snapshot[u'app3-\u00e9'].stats
+
+
+def test_diff_snapshots(tmpdir):
+    before = tmpdir.join('before.csv')
+    before.write('server,status,curr-conn\napp1,enabled,4\napp2,enabled,0\n')
+    after = tmpdir.join('after.ndjson')
+    after.write('{"server": "app1", "status": "disabled", "stats": {"curr-conn": 5}}\n')
+
+    runner = CliRunner()
+    result = runner.invoke(warthog.cli.main, args=[
+        '--output', 'ndjson', 'diff', str(before), str(after), '--threshold', '2'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    assert [
+        {'server': 'app1', 'change': 'status', 'previous': 'enabled', 'current': 'disabled'},
+        {'server': 'app2', 'change': 'removed', 'previous': 'enabled', 'current': None},
+    ] == [json.loads(line) for line in result.output.splitlines()]
+
+
+def test_parse_max_unavailable():
+    assert 3 == warthog.cli.parse_max_unavailable('3')
+    assert 0.25 == warthog.cli.parse_max_unavailable('25%')
+    assert 0.5 == warthog.cli.parse_max_unavailable('0.5')
+    assert 1.0 == warthog.cli.parse_max_unavailable('100%')
+    assert isinstance(warthog.cli.parse_max_unavailable('1.0'), float)
+
+    for value in ('lots', '150%', '1.5', '0%', '0'):
+        with pytest.raises(click.BadParameter):
+            warthog.cli.parse_max_unavailable(value)
+
+
+def test_rolling():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.return_value = True
+    client.get_connections.return_value = 0
+    client.enable_server.return_value = True
+    client.get_status.return_value = 'enabled'
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main,
+            args=['rolling', '--hook', 'true', '--max-unavailable', '50%', '--pipeline',
+                  'app1', 'app2'])
+
+    assert 0 == result.exit_code, 'Expected zero exit code'
+    assert 'app1: ok disable=' in result.output
+    assert '2 of 2 servers deployed' in result.output
+    assert '2 groups started' in result.output
+    assert client.close.called, 'Expected client to be closed'
+
+
+def test_rolling_rollback_requires_hook():
+    runner = CliRunner()
+    result = runner.invoke(
+        warthog.cli.main, args=['rolling', '--hook', 'true', '--on-failure', 'rollback', 'app1'])
+
+    assert 2 == result.exit_code, 'Expected usage error exit code'
+
+
+def test_disable_min_available():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.disable_server.return_value = True
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(
+            warthog.cli.main, args=['disable', '--min-available', '2', 'app1.example.com'])
+
+    assert 0 == result.exit_code, result.output
+    client.disable_server.assert_called_once_with('app1.example.com', min_available=2)
+
+
+def test_disable_grace_period_expired():
+    client = mock.Mock(spec=warthog.client.WarthogClient)
+    client.disable_server.side_effect = warthog.exceptions.WarthogDrainTimeoutError(
+        'app1.example.com still had 3 active connections at the end of its grace period',
+        server='app1.example.com', connections=3)
+    facade = warthog.cli.WarthogClientFacade(client)
+
+    with mock.patch('warthog.cli.get_context_client', return_value=facade):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=[
+            'disable', '--grace-period', '5', '--on-grace-expired', 'fail', 'app1.example.com'])
+
+    assert 0 != result.exit_code, 'Expected a non-zero exit code'
+    assert not isinstance(result.exception, warthog.exceptions.WarthogDrainTimeoutError)
+    assert 'did not finish within the grace period' in result.output
+    assert '3 active connections' in result.output
+
+
+def test_disable_negative_grace_period():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=[
+            'disable', '--grace-period', '-1', 'app1.example.com'])
+
+    assert 2 == result.exit_code, 'Expected a usage error'
+    assert '--grace-period' in result.output
+    assert not client.disable_server.called
+
+
+def test_servers_ndjson_output():
+    client = mock.Mock(spec=warthog.cli.WarthogClientFacade)
+    client.iter_servers.return_value = iter([
+        warthog.client.ServerRecord('app1.example.com', '10.1.2.3', 'enabled', [(80, 'tcp')]),
+    ])
+
+    with mock.patch('warthog.cli.get_context_client', return_value=client):
+        runner = CliRunner()
+        result = runner.invoke(warthog.cli.main, args=['--output', 'ndjson', 'servers'])
+
+    assert 0 == result.exit_code, result.output
+    assert {
+        'server': 'app1.example.com',
+        'host': '10.1.2.3',
+        'status': 'enabled',
+        'ports': ['80/tcp'],
+    } == json.loads(result.output.strip())
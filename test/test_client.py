@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import logging
+import threading
 
 import pytest
 import mock
 import warthog.client
 import warthog.core
 import warthog.exceptions
+import warthog.tokens
 
 SCHEME_HOST = 'https://lb.example.com'
 
@@ -17,6 +19,7 @@ def commands(
         end_cmd,
         status_cmd,
         conn_cmd,
+        state_cmd,
         enable_cmd,
         disable_cmd):
     factory = mock.Mock(spec=warthog.client.CommandFactory)
@@ -26,6 +29,7 @@ def commands(
     factory.get_enable_server.return_value = enable_cmd
     factory.get_disable_server.return_value = disable_cmd
     factory.get_active_connections.return_value = conn_cmd
+    factory.get_server_state.return_value = state_cmd
     return factory
 
 
@@ -49,6 +53,11 @@ def conn_cmd():
     return mock.Mock(spec=warthog.core.NodeActiveConnectionsCommand)
 
 
+@pytest.fixture
+def state_cmd():
+    return mock.Mock(spec=warthog.core.NodeStateCommand)
+
+
 @pytest.fixture
 def enable_cmd():
     return mock.Mock(spec=warthog.core.NodeEnableCommand)
@@ -95,6 +104,192 @@ def test_session_context_exception_in_context_propagated(commands, start_cmd):
             raise RuntimeError("AHH!")
 
 
+def test_session_context_with_closer_defers_close(commands, start_cmd, end_cmd):
+    start_cmd.send.return_value = '1234'
+    closer = mock.Mock(spec=warthog.client.DeferredLogoff)
+
+    with warthog.client.session_context(
+            SCHEME_HOST, 'user', 'password', commands, closer=closer):
+        pass
+
+    closer.submit.assert_called_once_with(SCHEME_HOST, '1234')
+    assert not end_cmd.send.called, 'Expected session end .send() to not be called'
+
+
+class TestDeferredLogoff(object):
+    def test_flush_closes_submitted_sessions(self, commands, end_cmd):
+        closer = warthog.client.DeferredLogoff(commands, workers=2, batch_size=2)
+        for session in ['1', '2', '3', '4', '5']:
+            closer.submit(SCHEME_HOST, session)
+
+        assert closer.flush(timeout=5), 'Expected all pending sessions to be closed'
+        assert 5 == end_cmd.send.call_count, 'Expected each session to be closed'
+        closer.close()
+
+    def test_errors_closing_sessions_are_ignored(self, commands, end_cmd):
+        end_cmd.send.side_effect = warthog.exceptions.WarthogInvalidSessionError('Bad session')
+        closer = warthog.client.DeferredLogoff(commands)
+        closer.submit(SCHEME_HOST, '1234')
+
+        assert closer.close(timeout=5), 'Expected pending sessions to be processed'
+
+    def test_submit_after_close_is_synchronous(self, commands, end_cmd):
+        closer = warthog.client.DeferredLogoff(commands)
+        closer.close()
+        closer.submit(SCHEME_HOST, '1234')
+
+        commands.get_session_end.assert_called_once_with(SCHEME_HOST, '1234')
+        assert end_cmd.send.called, 'Session end .send() did not get called'
+
+    def test_closed_at_exit_until_closed(self, commands, end_cmd):
+        # pylint: disable=protected-access
+        closer = warthog.client.DeferredLogoff(commands)
+        closer.submit(SCHEME_HOST, '1234')
+        assert closer in warthog.client._open_logoffs.values()
+
+        warthog.client._close_open_logoffs()
+
+        assert end_cmd.send.called, 'Expected pending sessions to be closed at exit'
+        assert closer not in warthog.client._open_logoffs.values()
+
+    def test_close_at_exit_drops_sessions_after_timeout(self, commands, end_cmd, caplog):
+        # pylint: disable=protected-access
+        release = threading.Event()
+        end_cmd.send.side_effect = lambda: release.wait(5)
+        closer = warthog.client.DeferredLogoff(commands, workers=1, batch_size=1)
+        for session in ['1', '2', '3']:
+            closer.submit(SCHEME_HOST, session)
+
+        with caplog.at_level(logging.WARNING):
+            warthog.client._close_open_logoffs(timeout=0.05)
+        release.set()
+
+        assert closer.flush(timeout=5), 'Expected dropped sessions to no longer be pending'
+        assert 1 == end_cmd.send.call_count, 'Expected only the session in progress to be closed'
+        assert 'Dropped 2 sessions' in caplog.text
+
+
+class TestSessionPool(object):
+    def test_checkout_reuses_idle_session(self, commands, start_cmd):
+        start_cmd.send.side_effect = ['1234', '5678']
+        pool = warthog.client.SessionPool(SCHEME_HOST, 'user', 'password', commands, size=2)
+
+        with pool.session() as first:
+            pass
+        with pool.session() as second:
+            pass
+
+        assert '1234' == first == second, 'Expected idle session to be reused'
+        assert 1 == start_cmd.send.call_count, 'Expected a single session to be started'
+
+    def test_checkout_timeout_when_exhausted(self, commands, start_cmd):
+        start_cmd.send.return_value = '1234'
+        pool = warthog.client.SessionPool(
+            SCHEME_HOST, 'user', 'password', commands, size=1, timeout=0.1)
+
+        pool.checkout()
+        with pytest.raises(warthog.exceptions.WarthogSessionPoolTimeoutError):
+            pool.checkout()
+
+        metrics = pool.metrics()
+        assert 1 == metrics.in_use, 'Expected one session in use'
+        assert 1 == metrics.waits, 'Expected one wait to be recorded'
+        assert metrics.wait_time > 0, 'Expected time spent waiting to be recorded'
+
+    def test_invalid_session_is_replaced(self, commands, start_cmd):
+        start_cmd.send.side_effect = ['1234', '5678']
+        pool = warthog.client.SessionPool(SCHEME_HOST, 'user', 'password', commands, size=1)
+
+        with pytest.raises(warthog.exceptions.WarthogInvalidSessionError):
+            with pool.session():
+                raise warthog.exceptions.WarthogInvalidSessionError('Bad session')
+
+        with pool.session() as session:
+            pass
+
+        assert '5678' == session, 'Expected invalid session to be replaced'
+        assert 1 == pool.metrics().replaced, 'Expected replaced session to be recorded'
+
+    def test_close_ends_idle_sessions(self, commands, start_cmd, end_cmd):
+        start_cmd.send.return_value = '1234'
+        pool = warthog.client.SessionPool(SCHEME_HOST, 'user', 'password', commands)
+
+        with pool.session():
+            pass
+        pool.close()
+
+        commands.get_session_end.assert_called_once_with(SCHEME_HOST, '1234')
+        assert 0 == pool.metrics().open, 'Expected no open sessions after close'
+
+
+class TestSharedSession(object):
+    def test_session_reused(self, commands, start_cmd):
+        start_cmd.send.side_effect = ['1234', '5678']
+        shared = warthog.client.SharedSession(SCHEME_HOST, 'user', 'password', commands)
+
+        with shared.session() as first:
+            pass
+        with shared.session() as second:
+            pass
+
+        assert '1234' == first == second, 'Expected session to be reused'
+
+    def test_session_loaded_from_cache(self, commands, start_cmd, end_cmd):
+        cache = mock.Mock(spec=warthog.tokens.TokenCache)
+        cache.get.return_value = 'abcd'
+        shared = warthog.client.SharedSession(
+            SCHEME_HOST, 'user', 'password', commands, token_cache=cache)
+
+        with shared.session() as session:
+            pass
+        shared.close()
+
+        assert 'abcd' == session, 'Expected cached session to be used'
+        assert not start_cmd.send.called, 'Session start .send() should not be called'
+        assert not end_cmd.send.called, 'Cached session should be left open on close'
+        cache.put.assert_called_once_with(SCHEME_HOST, 'user', 'abcd')
+
+    def test_cache_updated_every_half_ttl(self, commands, start_cmd):
+        now = [0.0]
+        start_cmd.send.return_value = '1234'
+        cache = mock.Mock(spec=warthog.tokens.TokenCache)
+        cache.get.return_value = None
+        cache.ttl = 60.0
+        shared = warthog.client.SharedSession(
+            SCHEME_HOST, 'user', 'password', commands, token_cache=cache,
+            clock=lambda: now[0])
+
+        for _ in range(10):
+            with shared.session():
+                now[0] += 5.0
+
+        assert 2 == cache.put.call_count, 'Expected cache to be updated every 30 seconds'
+
+    def test_invalid_cached_session_removed(self, commands, start_cmd):
+        cache = mock.Mock(spec=warthog.tokens.TokenCache)
+        cache.get.return_value = 'abcd'
+        start_cmd.send.return_value = '1234'
+        shared = warthog.client.SharedSession(
+            SCHEME_HOST, 'user', 'password', commands, token_cache=cache)
+
+        with pytest.raises(warthog.exceptions.WarthogInvalidSessionError):
+            with shared.session():
+                raise warthog.exceptions.WarthogInvalidSessionError('Bad session')
+
+        cache.remove.assert_called_once_with(SCHEME_HOST, 'user')
+
+    def test_logout_ends_cached_session(self, commands, end_cmd):
+        cache = mock.Mock(spec=warthog.tokens.TokenCache)
+        cache.remove.return_value = 'abcd'
+        shared = warthog.client.SharedSession(
+            SCHEME_HOST, 'user', 'password', commands, token_cache=cache)
+
+        shared.logout()
+
+        commands.get_session_end.assert_called_once_with(SCHEME_HOST, 'abcd')
+        assert end_cmd.send.called, 'Session end .send() did not get called'
+
+
 class TestWarthogClient(object):
     def test_get_status(self, commands, start_cmd, end_cmd, status_cmd):
         start_cmd.send.return_value = '1234'
@@ -108,6 +303,34 @@ class TestWarthogClient(object):
         assert 'down' == status, 'Did not get expected status'
         assert end_cmd.send.called, 'Session end .send() did not get called'
 
+    def test_get_status_deferred_logoff(self, commands, start_cmd, end_cmd, status_cmd):
+        start_cmd.send.return_value = '1234'
+        status_cmd.send.return_value = 'enabled'
+
+        with warthog.client.WarthogClient(
+                SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+                deferred_logoff=True) as client:
+            status = client.get_status('app1.example.com')
+
+        assert 'enabled' == status, 'Did not get expected status'
+        assert end_cmd.send.called, 'Session end .send() did not get called on close'
+
+    def test_get_status_pooled_session_retry(self, commands, start_cmd, end_cmd, status_cmd):
+        start_cmd.send.side_effect = ['1234', '5678']
+        status_cmd.send.side_effect = [
+            warthog.exceptions.WarthogInvalidSessionError('Bad session'), 'enabled']
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            max_sessions=2)
+
+        status = client.get_status('app1.example.com')
+
+        assert 'enabled' == status, 'Did not get expected status'
+        assert not end_cmd.send.called, 'Session end .send() should not be called before close'
+        client.close()
+        commands.get_session_end.assert_called_once_with(SCHEME_HOST, '5678')
+
     def test_get_connections(self, commands, start_cmd, end_cmd, conn_cmd):
         start_cmd.send.return_value = '1234'
         conn_cmd.send.return_value = 42
@@ -120,12 +343,71 @@ class TestWarthogClient(object):
         assert 42 == connections, 'Did not get expected active connections'
         assert end_cmd.send.called, 'Session end .send() did not get called'
 
+    def test_get_node_states(self, commands, start_cmd, end_cmd):
+        start_cmd.send.return_value = '1234'
+        commands.get_all_server_status.return_value.send.return_value = {
+            'app1.example.com': warthog.core.STATUS_ENABLED,
+            'app2.example.com': warthog.core.STATUS_DOWN,
+        }
+        commands.get_all_server_stats.return_value.send.return_value = {
+            'app1.example.com': {'curr-conn': 3},
+        }
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
+
+        states = client.get_node_states()
+
+        assert warthog.client.NodeState(
+            'app1.example.com', warthog.core.STATUS_ENABLED, 3) == states['app1.example.com']
+        assert warthog.client.NodeState(
+            'app2.example.com', warthog.core.STATUS_DOWN, None) == states['app2.example.com']
+        assert 1 == start_cmd.send.call_count, 'Expected both requests to share a session'
+
+    def test_get_node_stats(self, commands, start_cmd, end_cmd):
+        start_cmd.send.return_value = '1234'
+        commands.get_all_server_status.return_value.send.return_value = {
+            'app1.example.com': warthog.core.STATUS_DISABLED,
+        }
+        commands.get_all_server_stats.return_value.send.return_value = {
+            'app1.example.com': {'curr-conn': 0, 'total-conn': 12},
+        }
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
+
+        stats = client.get_node_stats()
+
+        assert warthog.client.NodeStats(
+            'app1.example.com', warthog.core.STATUS_DISABLED,
+            {'curr-conn': 0, 'total-conn': 12}) == stats['app1.example.com']
+
+    def test_get_fleet_snapshot(self, commands, start_cmd, end_cmd):
+        start_cmd.send.return_value = '1234'
+        commands.get_all_server_status.return_value.send.return_value = {
+            'app1.example.com': warthog.core.STATUS_DISABLED,
+        }
+        commands.get_all_server_stats.return_value.send.return_value = {
+            'app1.example.com': {'curr-conn': 0, 'total-conn': 12},
+        }
+
+        history = mock.Mock()
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            stats_history=history)
+
+        snapshot = client.get_fleet_snapshot(fields=['curr-conn'])
+
+        assert warthog.core.STATUS_DISABLED == snapshot['app1.example.com'].status
+        assert {'curr-conn': 0} == snapshot['app1.example.com'].stats
+        assert 1 == start_cmd.send.call_count, 'Expected both requests to share a session'
+        history.record.assert_called_once_with(snapshot)
+
     def test_disable_server_no_active_connections(self, commands, start_cmd, end_cmd,
-                                                  status_cmd, conn_cmd, disable_cmd):
+                                                  state_cmd, disable_cmd):
         start_cmd.send.return_value = '1234'
         disable_cmd.send.return_value = True
-        conn_cmd.send.return_value = 0
-        status_cmd.send.return_value = 'disabled'
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 0)])
 
         client = warthog.client.WarthogClient(
             SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
@@ -136,11 +418,14 @@ class TestWarthogClient(object):
         assert end_cmd.send.called, 'Session end .send() did not get called'
 
     def test_disable_server_with_active_connections(self, commands, start_cmd, end_cmd,
-                                                    status_cmd, conn_cmd, disable_cmd):
+                                                    state_cmd, disable_cmd):
         start_cmd.send.return_value = '1234'
         disable_cmd.send.return_value = True
-        conn_cmd.send.return_value = [42, 3, 0]
-        status_cmd.send.return_value = 'disabled'
+        state_cmd.send.side_effect = [
+            ('disabled', [(80, 'tcp', 42)]),
+            ('disabled', [(80, 'tcp', 3)]),
+            ('disabled', [(80, 'tcp', 0)]),
+        ]
 
         client = warthog.client.WarthogClient(
             SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
@@ -151,11 +436,10 @@ class TestWarthogClient(object):
         assert end_cmd.send.called, 'Session end .send() did not get called'
 
     def test_disable_server_never_gets_disabled(self, commands, start_cmd, end_cmd,
-                                                status_cmd, conn_cmd, disable_cmd):
+                                                state_cmd, disable_cmd):
         start_cmd.send.return_value = '1234'
         disable_cmd.send.return_value = True
-        conn_cmd.send.return_value = 42
-        status_cmd.send.return_value = 'enabled'
+        state_cmd.send.return_value = ('enabled', [(80, 'tcp', 42)])
 
         client = warthog.client.WarthogClient(
             SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
@@ -165,10 +449,156 @@ class TestWarthogClient(object):
         assert not disabled, 'Server ended up disabled'
         assert end_cmd.send.called, 'Session end .send() did not get called'
 
-    def test_enable_server(self, commands, start_cmd, end_cmd, status_cmd, enable_cmd):
+    def test_disable_server_min_available(self, commands, start_cmd, end_cmd, disable_cmd):
+        start_cmd.send.return_value = '1234'
+        commands.get_service_groups.return_value.send.return_value = {
+            'web': [('app1.example.com', 80), ('app2.example.com', 80)],
+        }
+        commands.get_virtual_servers.return_value.send.return_value = {}
+        commands.get_all_server_status.return_value.send.return_value = {
+            'app1.example.com': warthog.core.STATUS_ENABLED,
+            'app2.example.com': warthog.core.STATUS_DISABLED,
+        }
+        commands.get_all_server_stats.return_value.send.return_value = {}
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
+
+        with pytest.raises(warthog.exceptions.WarthogCapacityError):
+            client.disable_server('app1.example.com', min_available=1)
+
+        assert not disable_cmd.send.called, 'Server should not have been disabled'
+
+    def test_disable_server_reads_state_once_per_poll(self, commands, start_cmd, end_cmd,
+                                                      status_cmd, conn_cmd, state_cmd,
+                                                      disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.side_effect = [
+            ('disabled', [(80, 'tcp', 3)]),
+            ('disabled', [(80, 'tcp', 0)]),
+        ]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.disable_server('app1.example.com'), 'Server did not end up disabled'
+        # One GET per poll, with the final status taken from the last poll
+        assert 2 == state_cmd.send.call_count
+        assert not status_cmd.send.called, 'Expected no separate status read'
+        assert not conn_cmd.send.called, 'Expected no separate connections read'
+
+    def test_disable_server_connections_not_in_state(self, commands, start_cmd, end_cmd,
+                                                     conn_cmd, state_cmd, disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', None)
+        conn_cmd.send.side_effect = [3, 0]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.disable_server('app1.example.com'), 'Server did not end up disabled'
+        assert 2 == conn_cmd.send.call_count
+        # The state is only read again for the final status once connections are read alone
+        assert 2 == state_cmd.send.call_count
+
+    def test_iter_servers(self, commands, start_cmd, end_cmd):
+        start_cmd.send.return_value = '1234'
+        records = [('app{0}'.format(i), '10.0.0.{0}'.format(i), 'enabled', [(80, 'tcp')])
+                   for i in range(5)]
+        commands.get_servers.side_effect = lambda scheme_host, session, start, count: mock.Mock(
+            send=mock.Mock(return_value=records[start:start + count]))
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
+
+        servers = list(client.iter_servers(page_size=2))
+
+        assert ['app0', 'app1', 'app2', 'app3', 'app4'] == [server.server for server in servers]
+        assert '10.0.0.3' == servers[3].host
+        assert 3 == commands.get_servers.call_count, 'Expected three pages of servers'
+
+    def test_get_status_resolves_address(self, commands, start_cmd, end_cmd, status_cmd):
+        start_cmd.send.return_value = '1234'
+        status_cmd.send.return_value = warthog.core.STATUS_ENABLED
+        commands.get_servers.return_value.send.return_value = [
+            ('app1.example.com', '10.1.2.3', warthog.core.STATUS_ENABLED, []),
+        ]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            resolve_servers=True)
+
+        assert warthog.core.STATUS_ENABLED == client.get_status('10.1.2.3')
+        commands.get_server_status.assert_called_once_with(SCHEME_HOST, '1234', 'app1.example.com')
+
+    def test_get_status_negative_cache(self, commands, start_cmd, end_cmd, status_cmd):
+        start_cmd.send.return_value = '1234'
+        status_cmd.send.side_effect = warthog.exceptions.WarthogNoSuchNodeError(
+            'No such server', api_code=warthog.core.ERROR_CODE_NO_SUCH_SERVER,
+            server='app9.example.com')
+        cache = warthog.client.NegativeCache(ttl=30.0)
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            negative_cache=cache)
+
+        for _ in range(3):
+            with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError) as e:
+                client.get_status('app9.example.com')
+            assert warthog.core.ERROR_CODE_NO_SUCH_SERVER == e.value.api_code
+
+        assert 1 == status_cmd.send.call_count, 'Expected unknown server to be remembered'
+        assert 1 == start_cmd.send.call_count, 'Expected no sessions for remembered server'
+
+        commands.get_all_server_status.return_value.send.return_value = {
+            'app9.example.com': warthog.core.STATUS_ENABLED,
+        }
+        commands.get_all_server_stats.return_value.send.return_value = {}
+        client.get_node_states()
+
+        assert 0 == len(cache), 'Expected bulk listing to clear the unknown server'
+
+    def test_read_status_uses_last_status_on_error(self, commands, start_cmd, end_cmd,
+                                                   status_cmd):
+        start_cmd.send.return_value = '1234'
+        status_cmd.send.side_effect = [
+            warthog.core.STATUS_ENABLED, warthog.exceptions.WarthogApiError('Bad gateway')]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            stale_reads=warthog.client.StaleReadCache(max_age=0.0))
+
+        assert 0.0 == client.read_status('app1.example.com').age
+        reading = client.read_status('app1.example.com')
+
+        assert warthog.core.STATUS_ENABLED == reading.value
+        assert reading.age > 0, 'Expected the previous status to be reported as stale'
+        assert 2 == status_cmd.send.call_count
+
+    def test_read_status_keyed_by_resolved_name(self, commands, start_cmd, end_cmd,
+                                                status_cmd):
+        start_cmd.send.return_value = '1234'
+        status_cmd.send.return_value = warthog.core.STATUS_ENABLED
+        commands.get_servers.return_value.send.return_value = [
+            ('app1.example.com', '10.1.2.3', warthog.core.STATUS_ENABLED, []),
+        ]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands,
+            resolve_servers=True)
+
+        assert 0.0 == client.read_status('10.1.2.3').age
+        client.read_status('APP1.example.com')
+
+        assert 1 == status_cmd.send.call_count, 'Expected one value for both identifiers'
+
+    def test_enable_server(self, commands, start_cmd, end_cmd, state_cmd, enable_cmd):
         start_cmd.send.return_value = '1234'
         enable_cmd.send.return_value = True
-        status_cmd.send.side_effect = ['down', 'down', 'enabled', 'enabled']
+        state_cmd.send.side_effect = [
+            ('down', []), ('down', []), ('enabled', []), ('enabled', [])]
 
         client = warthog.client.WarthogClient(
             SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
@@ -177,3 +607,512 @@ class TestWarthogClient(object):
 
         assert enabled, 'Server did not end up enabled'
         assert end_cmd.send.called, 'Session end .send() did not get called'
+
+
+    def test_enable_server_reuses_last_status(self, commands, start_cmd, end_cmd, state_cmd,
+                                              enable_cmd):
+        start_cmd.send.return_value = '1234'
+        enable_cmd.send.return_value = True
+        state_cmd.send.side_effect = [('down', []), ('enabled', [])]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.enable_server('app1.example.com'), 'Server did not end up enabled'
+        assert 2 == state_cmd.send.call_count, 'Expected the last status read to be reused'
+
+    def test_disable_server_ignore_ports(self, commands, start_cmd, end_cmd, state_cmd,
+                                         disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.side_effect = [
+            ('disabled', [(80, 'tcp', 3), (9090, 'tcp', 4)]),
+            ('disabled', [(80, 'tcp', 0), (9090, 'tcp', 4)]),
+        ]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.disable_server('app1.example.com', ignore_ports=[9090])
+        assert 2 == state_cmd.send.call_count
+
+    def test_disable_server_ignore_ports_not_in_state(self, commands, start_cmd, end_cmd,
+                                                      conn_cmd, state_cmd, disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', None)
+        commands.get_port_connections.return_value.send.side_effect = [
+            [(80, 'tcp', 3), (9090, 'tcp', 4)],
+            [(80, 'tcp', 0), (9090, 'tcp', 4)],
+        ]
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.disable_server('app1.example.com', ignore_ports=[9090])
+        assert 2 == commands.get_port_connections.return_value.send.call_count
+        assert not conn_cmd.send.called, 'Expected only per-port connections to be read'
+
+    def test_disable_server_grace_period_force(self, commands, start_cmd, end_cmd, state_cmd,
+                                               disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        commands.get_server_address.return_value.send.return_value = '10.1.2.3'
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        # Connections stay open for the whole grace period, then close once reset
+        def reset_connections(*_):
+            state_cmd.send.return_value = ('disabled', [(80, 'tcp', 0)])
+            return mock.DEFAULT
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 3)])
+        commands.get_reset_connections.side_effect = reset_connections
+
+        disabled = client.disable_server(
+            'app1.example.com', grace_period=0.05,
+            on_grace_expired=warthog.client.ON_GRACE_FORCE)
+
+        assert disabled, 'Expected the server to be disabled after resetting connections'
+        commands.get_server_address.assert_called_once_with(
+            SCHEME_HOST, '1234', 'app1.example.com')
+        commands.get_reset_connections.assert_called_once_with(SCHEME_HOST, '1234', '10.1.2.3')
+
+    def test_disable_server_grace_period_force_connections_remain(
+            self, commands, start_cmd, end_cmd, state_cmd, disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 3)])
+        commands.get_server_address.return_value.send.return_value = '10.1.2.3'
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        with pytest.raises(warthog.exceptions.WarthogDrainTimeoutError) as e:
+            client.disable_server(
+                'app1.example.com', grace_period=0,
+                on_grace_expired=warthog.client.ON_GRACE_FORCE)
+
+        assert 3 == e.value.connections
+        assert commands.get_reset_connections.called
+
+    def test_disable_server_grace_period_force_no_address(
+            self, commands, start_cmd, end_cmd, state_cmd, disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 3)])
+        commands.get_server_address.return_value.send.return_value = None
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        with pytest.raises(warthog.exceptions.WarthogDrainTimeoutError):
+            client.disable_server(
+                'app1.example.com', grace_period=0,
+                on_grace_expired=warthog.client.ON_GRACE_FORCE)
+
+        assert not commands.get_reset_connections.called
+
+    def test_disable_server_grace_period_fail(self, commands, start_cmd, end_cmd, state_cmd,
+                                              disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 3)])
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        with pytest.raises(warthog.exceptions.WarthogDrainTimeoutError) as e:
+            client.disable_server(
+                'app1.example.com', grace_period=0,
+                on_grace_expired=warthog.client.ON_GRACE_FAIL)
+
+        assert 3 == e.value.connections
+        assert not commands.get_reset_connections.called
+
+    def test_disable_server_grace_period_return(self, commands, start_cmd, end_cmd, state_cmd,
+                                                disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 3)])
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert not client.disable_server('app1.example.com', grace_period=0)
+
+    def test_disable_server_no_retries(self, commands, start_cmd, end_cmd, state_cmd,
+                                       disable_cmd):
+        start_cmd.send.return_value = '1234'
+        disable_cmd.send.return_value = True
+        state_cmd.send.return_value = ('disabled', [(80, 'tcp', 2)])
+
+        client = warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.01, commands=commands)
+
+        assert client.disable_server('app1.example.com', max_retries=0)
+        assert 1 == state_cmd.send.call_count
+        assert not commands.get_active_connections.called, 'Expected no connection reads'
+
+
+def _states(**conns):
+    return dict((server, warthog.client.NodeState(server, warthog.core.STATUS_ENABLED, count))
+                for server, count in conns.items())
+
+
+class TestDrainScheduler(object):
+    def test_order_makes_no_requests(self, client):
+        scheduler = warthog.client.DrainScheduler(client, ['a', 'b', 'c'])
+
+        assert ['a', 'b'] == scheduler.next_batch(2)
+        assert ['c'] == scheduler.pending
+        assert not client.get_node_states.called
+
+    def test_least_loaded(self, client):
+        client.get_node_states.return_value = _states(a=30, b=2, c=10, d=2)
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b', 'c', 'd', 'e'], strategy=warthog.client.SCHEDULE_LEAST_LOADED)
+
+        assert ['b', 'd'] == scheduler.next_batch(2)
+        assert ['c', 'a', 'e'] == scheduler.next_batch(3), 'Unknown servers should be last'
+        assert 1 == client.get_node_states.call_count
+
+    def test_most_loaded(self, client):
+        client.get_node_states.return_value = _states(a=30, b=2, c=10)
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b', 'c', 'd'], strategy=warthog.client.SCHEDULE_MOST_LOADED)
+
+        assert ['a', 'c', 'b', 'd'] == scheduler.next_batch(4)
+
+    def test_grouped(self, client):
+        client.get_node_states.return_value = _states(a=1, b=50, c=20, d=52, e=22)
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b', 'c', 'd', 'e'], strategy=warthog.client.SCHEDULE_GROUPED)
+
+        assert ['c', 'e'] == scheduler.next_batch(2), 'Expected the closest, least loaded pair'
+        assert ['a', 'b', 'd'] == scheduler.pending
+
+    def test_reranks_when_counts_are_stale(self, client):
+        now = [0.0]
+        client.get_node_states.side_effect = [
+            _states(a=1, b=5, c=9),
+            _states(b=8, c=0),
+        ]
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b', 'c'], strategy=warthog.client.SCHEDULE_LEAST_LOADED,
+            max_age=5.0, clock=lambda: now[0])
+
+        assert ['a'] == scheduler.next_batch(1)
+        now[0] = 10.0
+        assert ['c'] == scheduler.next_batch(1)
+        assert ['b'] == scheduler.next_batch(1)
+
+    def test_prefetch_used_by_next_batch(self, client):
+        client.get_node_states.side_effect = [
+            _states(a=1, b=5, c=9),
+            _states(b=8, c=0),
+        ]
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b', 'c'], strategy=warthog.client.SCHEDULE_LEAST_LOADED, max_age=60.0)
+
+        assert ['a'] == scheduler.next_batch(1)
+        scheduler.prefetch()
+        for thread in threading.enumerate():
+            if thread.name == 'warthog-scheduler-prefetch':
+                thread.join()
+
+        assert ['c'] == scheduler.next_batch(1), 'Expected prefetched counts to be used'
+
+    def test_refresh_error_falls_back_to_order(self, client):
+        client.get_node_states.side_effect = RuntimeError('boom')
+        scheduler = warthog.client.DrainScheduler(
+            client, ['a', 'b'], strategy=warthog.client.SCHEDULE_LEAST_LOADED)
+
+        assert ['a'] == scheduler.next_batch(1)
+
+
+class TestNegativeCache(object):
+    def test_check_expires(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.NegativeCache(ttl=10.0, clock=clock)
+        cache.add(SCHEME_HOST, 'app1', warthog.exceptions.WarthogNoSuchNodeError(
+            'No such server', api_msg='Object not found', server='app1'))
+
+        with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError) as e:
+            cache.check(SCHEME_HOST, 'app1')
+        assert 'app1' == e.value.server
+        assert 'Object not found' == e.value.api_msg
+
+        cache.check('https://other.example.com', 'app1')
+        clock.return_value = 10.0
+        cache.check(SCHEME_HOST, 'app1')
+        assert 0 == len(cache)
+
+    def test_seen(self):
+        cache = warthog.client.NegativeCache()
+        error = warthog.exceptions.WarthogNoSuchNodeError('No such server')
+        cache.add(SCHEME_HOST, 'app1', error)
+        cache.add(SCHEME_HOST, 'app2', error)
+        cache.add('https://other.example.com', 'app1', error)
+
+        cache.seen(SCHEME_HOST, ['app1', 'app3'])
+
+        assert 2 == len(cache)
+        cache.check(SCHEME_HOST, 'app1')
+        with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError):
+            cache.check('https://other.example.com', 'app1')
+
+
+class TestStaleReadCache(object):
+    def test_read_fresh(self):
+        cache = warthog.client.StaleReadCache(budget=1.0)
+
+        assert warthog.client.Reading(3, 0.0) == cache.read('key', lambda: 3)
+
+    def test_read_error_uses_last_value(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=1.0, clock=clock)
+        cache.read('key', lambda: 'enabled')
+        clock.return_value = 10.0
+
+        def fetch():
+            raise warthog.exceptions.WarthogApiError('Bad gateway')
+
+        assert warthog.client.Reading('enabled', 10.0) == cache.read('key', fetch)
+
+    def test_read_error_without_last_value(self):
+        cache = warthog.client.StaleReadCache(budget=1.0)
+
+        def fetch():
+            raise warthog.exceptions.WarthogApiError('Bad gateway')
+
+        with pytest.raises(warthog.exceptions.WarthogApiError):
+            cache.read('key', fetch)
+
+    def test_read_unknown_server_not_stale(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=1.0, clock=clock)
+        cache.read('key', lambda: 'enabled')
+        clock.return_value = 10.0
+
+        def fetch():
+            raise warthog.exceptions.WarthogNoSuchNodeError('No such server')
+
+        with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError):
+            cache.read('key', fetch)
+
+    def test_read_slow_uses_last_value_and_refreshes(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=0.01, clock=clock)
+        cache.read('key', lambda: 1)
+        clock.return_value = 5.0
+        release = threading.Event()
+
+        def fetch():
+            release.wait(5)
+            return 2
+
+        assert warthog.client.Reading(1, 5.0) == cache.read('key', fetch)
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == 'warthog-stale-read':
+                thread.join()
+
+        def failing():
+            raise warthog.exceptions.WarthogApiError('Bad gateway')
+
+        assert warthog.client.Reading(2, 0.0) == cache.read('key', failing), \
+            'Expected the background read to update the last good value'
+
+    def test_read_recent_value_not_read_again(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=1.0, max_age=2.0, clock=clock)
+        fetch = mock.Mock(return_value=1)
+        cache.read('key', fetch)
+        clock.return_value = 1.5
+
+        with mock.patch('threading.Thread', wraps=threading.Thread) as thread:
+            assert warthog.client.Reading(1, 1.5) == cache.read('key', fetch)
+
+        assert 1 == fetch.call_count
+        assert not thread.called, 'Expected no background read for a recent value'
+
+    def test_read_first_value_in_calling_thread(self):
+        cache = warthog.client.StaleReadCache(budget=1.0)
+
+        with mock.patch('threading.Thread', wraps=threading.Thread) as thread:
+            assert warthog.client.Reading(1, 0.0) == cache.read('key', lambda: 1)
+
+        assert not thread.called, 'Expected the first read to run in the calling thread'
+
+    def test_concurrent_reads_share_one_refresh(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=0.01, clock=clock)
+        cache.read('key', lambda: 1)
+        clock.return_value = 5.0
+        release = threading.Event()
+        fetch = mock.Mock(side_effect=lambda: release.wait(5) and 2)
+
+        readings = [cache.read('key', fetch) for _ in range(3)]
+        release.set()
+        for thread in threading.enumerate():
+            if thread.name == 'warthog-stale-read':
+                thread.join()
+
+        assert [warthog.client.Reading(1, 5.0)] * 3 == readings
+        assert 1 == fetch.call_count, 'Expected a single refresh while one is in progress'
+
+    def test_read_too_stale(self):
+        clock = mock.Mock(return_value=0.0)
+        cache = warthog.client.StaleReadCache(budget=1.0, max_stale=5.0, clock=clock)
+        cache.read('key', lambda: 1)
+        clock.return_value = 10.0
+
+        def fetch():
+            raise warthog.exceptions.WarthogApiError('Bad gateway')
+
+        with pytest.raises(warthog.exceptions.WarthogApiError):
+            cache.read('key', fetch)
+
+
+class TestStatePoller(object):
+    @pytest.fixture
+    def client(self, commands, start_cmd):
+        start_cmd.send.return_value = '1234'
+        commands.get_all_server_stats.return_value.send.return_value = {}
+        return warthog.client.WarthogClient(
+            SCHEME_HOST, 'user', 'password', wait_interval=0.1, commands=commands)
+
+    @staticmethod
+    def _set_statuses(commands, **statuses):
+        commands.get_all_server_status.return_value.send.return_value = statuses
+
+    def test_iter_changes_initial_state_then_changes(self, client, commands, start_cmd):
+        enabled, disabled = warthog.core.STATUS_ENABLED, warthog.core.STATUS_DISABLED
+        self._set_statuses(commands, app1=enabled, app2=enabled)
+        changes = client.iter_changes(['app1'], interval=0.01)
+
+        first = next(changes)
+        self._set_statuses(commands, app1=disabled, app2=disabled)
+        second = next(changes)
+        changes.close()
+        client.close()
+
+        assert warthog.client.StateChange(
+            'app1', None, warthog.client.NodeState('app1', enabled, None)) == first
+        assert warthog.client.StateChange(
+            'app1',
+            warthog.client.NodeState('app1', enabled, None),
+            warthog.client.NodeState('app1', disabled, None)) == second
+        assert 1 == start_cmd.send.call_count, 'Expected every poll to reuse a single session'
+
+    def test_subscribe_shares_poller_and_stops_when_cancelled(self, client, commands):
+        self._set_statuses(commands, app1=warthog.core.STATUS_ENABLED)
+        seen = threading.Event()
+
+        first = client.subscribe(None, lambda change: seen.set(), interval=0.01)
+        second = client.subscribe(['app2'], mock.Mock(), interval=5.0)
+        assert seen.wait(5)
+        first.cancel()
+        second.cancel()
+        client.close()
+
+        assert not any(thread.name == 'warthog-state-poller' for thread in threading.enumerate())
+
+    def test_callback_errors_do_not_stop_poller(self, client, commands):
+        self._set_statuses(commands, app1=warthog.core.STATUS_ENABLED)
+        calls = []
+        primed = threading.Event()
+        done = threading.Event()
+
+        def callback(change):
+            calls.append(change)
+            (done if primed.is_set() else primed).set()
+            raise RuntimeError('bad callback')
+
+        client.subscribe(['app1'], callback, interval=0.01)
+        assert primed.wait(5)
+        self._set_statuses(commands)
+        assert done.wait(5)
+        client.close()
+
+        assert calls[1].current is None, 'Expected a change for the server that disappeared'
+
+
+class TestServerResolver(object):
+    @pytest.fixture
+    def client(self):
+        client = mock.Mock(spec=warthog.client.WarthogClient)
+        client.iter_servers.return_value = [
+            warthog.client.ServerRecord('app1.example.com', '10.1.2.3', 'enabled', []),
+            warthog.client.ServerRecord('web2', 'web2.Example.com', 'enabled', []),
+        ]
+        return client
+
+    def test_resolve(self, client):
+        resolver = warthog.client.ServerResolver(client, clock=lambda: 0.0)
+
+        assert 'app1.example.com' == resolver.resolve('app1.example.com')
+        assert 'app1.example.com' == resolver.resolve('APP1.example.com')
+        assert 'app1.example.com' == resolver.resolve('10.1.2.3')
+        assert 'web2' == resolver.resolve('web2.example.com')
+        assert 1 == client.iter_servers.call_count, 'Expected a single listing of servers'
+
+    def test_resolve_unknown_refreshes_at_most_once_per_interval(self, client):
+        clock = mock.Mock(return_value=0.0)
+        resolver = warthog.client.ServerResolver(client, miss_interval=5.0, clock=clock)
+
+        assert 'unknown' == resolver.resolve('unknown')
+        clock.return_value = 1.0
+        assert 'unknown' == resolver.resolve('unknown')
+        assert 1 == client.iter_servers.call_count
+
+        clock.return_value = 6.0
+        resolver.resolve('unknown')
+        assert 2 == client.iter_servers.call_count
+
+    def test_resolve_refreshes_stale_index(self, client):
+        clock = mock.Mock(return_value=0.0)
+        resolver = warthog.client.ServerResolver(client, max_age=60.0, clock=clock)
+        resolver.resolve('10.1.2.3')
+
+        clock.return_value = 61.0
+        resolver.resolve('10.1.2.3')
+
+        assert 2 == client.iter_servers.call_count
+
+
+def test_run_parallel_collects_results_and_errors():
+    def operation(item):
+        if item == 3:
+            raise ValueError('Bad item')
+        return item * 2
+
+    results = list(warthog.client.run_parallel(operation, [1, 2, 3, 4], jobs=3))
+
+    assert [1, 2, 3, 4] == sorted(r.item for r in results), 'Expected a result for each item'
+    assert dict((r.item, r.result) for r in results if r.error is None) == {1: 2, 2: 4, 4: 8}
+    assert [3] == [r.item for r in results if isinstance(r.error, ValueError)]
+
+
+def test_iter_pages_raises_fetch_errors():
+    def fetch(start, count):
+        if start > 0:
+            raise ValueError('Bad page')
+        return [1, 2]
+
+    pages = warthog.client.iter_pages(fetch, 2)
+
+    assert 1 == next(pages)
+    assert 2 == next(pages)
+    with pytest.raises(ValueError):
+        next(pages)
+
+
+def test_iter_pages_exact_multiple():
+    items = list(range(4))
+
+    def fetch(start, count):
+        return items[start:start + count]
+
+    assert items == list(warthog.client.iter_pages(fetch, 2))
@@ -557,3 +557,348 @@ class TestNodeActiveConnectionsCommand(object):
         connections = cmd.send()
         assert 42 == connections, 'Did not get expected active connections'
         assert transport.get.called, 'Expected transport ".get() to be called'
+
+
+SERVER_LIST_OPER = {
+    'server-list': [
+        {'name': 'app1.example.com', 'oper': {'state': 'Up'}},
+        {'name': 'app2.example.com', 'oper': {'state': 'Disabled'}},
+        {'name': 'app3.example.com', 'oper': {'state': 'Sideways'}},
+    ]
+}
+
+SERVER_LIST_STATS = {
+    'server-list': [
+        {'name': 'app1.example.com', 'stats': {'curr-conn': 5, 'total-conn': 100}},
+        {'name': 'app2.example.com', 'stats': {'curr-conn': 0, 'total-conn': 80}},
+    ]
+}
+
+
+class TestNodeStatusListCommand(object):
+    def test_send_invalid_session(self, transport, response):
+        response.text = ''
+        response.status_code = 401
+        response.ok = False
+        response.json.return_value = dict(INVALID_SESSION)
+
+        with pytest.raises(warthog.exceptions.WarthogInvalidSessionError):
+            cmd = warthog.core.NodeStatusListCommand(transport, SCHEME_HOST, '1234')
+            cmd.send()
+
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = SERVER_LIST_OPER
+
+        cmd = warthog.core.NodeStatusListCommand(transport, SCHEME_HOST, '1234')
+        statuses = cmd.send()
+
+        assert {
+            'app1.example.com': warthog.core.STATUS_ENABLED,
+            'app2.example.com': warthog.core.STATUS_DISABLED,
+            'app3.example.com': None,
+        } == statuses
+        assert 1 == transport.get.call_count, 'Expected a single request for all servers'
+
+
+class TestNodeStatsListCommand(object):
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = SERVER_LIST_STATS
+
+        cmd = warthog.core.NodeStatsListCommand(transport, SCHEME_HOST, '1234')
+        stats = cmd.send()
+
+        assert 5 == stats['app1.example.com']['curr-conn']
+        assert 80 == stats['app2.example.com']['total-conn']
+        assert 1 == transport.get.call_count, 'Expected a single request for all servers'
+
+    def test_send_no_servers(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {}
+
+        cmd = warthog.core.NodeStatsListCommand(transport, SCHEME_HOST, '1234')
+        assert {} == cmd.send()
+
+
+class TestServiceGroupListCommand(object):
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'service-group-list': [
+                {'name': 'web', 'member-list': [
+                    {'name': 'app1.example.com', 'port': 80},
+                    {'name': 'app2.example.com', 'port': 80},
+                ]},
+                {'name': 'empty'},
+            ]
+        }
+
+        cmd = warthog.core.ServiceGroupListCommand(transport, SCHEME_HOST, '1234')
+        groups = cmd.send()
+
+        assert [('app1.example.com', 80), ('app2.example.com', 80)] == groups['web']
+        assert [] == groups['empty']
+
+
+class TestVirtualServerListCommand(object):
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'virtual-server-list': [
+                {'name': 'vip1', 'port-list': [
+                    {'port-number': 443, 'protocol': 'https', 'service-group': 'web'},
+                    {'port-number': 22, 'protocol': 'tcp'},
+                ]},
+            ]
+        }
+
+        cmd = warthog.core.VirtualServerListCommand(transport, SCHEME_HOST, '1234')
+        vservers = cmd.send()
+
+        assert [(443, 'https', 'web'), (22, 'tcp', None)] == vservers['vip1']
+
+
+class TestServerListCommand(object):
+    def test_send_page(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server-list': [
+                {'name': 'app1.example.com', 'host': '10.1.2.3', 'action': 'enable',
+                 'port-list': [{'port-number': 80, 'protocol': 'tcp'}]},
+                {'name': 'app2.example.com', 'fqdn-name': 'app2.internal', 'action': 'disable'},
+            ]
+        }
+
+        cmd = warthog.core.ServerListCommand(transport, SCHEME_HOST, '1234', start=10, count=2)
+        servers = cmd.send()
+
+        assert [
+            ('app1.example.com', '10.1.2.3', warthog.core.STATUS_ENABLED, [(80, 'tcp')]),
+            ('app2.example.com', 'app2.internal', warthog.core.STATUS_DISABLED, []),
+        ] == servers
+        assert {'start': 10, 'count': 2} == transport.get.call_args[1]['params']
+
+
+class TestNodePortConnectionsCommand(object):
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {
+                'name': 'good.example.com',
+                'stats': {'curr-conn': 7},
+                'port-list': [
+                    {'port-number': 80, 'protocol': 'tcp', 'stats': {'curr_conn': 2}},
+                    {'port-number': 9090, 'protocol': 'tcp', 'stats': {'curr-conn': 5}},
+                ],
+            }
+        }
+
+        cmd = warthog.core.NodePortConnectionsCommand(
+            transport, SCHEME_HOST, '1234', 'good.example.com')
+
+        assert [(80, 'tcp', 2), (9090, 'tcp', 5)] == cmd.send()
+
+
+class TestNodeStateCommand(object):
+    def test_send_success(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {
+                'name': 'good.example.com',
+                'oper': {'state': 'Disabled'},
+                'port-list': [
+                    {'port-number': 80, 'protocol': 'tcp',
+                     'oper': {'state': 'Up', 'curr_conn': 2}},
+                    {'port-number': 9090, 'protocol': 'tcp',
+                     'oper': {'state': 'Up', 'curr-conn': 5}},
+                ],
+            }
+        }
+
+        cmd = warthog.core.NodeStateCommand(
+            transport, SCHEME_HOST, '1234', 'good.example.com')
+
+        assert (warthog.core.STATUS_DISABLED, [(80, 'tcp', 2), (9090, 'tcp', 5)]) == cmd.send()
+        assert 1 == transport.get.call_count
+
+    def test_send_connections_not_in_state(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {
+                'oper': {'state': 'Up'},
+                'port-list': [{'port-number': 80, 'protocol': 'tcp', 'oper': {'state': 'Up'}}],
+            }
+        }
+
+        cmd = warthog.core.NodeStateCommand(
+            transport, SCHEME_HOST, '1234', 'good.example.com')
+
+        assert (warthog.core.STATUS_ENABLED, None) == cmd.send()
+
+    def test_send_server_no_known_status(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {'server': {'oper': {'state': 'Shutdown'}}}
+
+        with pytest.raises(warthog.exceptions.WarthogNodeStatusError):
+            cmd = warthog.core.NodeStateCommand(
+                transport, SCHEME_HOST, '1234', 'good.example.com')
+            cmd.send()
+
+
+class TestNodeAddressCommand(object):
+    def test_send_no_such_server(self, transport, response):
+        response.text = ''
+        response.status_code = 404
+        response.ok = False
+        response.json.return_value = dict(NO_SUCH_SERVER)
+
+        with pytest.raises(warthog.exceptions.WarthogNoSuchNodeError):
+            cmd = warthog.core.NodeAddressCommand(
+                transport, SCHEME_HOST, '1234', 'bad.example.com')
+            cmd.send()
+
+    def test_send_ipv4(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {'name': 'app1.example.com', 'host': '10.1.2.3'}}
+
+        cmd = warthog.core.NodeAddressCommand(
+            transport, SCHEME_HOST, '1234', 'app1.example.com')
+
+        assert '10.1.2.3' == cmd.send()
+        assert transport.get.call_args[0][0].endswith('/slb/server/app1.example.com')
+
+    def test_send_ipv6(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {'name': 'app1.example.com', 'server-ipv6-addr': 'fd00::3'}}
+
+        cmd = warthog.core.NodeAddressCommand(
+            transport, SCHEME_HOST, '1234', 'app1.example.com')
+
+        assert 'fd00::3' == cmd.send()
+
+    def test_send_fqdn_only(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = {
+            'server': {'name': 'app1.example.com', 'fqdn-name': 'app1.example.com'}}
+
+        cmd = warthog.core.NodeAddressCommand(
+            transport, SCHEME_HOST, '1234', 'app1.example.com')
+
+        assert cmd.send() is None
+
+
+class TestNodeResetConnectionsCommand(object):
+    def test_send_invalid_session(self, transport, response):
+        response.text = ''
+        response.status_code = 401
+        response.ok = False
+        response.json.return_value = dict(INVALID_SESSION)
+
+        with pytest.raises(warthog.exceptions.WarthogInvalidSessionError):
+            cmd = warthog.core.NodeResetConnectionsCommand(
+                transport, SCHEME_HOST, '1234', '10.1.2.3')
+            cmd.send()
+
+    def test_send_success_ipv4(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = dict(OK_RESPONSE)
+
+        cmd = warthog.core.NodeResetConnectionsCommand(
+            transport, SCHEME_HOST, '1234', '10.1.2.3')
+
+        assert cmd.send()
+        assert {'sessions': {'dest-addr': '10.1.2.3'}} == \
+            transport.post.call_args[1]['json']
+
+    def test_send_success_ipv6(self, transport, response):
+        response.text = ''
+        response.status_code = 200
+        response.ok = True
+        response.json.return_value = dict(OK_RESPONSE)
+
+        cmd = warthog.core.NodeResetConnectionsCommand(
+            transport, SCHEME_HOST, '1234', 'fd00::3')
+
+        assert cmd.send()
+        assert {'sessions': {'dest-ipv6-addr': 'fd00::3'}} == \
+            transport.post.call_args[1]['json']
+
+
+class TestFleetSnapshot(object):
+    @pytest.fixture
+    def snapshot(self):
+        statuses = {
+            'app1.example.com': warthog.core.STATUS_ENABLED,
+            'app2.example.com': warthog.core.STATUS_DOWN,
+            'app3.example.com': None,
+        }
+        stats = {
+            'app1.example.com': {'curr-conn': 3, 'total-conn': 2 ** 40, 'name': 'app1'},
+            'app2.example.com': {'curr-conn': 0, 'healthy': True},
+        }
+        return warthog.core.FleetSnapshot(statuses, stats)
+
+    def test_lookup(self, snapshot):
+        row = snapshot['app1.example.com']
+
+        assert 3 == len(snapshot)
+        assert 'app2.example.com' in snapshot
+        assert 'app4.example.com' not in snapshot
+        assert warthog.core.STATUS_ENABLED == row.status
+        assert 3 == row.connections
+        assert {'curr-conn': 3, 'total-conn': 2 ** 40} == row.stats
+        assert ['curr-conn', 'total-conn'] == snapshot.fields
+
+    def test_missing_values(self, snapshot):
+        row = snapshot['app3.example.com']
+
+        assert row.status is None
+        assert row.connections is None
+        assert 7 == row.get('total-conn', 7)
+        assert {} == row.stats
+        assert snapshot.get('app4.example.com') is None
+
+    def test_rows_and_columns(self, snapshot):
+        assert ['app1.example.com', 'app2.example.com', 'app3.example.com'] == \
+            [row.server for row in snapshot.rows()]
+        assert [3, 0, None] == snapshot.column('curr-conn')
+        assert [None, None, None] == snapshot.column('unknown')
+
+    def test_selected_fields(self):
+        snapshot = warthog.core.FleetSnapshot(
+            {'app1': warthog.core.STATUS_DISABLED}, {'app1': {'curr-conn': 1, 'fwd-pkt': 5}},
+            fields=['curr-conn'])
+
+        assert ['curr-conn'] == snapshot.fields
+        assert {'curr-conn': 1} == snapshot['app1'].stats
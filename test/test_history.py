@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import warthog.client
+import warthog.core
+import warthog.history
+
+NodeStats = warthog.client.NodeStats
+
+
+def _nodes(**conns):
+    return dict((server, NodeStats(server, warthog.core.STATUS_ENABLED, {'curr-conn': count}))
+                for server, count in conns.items())
+
+
+@pytest.fixture(params=[False, True], ids=['python', 'numpy'])
+def use_numpy(request):
+    if request.param and warthog.history.numpy is None:
+        pytest.skip('NumPy is not installed')
+    return request.param
+
+
+@pytest.fixture
+def history(use_numpy):
+    history = warthog.history.StatsHistory(capacity=3, use_numpy=use_numpy)
+    history.record(_nodes(app1=100, app2=10), timestamp=0.0)
+    history.record(_nodes(app1=80, app2=10), timestamp=10.0)
+    history.record(_nodes(app1=60, app2=12, app3=5), timestamp=20.0)
+    return history
+
+
+def test_ring_buffer_drops_oldest(history):
+    history.record(_nodes(app1=40, app2=12, app3=5), timestamp=30.0)
+
+    assert 3 == len(history)
+    assert {'app1': -2.0, 'app2': 0.1, 'app3': None} == history.rates()
+    assert {'app1': 40.0, 'app2': 12.0, 'app3': 5.0} == history.latest()
+
+
+def test_rates_window(history):
+    assert {'app1': -2.0, 'app2': 0.2, 'app3': None} == history.rates(window=10.0)
+
+
+def test_ewma(history):
+    averages = history.ewma(alpha=0.5)
+
+    assert 75.0 == averages['app1']
+    assert 5.0 == averages['app3'], 'Expected missing samples to be skipped'
+
+
+def test_percentiles(history):
+    assert {50: 12.0, 100: 60.0} == history.percentiles(q=(50, 100))
+    assert {50: 8.5} == history.percentiles(q=(50,), servers=['app2', 'app3', 'unknown'])
+
+
+def test_time_to_zero(history):
+    history.record(_nodes(app1=40, app2=0, app3=5), timestamp=30.0)
+
+    assert {'app1': 20.0, 'app2': 0.0, 'app3': None} == history.time_to_zero()
+
+
+def test_group_totals(history):
+    groups = {'web': ['app1', 'app2', 'app1'], 'api': ['app3', 'unknown'], 'empty': []}
+
+    assert {'web': 72.0, 'api': 5.0, 'empty': 0.0} == history.group_totals(groups)
+
+
+def test_fleet_snapshot_and_states(use_numpy):
+    history = warthog.history.StatsHistory(fields=['curr-conn', 'total-conn'], use_numpy=use_numpy)
+    history.record(warthog.core.FleetSnapshot(
+        {'app1': warthog.core.STATUS_ENABLED}, {'app1': {'curr-conn': 3, 'total-conn': 9}}),
+        timestamp=0.0)
+    history.record({'app1': warthog.client.NodeState('app1', warthog.core.STATUS_ENABLED, 4)},
+                   timestamp=1.0)
+
+    assert {'app1': 4.0} == history.latest()
+    assert {'app1': None} == history.latest('total-conn')
+
+
+def test_unknown_field(history):
+    with pytest.raises(ValueError):
+        history.rates('fwd-pkt')
+
+
+def test_empty_history(use_numpy):
+    history = warthog.history.StatsHistory(use_numpy=use_numpy)
+
+    assert {} == history.rates()
+    assert {50: None} == history.percentiles(q=(50,))
+    assert {'web': 0.0} == history.group_totals({'web': ['app1']})
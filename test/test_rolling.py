@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import mock
+import pytest
+
+import warthog.cli
+import warthog.client
+import warthog.core
+import warthog.exceptions
+import warthog.rolling
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=warthog.client.WarthogClient)
+    client.disable_server.return_value = True
+    client.get_connections.return_value = 0
+    client.enable_server.return_value = True
+    client.get_status.return_value = warthog.core.STATUS_ENABLED
+    return client
+
+
+class ConcurrencyTracker(object):
+    def __init__(self, fail=()):
+        self._lock = threading.Lock()
+        self._fail = fail
+        self.current = 0
+        self.peak = 0
+        self.calls = []
+
+    def __call__(self, server):
+        with self._lock:
+            self.calls.append(server)
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+        threading.Event().wait(0.02)
+
+        with self._lock:
+            self.current -= 1
+        if server in self._fail:
+            raise RuntimeError('deploy failed for {0}'.format(server))
+
+
+def test_resolve_max_unavailable():
+    assert 2 == warthog.rolling.resolve_max_unavailable(2, 10)
+    assert 2 == warthog.rolling.resolve_max_unavailable(0.25, 10)
+    assert 1 == warthog.rolling.resolve_max_unavailable(0.1, 5)
+    assert 10 == warthog.rolling.resolve_max_unavailable(1.0, 10)
+    assert 10 == warthog.rolling.resolve_max_unavailable(
+        warthog.cli.parse_max_unavailable('100%'), 10)
+    assert 1 == warthog.rolling.resolve_max_unavailable(1, 10)
+
+    with pytest.raises(ValueError):
+        warthog.rolling.resolve_max_unavailable(0, 10)
+
+
+def test_run_all_phases(client):
+    hook = mock.Mock(return_value=None)
+    deployment = warthog.rolling.RollingDeployment(client, hook, interval=0)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert not result.aborted
+    assert ['app1', 'app2'] == sorted(res.server for res in result.results)
+    assert all(res.ok for res in result.results)
+    assert list(warthog.rolling.PHASES) == list(result.results[0].timings)
+    assert 2 == hook.call_count
+
+
+def test_run_reuses_status_read_when_enabling(client):
+    deployment = warthog.rolling.RollingDeployment(client, mock.Mock(return_value=None), interval=0)
+
+    result = deployment.run(['app1'])
+
+    assert result.results[0].ok
+    assert not client.get_status.called, 'Expected the status read by enable_server to be reused'
+
+
+def test_run_respects_max_unavailable(client):
+    hook = ConcurrencyTracker()
+    deployment = warthog.rolling.RollingDeployment(client, hook, max_unavailable=2, interval=0)
+
+    result = deployment.run(['app{0}'.format(i) for i in range(6)])
+
+    assert 6 == len(result.results)
+    assert 2 == hook.peak, 'Expected exactly two servers to be deployed at once'
+
+
+def test_run_drain_timeout(client):
+    client.get_connections.return_value = 3
+    deployment = warthog.rolling.RollingDeployment(
+        client, mock.Mock(), drain_timeout=0, interval=0)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert result.aborted
+    assert ['app2'] == result.skipped
+    assert warthog.rolling.PHASE_DRAIN == result.results[0].phase
+    assert isinstance(result.results[0].error, warthog.exceptions.WarthogRollingError)
+
+
+def test_run_failed_servers_use_unavailable_budget(client):
+    hook = ConcurrencyTracker(fail=('app1',))
+    deployment = warthog.rolling.RollingDeployment(client, hook, max_failures=5, interval=0)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert not result.aborted, 'Expected failures under max_failures not to abort'
+    assert ['app2'] == result.skipped
+
+
+def test_run_used_up_budget_does_not_roll_back(client):
+    hook = ConcurrencyTracker(fail=('app1',))
+    rollback = mock.Mock(return_value=None)
+    deployment = warthog.rolling.RollingDeployment(
+        client, hook, max_failures=5, on_failure=warthog.rolling.ON_FAILURE_ROLLBACK,
+        rollback_hook=rollback, interval=0)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert ['app2'] == result.skipped
+    assert [] == result.rollback
+    assert not rollback.called
+
+
+def test_run_stops_after_max_failures(client):
+    hook = ConcurrencyTracker(fail=('app1', 'app2'))
+    deployment = warthog.rolling.RollingDeployment(
+        client, hook, max_unavailable=2, max_failures=1, interval=0)
+
+    result = deployment.run(['app1', 'app2', 'app3', 'app4'])
+
+    assert result.aborted
+    assert ['app1', 'app2'] == sorted(hook.calls)
+    assert ['app3', 'app4'] == result.skipped
+
+
+def test_run_rolls_back_deployed_servers(client):
+    hook = ConcurrencyTracker(fail=('app2',))
+    rollback = mock.Mock(return_value=None)
+    callback = mock.Mock()
+    deployment = warthog.rolling.RollingDeployment(
+        client, hook, on_failure=warthog.rolling.ON_FAILURE_ROLLBACK,
+        rollback_hook=rollback, interval=0, callback=callback)
+
+    result = deployment.run(['app1', 'app2', 'app3'])
+
+    assert result.aborted
+    assert ['app1', 'app2'] == sorted(res.server for res in result.rollback)
+    assert all(res.rollback for res in result.rollback)
+    assert 2 == rollback.call_count
+    assert 4 == callback.call_count
+
+
+def test_run_pipeline_overlaps_verify_with_next_server(client):
+    verifying = threading.Event()
+    verified = threading.Event()
+    disabled_during_verify = []
+
+    def verify(server):
+        if server == 'app1':
+            verifying.set()
+            threading.Event().wait(0.1)
+            verified.set()
+
+    def disable_server(server, max_retries=5):
+        if server == 'app2':
+            disabled_during_verify.append(verifying.is_set() and not verified.is_set())
+        return True
+
+    client.disable_server.side_effect = disable_server
+    deployment = warthog.rolling.RollingDeployment(
+        client, mock.Mock(return_value=None), verify=verify, interval=0, pipeline=True)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert all(res.ok for res in result.results)
+    assert [True] == disabled_during_verify, 'Expected app2 to start while app1 was verified'
+    assert [['app1'], ['app2']] == [batch.servers for batch in result.batches]
+    assert result.batches[1].overlap > 0
+
+
+def test_run_without_pipeline_has_no_overlap(client):
+    deployment = warthog.rolling.RollingDeployment(
+        client, mock.Mock(return_value=None), verify=mock.Mock(return_value=None), interval=0)
+
+    result = deployment.run(['app1', 'app2'])
+
+    assert 2 == len(result.batches)
+    assert all(batch.overlap == 0 for batch in result.batches)
+
+
+def test_rollback_requires_hook(client):
+    with pytest.raises(ValueError):
+        warthog.rolling.RollingDeployment(
+            client, mock.Mock(), on_failure=warthog.rolling.ON_FAILURE_ROLLBACK)
+
+
+def test_shell_hook():
+    warthog.rolling.shell_hook('[ "$WARTHOG_SERVER" = {server} ]')('app1.example.com')
+
+    with pytest.raises(warthog.exceptions.WarthogRollingError):
+        warthog.rolling.shell_hook('exit 3')('app1.example.com')
+
+
+def test_summarize_timings():
+    results = [
+        warthog.rolling.NodeResult(
+            'app1', True, None, None, {'disable': 1.0, 'deploy': 4.0}, False),
+        warthog.rolling.NodeResult(
+            'app2', True, None, None, {'disable': 2.0, 'deploy': 3.0}, False),
+    ]
+
+    summary = warthog.rolling.summarize_timings(results)
+
+    assert ['disable', 'deploy'] == list(summary)
+    assert (3.0, 2.0) == summary['disable']
+    assert (7.0, 4.0) == summary['deploy']
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+import pytest
+
+import warthog.client
+import warthog.core
+import warthog.snapshot
+
+NodeStats = warthog.client.NodeStats
+NodeState = warthog.client.NodeState
+SnapshotChange = warthog.snapshot.SnapshotChange
+
+
+def _stats(conns, **extra):
+    stats = {'curr-conn': conns}
+    stats.update(extra)
+    return stats
+
+
+def test_diff_snapshots():
+    previous = {
+        'app1': NodeStats('app1', 'enabled', _stats(4, total=10)),
+        'app2': NodeStats('app2', 'enabled', _stats(5)),
+        'app3': NodeStats('app3', 'enabled', _stats(0)),
+    }
+    current = {
+        'app1': NodeStats('app1', 'disabled', _stats(0, total=11)),
+        'app2': NodeStats('app2', 'enabled', _stats(7)),
+        'app4': NodeStats('app4', 'down', {}),
+    }
+
+    changes = list(warthog.snapshot.diff_snapshots(previous, current))
+
+    assert [
+        SnapshotChange('app1', warthog.snapshot.CHANGE_STATUS, 'enabled', 'disabled'),
+        SnapshotChange('app1', warthog.snapshot.CHANGE_CONNECTIONS, 4, 0),
+        SnapshotChange('app2', warthog.snapshot.CHANGE_CONNECTIONS, 5, 7),
+        SnapshotChange('app3', warthog.snapshot.CHANGE_REMOVED, 'enabled', None),
+        SnapshotChange('app4', warthog.snapshot.CHANGE_ADDED, None, 'down'),
+    ] == changes
+
+
+def test_diff_snapshots_threshold():
+    previous = {'app1': NodeState('app1', 'enabled', 10), 'app2': NodeState('app2', 'enabled', 10)}
+    current = {'app1': NodeState('app1', 'enabled', 12), 'app2': NodeState('app2', 'enabled', None)}
+
+    changes = list(warthog.snapshot.diff_snapshots(previous, current, threshold=2))
+
+    assert [SnapshotChange('app2', warthog.snapshot.CHANGE_CONNECTIONS, 10, None)] == changes
+
+
+def test_differ_accumulates_small_changes():
+    differ = warthog.snapshot.SnapshotDiffer(
+        threshold=5, initial={'app1': NodeState('app1', 'enabled', 10)})
+
+    assert [] == differ.update({'app1': NodeState('app1', 'enabled', 13)})
+    assert [] == differ.update({'app1': NodeState('app1', 'enabled', 15)})
+    assert [SnapshotChange('app1', warthog.snapshot.CHANGE_CONNECTIONS, 10, 16)] == \
+        differ.update({'app1': NodeState('app1', 'enabled', 16)})
+    assert [SnapshotChange('app1', warthog.snapshot.CHANGE_STATUS, 'enabled', 'down')] == \
+        differ.update({'app1': NodeState('app1', 'down', 17)})
+
+
+def test_load_snapshot_ndjson():
+    stream = io.StringIO(
+        u'{"server": "app1", "status": "enabled", "stats": {"curr-conn": 4}}\n'
+        u'\n'
+        u'{"server": "app2", "status": null, "stats": {}}\n')
+
+    snapshot = warthog.snapshot.load_snapshot(stream)
+
+    assert NodeStats('app1', 'enabled', {'curr-conn': 4}) == snapshot['app1']
+    assert NodeStats('app2', None, {}) == snapshot['app2']
+
+
+def test_load_snapshot_csv():
+    stream = io.StringIO(u'server,status,curr-conn,note\napp1,enabled,4,\napp2,,0.5,x\n')
+
+    snapshot = warthog.snapshot.load_snapshot(stream, fmt='csv')
+
+    assert NodeStats('app1', 'enabled', {'curr-conn': 4}) == snapshot['app1']
+    assert NodeStats('app2', None, {'curr-conn': 0.5, 'note': 'x'}) == snapshot['app2']
+
+
+def test_load_snapshot_unknown_format():
+    with pytest.raises(ValueError):
+        warthog.snapshot.load_snapshot(io.StringIO(u''), fmt='xml')
+
+
+def test_diff_fleet_snapshots():
+    previous = warthog.core.FleetSnapshot({'app1': 'enabled'}, {'app1': {'curr-conn': 4}})
+    current = warthog.core.FleetSnapshot({'app1': 'enabled'}, {'app1': {'curr-conn': 9}})
+
+    assert [SnapshotChange('app1', warthog.snapshot.CHANGE_CONNECTIONS, 4, 9)] == \
+        list(warthog.snapshot.diff_snapshots(previous, current))
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import threading
+
+import mock
+import pytest
+
+import warthog.tokens
+
+SCHEME_HOST = 'https://lb.example.com'
+
+
+@pytest.fixture
+def cache_path(tmpdir):
+    return str(tmpdir.join('warthog', 'tokens'))
+
+
+class FakeKeyringError(Exception):
+    pass
+
+
+class FakeKeyring(object):
+    """In-memory stand in for the keyring module."""
+    errors = mock.Mock(KeyringError=FakeKeyringError)
+
+    def __init__(self, broken=False):
+        self.passwords = {}
+        self.broken = broken
+
+    def set_password(self, service, key, password):
+        if self.broken:
+            raise FakeKeyringError('No recommended backend was available')
+        self.passwords[(service, key)] = password
+
+    def get_password(self, service, key):
+        return self.passwords.get((service, key))
+
+    def delete_password(self, service, key):
+        if (service, key) not in self.passwords:
+            raise FakeKeyringError('Password not found')
+        del self.passwords[(service, key)]
+
+
+class TestTokenCache(object):
+    @pytest.fixture(autouse=True)
+    def no_keyring(self, monkeypatch):
+        monkeypatch.setattr(warthog.tokens, 'keyring', None)
+
+    def test_get_missing(self, cache_path):
+        cache = warthog.tokens.TokenCache(path=cache_path)
+
+        assert cache.get(SCHEME_HOST, 'user') is None
+
+    def test_put_get(self, cache_path):
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        cache.put(SCHEME_HOST, 'user', '1234')
+
+        other = warthog.tokens.TokenCache(path=cache_path)
+        assert '1234' == other.get(SCHEME_HOST, 'user'), 'Expected token to persist'
+        assert other.get(SCHEME_HOST, 'other') is None, 'Expected tokens to be keyed by user'
+
+    def test_file_private(self, cache_path):
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        cache.put(SCHEME_HOST, 'user', '1234')
+
+        assert 0o600 == stat.S_IMODE(os.stat(cache_path).st_mode), 'Expected file mode 0600'
+
+    def test_file_shared_ignored(self, cache_path):
+        warthog.tokens.TokenCache(path=cache_path).put(SCHEME_HOST, 'user', '1234')
+        os.chmod(cache_path, 0o644)
+
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        assert cache.get(SCHEME_HOST, 'user') is None, 'Expected readable cache to be ignored'
+
+    def test_get_expired(self, cache_path):
+        now = [1000.0]
+        cache = warthog.tokens.TokenCache(
+            path=cache_path, ttl=60, clock=lambda: now[0])
+        cache.put(SCHEME_HOST, 'user', '1234')
+        now[0] += 61
+
+        assert cache.get(SCHEME_HOST, 'user') is None, 'Expected token to be expired'
+        assert '1234' == cache.remove(SCHEME_HOST, 'user'), 'Expected expired token to be removed'
+
+    def test_unreadable_cache_ignored(self, cache_path):
+        warthog.tokens.TokenCache(path=cache_path).put(SCHEME_HOST, 'user', '1234')
+        with open(cache_path, 'wb') as handle:
+            handle.write(b'not json')
+
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        assert cache.get(SCHEME_HOST, 'user') is None, 'Expected unparseable cache to be ignored'
+
+    def test_concurrent_writers(self, cache_path):
+        writers = [warthog.tokens.TokenCache(path=cache_path) for _ in range(2)]
+
+        def write(cache, user):
+            for i in range(50):
+                cache.put(SCHEME_HOST, user, str(i))
+
+        threads = [threading.Thread(target=write, args=(cache, 'user{0}'.format(i)))
+                   for i, cache in enumerate(writers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        assert '49' == cache.get(SCHEME_HOST, 'user0'), 'Expected no lost updates'
+        assert '49' == cache.get(SCHEME_HOST, 'user1'), 'Expected no lost updates'
+        assert [] == [name for name in os.listdir(os.path.dirname(cache_path))
+                      if name not in ('tokens', 'tokens.lock')], 'Expected no temporary files'
+
+
+class TestTokenCacheKeyring(object):
+    @pytest.fixture
+    def keyring(self, monkeypatch):
+        fake = FakeKeyring()
+        monkeypatch.setattr(warthog.tokens, 'keyring', fake)
+        return fake
+
+    def test_token_only_in_keyring(self, cache_path, keyring):
+        warthog.tokens.TokenCache(path=cache_path).put(SCHEME_HOST, 'user', 'secret1234')
+
+        with open(cache_path, 'rb') as handle:
+            assert b'secret1234' not in handle.read(), 'Expected no token in the file'
+        assert {('warthog', SCHEME_HOST + ' user'): 'secret1234'} == keyring.passwords
+
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        assert 'secret1234' == cache.get(SCHEME_HOST, 'user')
+        assert 'secret1234' == cache.remove(SCHEME_HOST, 'user')
+        assert {} == keyring.passwords, 'Expected token to be removed from the keyring'
+
+    def test_expired_tokens_removed_from_keyring(self, cache_path, keyring):
+        now = [1000.0]
+        cache = warthog.tokens.TokenCache(path=cache_path, ttl=60, clock=lambda: now[0])
+        cache.put(SCHEME_HOST, 'user', '1234')
+        now[0] += 61
+        cache.put(SCHEME_HOST, 'other', '5678')
+
+        assert {('warthog', SCHEME_HOST + ' other'): '5678'} == keyring.passwords
+
+    def test_broken_keyring_falls_back_to_file(self, cache_path, monkeypatch):
+        monkeypatch.setattr(warthog.tokens, 'keyring', FakeKeyring(broken=True))
+        cache = warthog.tokens.TokenCache(path=cache_path)
+        cache.put(SCHEME_HOST, 'user', '1234')
+
+        assert '1234' == cache.get(SCHEME_HOST, 'user')
+        assert 0o600 == stat.S_IMODE(os.stat(cache_path).st_mode), 'Expected file mode 0600'
+
+    def test_keyring_disabled(self, cache_path, keyring):
+        cache = warthog.tokens.TokenCache(path=cache_path, use_keyring=False)
+        cache.put(SCHEME_HOST, 'user', '1234')
+
+        assert {} == keyring.passwords
+        assert '1234' == cache.get(SCHEME_HOST, 'user')
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+import mock
+import pytest
+
+import warthog.client
+import warthog.core
+import warthog.exceptions
+import warthog.topology
+
+ENABLED = warthog.core.STATUS_ENABLED
+DISABLED = warthog.core.STATUS_DISABLED
+
+
+def _states(statuses):
+    return dict((server, warthog.client.NodeState(server, status, 0))
+                for server, status in statuses.items())
+
+
+@pytest.fixture
+def clock():
+    return mock.Mock(return_value=0.0)
+
+
+@pytest.fixture
+def client():
+    client = mock.Mock(spec=warthog.client.WarthogClient)
+    client.get_service_groups.return_value = {
+        'web': [('app1', 80), ('app2', 80), ('app3', 80)],
+        'api': [('app1', 8080), ('app4', 8080)],
+    }
+    client.get_virtual_servers.return_value = {
+        'vip1': [(443, 'https', 'web'), (8443, 'https', 'api')],
+    }
+    client.get_node_states.return_value = _states({
+        'app1': ENABLED, 'app2': ENABLED, 'app3': DISABLED, 'app4': ENABLED})
+    return client
+
+
+def test_indexes(client, clock):
+    topology = warthog.topology.Topology(client, clock=clock)
+
+    assert ['api', 'web'] == topology.groups('app1')
+    assert ['web'] == topology.groups('app2')
+    assert [] == topology.groups('unknown')
+    assert warthog.topology.Member('app4', 8080) in topology.members('api')
+    assert 'api' == topology.service_group('vip1', 8443, 'https')
+    assert topology.service_group('vip1', 80, 'http') is None
+
+
+def test_remaining_capacity(client, clock):
+    topology = warthog.topology.Topology(client, clock=clock)
+
+    assert {'web': 1, 'api': 1} == topology.remaining_capacity('app1')
+    assert {'web': 1} == topology.remaining_capacity('app2')
+
+
+def test_refresh_only_when_stale(client, clock):
+    topology = warthog.topology.Topology(client, max_age=60.0, status_max_age=5.0, clock=clock)
+
+    topology.groups('app1')
+    clock.return_value = 1.0
+    topology.groups('app1')
+    assert 1 == client.get_service_groups.call_count
+    assert 1 == client.get_node_states.call_count
+
+    clock.return_value = 10.0
+    topology.groups('app1')
+    assert 1 == client.get_service_groups.call_count
+    assert 2 == client.get_node_states.call_count
+
+    clock.return_value = 100.0
+    topology.groups('app1')
+    assert 2 == client.get_service_groups.call_count
+
+
+def test_refresh_updates_changed_groups(client, clock):
+    topology = warthog.topology.Topology(client, clock=clock)
+    topology.refresh()
+
+    client.get_service_groups.return_value = {
+        'web': [('app2', 80), ('app3', 80)],
+    }
+    topology.refresh()
+
+    assert [] == topology.groups('app1')
+    assert ['web'] == topology.groups('app2')
+    assert [] == topology.members('api')
+
+
+def test_claim_marks_server_disabled(client, clock):
+    topology = warthog.topology.Topology(client, clock=clock)
+
+    topology.claim('app1', min_available=1)
+
+    assert DISABLED == topology.status('app1')
+    with pytest.raises(warthog.exceptions.WarthogCapacityError) as e:
+        topology.claim('app2', min_available=1)
+
+    assert 'app2' == e.value.server
+    assert {'web': 0} == e.value.groups
+
+
+def test_claim_survives_refresh_until_confirmed(client, clock):
+    topology = warthog.topology.Topology(client, status_max_age=0, clock=clock)
+    topology.claim('app1', min_available=1)
+
+    # The disable request hasn't reached the load balancer yet
+    topology.refresh_status()
+    assert DISABLED == topology.status('app1'), 'Expected claim to outlive the refresh'
+
+    client.get_node_states.return_value = _states({
+        'app1': DISABLED, 'app2': ENABLED, 'app3': DISABLED, 'app4': ENABLED})
+    topology.refresh_status()
+    client.get_node_states.return_value = _states({
+        'app1': ENABLED, 'app2': ENABLED, 'app3': DISABLED, 'app4': ENABLED})
+    topology.refresh_status()
+    assert ENABLED == topology.status('app1'), 'Expected claim to end once confirmed'
+
+
+def test_release(client, clock):
+    topology = warthog.topology.Topology(client, status_max_age=0, clock=clock)
+    topology.claim('app1', min_available=1)
+    topology.release('app1')
+
+    assert ENABLED == topology.status('app1'), 'Expected released claim to be dropped'
+
+
+def test_concurrent_claims_respect_min_available(client, clock):
+    client.get_service_groups.return_value = {
+        'web': [('app1', 80), ('app2', 80), ('app3', 80), ('app4', 80)],
+    }
+    client.get_virtual_servers.return_value = {}
+
+    # The load balancer never sees the disables land, and every check refreshes
+    def get_node_states():
+        time.sleep(0.01)
+        return _states(dict(('app{0}'.format(i), ENABLED) for i in range(1, 5)))
+    client.get_node_states.side_effect = get_node_states
+    topology = warthog.topology.Topology(client, status_max_age=0, clock=clock)
+
+    start = threading.Event()
+    claimed = []
+
+    def claim(server):
+        start.wait()
+        try:
+            topology.claim(server, min_available=2)
+            claimed.append(server)
+        except warthog.exceptions.WarthogCapacityError:
+            pass
+
+    threads = [threading.Thread(target=claim, args=('app{0}'.format(i),))
+               for i in range(1, 5)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+
+    assert 2 == len(claimed), 'Expected only two servers to be claimed'
+
+
+def test_set_status(client, clock):
+    topology = warthog.topology.Topology(client, clock=clock)
+    topology.claim('app1', min_available=1)
+
+    topology.set_status('app1', ENABLED)
+
+    assert {'web': 1} == topology.remaining_capacity('app2')
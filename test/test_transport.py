@@ -30,3 +30,8 @@ def test_get_transport_factory_with_defaults():
     assert warthog.transport.DEFAULT_SSL_VERSION == adapter.ssl_version, 'Did not get default TLS version'
     assert warthog.transport.DEFAULT_CERT_VERIFY == session.verify, 'Did not get default verify setting'
 
+
+def test_get_transport_factory_shared():
+    factory = warthog.transport.get_transport_factory(shared=True)
+
+    assert factory() is factory(), 'Expected the same session to be returned each time'
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.agent
+~~~~~~~~~~~~~
+
+Long-lived local agent that keeps connections and sessions with load balancers
+warm and serves requests from short-lived processes over a Unix domain socket.
+
+The protocol is newline delimited JSON. Each request is an object with the name
+of a :class:`warthog.client.WarthogClient` method, its arguments, and the path of
+the configuration file describing the load balancer to use. Each response is an
+object with either a ``result`` or an ``error`` key.
+"""
+
+import errno
+import functools
+import json
+import os
+import os.path
+import socket
+import threading
+
+import warthog.client
+import warthog.config
+import warthog.core
+import warthog.exceptions
+# pylint: disable=import-error
+from .packages.six.moves import socketserver
+
+# Default location of the socket the agent listens on and clients connect to.
+DEFAULT_AGENT_SOCKET = os.path.join(os.path.expanduser('~'), '.warthog', 'agent.sock')
+
+# Client methods that may be invoked via the agent. Anything else is rejected.
+AGENT_METHODS = frozenset([
+    'get_status',
+    'get_connections',
+    'disable_server',
+    'enable_server',
+    'get_node_states',
+    'get_node_stats',
+    'get_servers',
+    'get_port_connections',
+    'read_status',
+    'read_connections',
+])
+
+_METHOD_PING = 'ping'
+
+
+def _encode(message):
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+
+def _decode(line):
+    return json.loads(line.decode('utf-8'))
+
+
+def error_to_dict(err):
+    """Convert an exception raised by a client method into a JSON friendly dictionary.
+
+    :param Exception err: Exception to convert
+    :return: Type and attributes of the exception
+    :rtype: dict
+    """
+    return {
+        'type': type(err).__name__,
+        'msg': getattr(err, 'msg', str(err)),
+        'api_msg': getattr(err, 'api_msg', None),
+        'api_code': getattr(err, 'api_code', None),
+        'server': getattr(err, 'server', None),
+        'groups': getattr(err, 'groups', None),
+        'connections': getattr(err, 'connections', None),
+    }
+
+
+def error_from_dict(data):
+    """Convert a dictionary created by :func:`error_to_dict` back into an exception.
+
+    Exceptions from :mod:`warthog.exceptions` are recreated as the same type, all
+    others are converted to :class:`warthog.exceptions.WarthogAgentError`.
+
+    :param dict data: Type and attributes of the exception
+    :return: Exception to raise
+    :rtype: warthog.exceptions.WarthogError
+    """
+    cls = getattr(warthog.exceptions, data.get('type') or '', None)
+    msg = data.get('msg')
+
+    if not isinstance(cls, type) or not issubclass(cls, warthog.exceptions.WarthogError):
+        return warthog.exceptions.WarthogAgentError(
+            'Agent error performing operation ({0}): {1}'.format(data.get('type'), msg))
+    if issubclass(cls, warthog.exceptions.WarthogDrainTimeoutError):
+        return cls(msg, api_msg=data.get('api_msg'), api_code=data.get('api_code'),
+                   server=data.get('server'), connections=data.get('connections'))
+    if issubclass(cls, warthog.exceptions.WarthogNodeError):
+        return cls(msg, api_msg=data.get('api_msg'), api_code=data.get('api_code'),
+                   server=data.get('server'))
+    if issubclass(cls, warthog.exceptions.WarthogApiError):
+        return cls(msg, api_msg=data.get('api_msg'), api_code=data.get('api_code'))
+    if issubclass(cls, warthog.exceptions.WarthogCapacityError):
+        return cls(msg, server=data.get('server'), groups=data.get('groups'))
+    return cls(msg)
+
+
+def _default_client_factory(config, token_cache=None):
+    """Create a client with a shared session, pooled connections, server names resolved
+    from addresses, and unknown servers remembered based on the given configuration file
+    (or the default locations if ``None``), optionally keeping the session in the given
+    token cache.
+    """
+    settings = warthog.config.WarthogConfigLoader(config_file=config).initialize().get_settings()
+    return warthog.client.WarthogClient(
+        settings.scheme_host,
+        settings.username,
+        settings.password,
+        ssl_version=settings.ssl_version,
+        verify=settings.verify,
+        shared_session=True,
+        token_cache=token_cache,
+        reuse_connections=True,
+        resolve_servers=True,
+        negative_cache=warthog.client.NegativeCache())
+
+
+def _is_listening(path):
+    """Return true if something is accepting connections on the Unix domain socket
+    at the given path, false if there is no socket or nothing is listening on it.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except socket.error as e:
+        if e.errno in (errno.ECONNREFUSED, errno.ENOENT):
+            return False
+        raise
+    finally:
+        sock.close()
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+    """Handler for a single client connection, serving requests until the client
+    closes the connection.
+    """
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            self.wfile.write(_encode(self.server.dispatch(line)))
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server that holds one :class:`warthog.client.WarthogClient` per configuration
+    file and invokes methods on it on behalf of requests received over a Unix
+    domain socket.
+
+    Clients are created the first time a configuration file is used and are kept
+    until the server is closed, along with their sessions and connections.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+    daemon_threads = True
+
+    def __init__(self, socket_path=None, client_factory=None, token_cache=None):
+        """Set the path of the socket to listen on and optionally, the factory to
+        use for creating clients and the token cache they should keep sessions in.
+
+        :param str|unicode socket_path: Path to create the socket at. A stale socket
+            left at this path by an agent that is no longer running will be removed.
+        :param callable client_factory: Callable that accepts the path of a configuration
+            file (or ``None``) and returns a client. It is typically only necessary to set
+            this parameter for unit testing purposes.
+        :param warthog.tokens.TokenCache token_cache: Optional cache to keep the sessions
+            of clients created by the default client factory in.
+        :raises warthog.exceptions.WarthogAgentError: If another process is already
+            listening on the socket.
+        """
+        self.socket_path = socket_path if socket_path is not None else DEFAULT_AGENT_SOCKET
+        self._client_factory = client_factory if client_factory is not None else \
+            functools.partial(_default_client_factory, token_cache=token_cache)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+        parent = os.path.dirname(self.socket_path)
+        if parent and not os.path.isdir(parent):
+            os.makedirs(parent, 0o700)
+        if os.path.exists(self.socket_path):
+            if _is_listening(self.socket_path):
+                raise warthog.exceptions.WarthogAgentError(
+                    'An agent is already listening on {0}'.format(self.socket_path))
+            os.unlink(self.socket_path)
+
+        # Create the socket without permissions for anyone else so that there's no
+        # window between binding it and changing its mode where others can connect.
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.__init__(
+                self, self.socket_path, _AgentRequestHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, 0o600)
+
+    def get_client(self, config):
+        """Get the client for the given configuration file, creating it if needed."""
+        with self._lock:
+            client = self._clients.get(config)
+            if client is None:
+                self._logger.info('Creating client for config %s', config)
+                client = self._clients[config] = self._client_factory(config)
+            return client
+
+    def dispatch(self, line):
+        """Parse a single request, invoke the requested client method, and return
+        the response to send back.
+
+        :param bytes line: JSON encoded request
+        :return: Response with either a ``result`` or ``error`` key
+        :rtype: dict
+        """
+        try:
+            request = _decode(line)
+            method = request.get('method')
+            if method == _METHOD_PING:
+                return {'result': 'pong'}
+            if method not in AGENT_METHODS:
+                raise warthog.exceptions.WarthogAgentError(
+                    'Unsupported agent method {0}'.format(method))
+
+            client = self.get_client(request.get('config'))
+            result = getattr(client, method)(*request.get('args', []), **request.get('kwargs', {}))
+            return {'result': result}
+        # pylint: disable=broad-except
+        except Exception as e:
+            self._logger.debug('Error handling agent request: %s', e)
+            return {'error': error_to_dict(e)}
+
+    def server_close(self):
+        """Stop listening, remove the socket, and close all clients."""
+        socketserver.UnixStreamServer.server_close(self)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+class AgentClient(object):
+    """Client with the same interface as :class:`warthog.client.WarthogClient`
+    that forwards each method call to a running agent.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, socket_path=None, config=None, timeout=None):
+        """Set the path of the agent socket, the configuration file the agent should
+        use for requests made by this client, and the socket timeout.
+
+        :param str|unicode socket_path: Path of the socket the agent listens on.
+        :param str|unicode config: Path to the configuration file for the load balancer
+            or ``None`` to use the default locations searched by the agent.
+        :param float|None timeout: Socket timeout in seconds, ``None`` for no timeout.
+        """
+        self._socket_path = socket_path if socket_path is not None else DEFAULT_AGENT_SOCKET
+        self._config = os.path.abspath(config) if config is not None else None
+        self._timeout = timeout
+
+    def _request(self, method, *args, **kwargs):
+        """Send a single request to the agent and return the result or raise the
+        error contained in the response.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(self._socket_path)
+            sock.sendall(_encode({
+                'method': method, 'args': args, 'kwargs': kwargs, 'config': self._config}))
+            reader = sock.makefile('rb')
+            line = reader.readline()
+            reader.close()
+        except (socket.error, IOError) as e:
+            raise warthog.exceptions.WarthogAgentError(
+                'Unable to communicate with agent at {0}: {1}'.format(self._socket_path, e))
+        finally:
+            sock.close()
+
+        if not line:
+            raise warthog.exceptions.WarthogAgentError(
+                'Agent at {0} closed the connection without responding'.format(self._socket_path))
+
+        response = _decode(line)
+        if 'error' in response:
+            raise error_from_dict(response['error'])
+        return response['result']
+
+    def is_running(self):
+        """Return ``True`` if an agent is accepting requests at the socket path.
+
+        :rtype: bool
+        """
+        if not os.path.exists(self._socket_path):
+            return False
+        try:
+            return self._request(_METHOD_PING) == 'pong'
+        except warthog.exceptions.WarthogAgentError:
+            return False
+
+    # pylint: disable=missing-docstring
+    def get_status(self, server):
+        return self._request('get_status', server)
+
+    # pylint: disable=missing-docstring
+    def get_connections(self, server):
+        return self._request('get_connections', server)
+
+    # pylint: disable=missing-docstring
+    def disable_server(self, server, max_retries=5, min_available=None, ports=None,
+                       ignore_ports=None, grace_period=None,
+                       on_grace_expired=warthog.client.ON_GRACE_RETURN):
+        kwargs = {'max_retries': max_retries}
+        if grace_period is not None:
+            kwargs['grace_period'] = grace_period
+            kwargs['on_grace_expired'] = on_grace_expired
+        if min_available is not None:
+            kwargs['min_available'] = min_available
+        if ports is not None:
+            kwargs['ports'] = list(ports)
+        if ignore_ports is not None:
+            kwargs['ignore_ports'] = list(ignore_ports)
+        return self._request('disable_server', server, **kwargs)
+
+    # pylint: disable=missing-docstring
+    def get_port_connections(self, server):
+        ports = self._request('get_port_connections', server)
+        return [warthog.client.PortConnections(*port) for port in ports]
+
+    # pylint: disable=missing-docstring
+    def enable_server(self, server, max_retries=5):
+        return self._request('enable_server', server, max_retries=max_retries)
+
+    # pylint: disable=missing-docstring
+    def get_node_states(self):
+        states = self._request('get_node_states')
+        return dict((server, warthog.client.NodeState(*state)) for server, state in states.items())
+
+    # pylint: disable=missing-docstring
+    def get_node_stats(self):
+        stats = self._request('get_node_stats')
+        return dict((server, warthog.client.NodeStats(*entry)) for server, entry in stats.items())
+
+    # pylint: disable=missing-docstring
+    def read_status(self, server):
+        return warthog.client.Reading(*self._request('read_status', server))
+
+    # pylint: disable=missing-docstring
+    def read_connections(self, server):
+        return warthog.client.Reading(*self._request('read_connections', server))
+
+    # pylint: disable=missing-docstring
+    def get_servers(self, start=0, count=None):
+        servers = self._request('get_servers', start=start, count=count)
+        return [warthog.client.ServerRecord(name, host, status, [tuple(port) for port in ports])
+                for name, host, status, ports in servers]
+
+    # pylint: disable=missing-docstring
+    def iter_servers(self, page_size=100):
+        return warthog.client.iter_pages(self.get_servers, page_size)
+
+    # pylint: disable=missing-docstring
+    def close(self):
+        pass
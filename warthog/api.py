@@ -14,14 +14,40 @@ warthog.api
 Publicly importable API for the Warthog client and library.
 """
 
+from .agent import (
+    AgentClient,
+    AgentServer,
+    DEFAULT_AGENT_SOCKET)
+
 from .core import (
+    FleetSnapshot,
+    SnapshotRow,
     STATUS_DISABLED,
     STATUS_DOWN,
     STATUS_ENABLED)
 
 from .client import (
     CommandFactory,
-    WarthogClient)
+    DeferredLogoff,
+    DrainScheduler,
+    NegativeCache,
+    NodeState,
+    NodeStats,
+    ParallelResult,
+    PortConnections,
+    Reading,
+    SessionPool,
+    ServerRecord,
+    ServerResolver,
+    SessionPoolMetrics,
+    SharedSession,
+    StaleReadCache,
+    StateChange,
+    StatePoller,
+    Subscription,
+    WarthogClient,
+    iter_pages,
+    run_parallel)
 
 from .config import (
     WarthogConfigLoader,
@@ -29,6 +55,28 @@ from .config import (
     DEFAULT_CONFIG_ENCODING,
     DEFAULT_CONFIG_LOCATIONS)
 
+from .rolling import (
+    BatchMetrics,
+    NodeResult,
+    RollingDeployment,
+    RolloutResult,
+    shell_hook)
+
+from .history import StatsHistory
+
+from .snapshot import (
+    SnapshotChange,
+    SnapshotDiffer,
+    diff_snapshots,
+    load_snapshot)
+
+from .tokens import TokenCache
+
+from .topology import (
+    Member,
+    Topology,
+    VirtualPort)
+
 from .transport import get_transport_factory
 
 from .exceptions import (
@@ -39,21 +87,52 @@ from .exceptions import (
     WarthogNodeError,
     WarthogNodeStatusError,
     WarthogNoSuchNodeError,
+    WarthogDrainTimeoutError,
     WarthogPermissionError,
+    WarthogSessionPoolTimeoutError,
+    WarthogAgentError,
+    WarthogRollingError,
+    WarthogCapacityError,
     WarthogConfigError,
     WarthogMalformedConfigFileError,
     WarthogNoConfigFileError)
 
 
 __all__ = [
+    # warthog.agent
+    'AgentClient',
+    'AgentServer',
+    'DEFAULT_AGENT_SOCKET',
+
     # warthog.core
+    'FleetSnapshot',
+    'SnapshotRow',
     'STATUS_DISABLED',
     'STATUS_DOWN',
     'STATUS_ENABLED',
 
     # warthog.client
     'CommandFactory',
+    'DeferredLogoff',
+    'DrainScheduler',
+    'NegativeCache',
+    'NodeState',
+    'NodeStats',
+    'ParallelResult',
+    'PortConnections',
+    'Reading',
+    'SessionPool',
+    'ServerRecord',
+    'ServerResolver',
+    'SessionPoolMetrics',
+    'SharedSession',
+    'StaleReadCache',
+    'StateChange',
+    'StatePoller',
+    'Subscription',
     'WarthogClient',
+    'iter_pages',
+    'run_parallel',
 
     # warthog.config
     'WarthogConfigLoader',
@@ -61,6 +140,30 @@ __all__ = [
     'DEFAULT_CONFIG_ENCODING',
     'DEFAULT_CONFIG_LOCATIONS',
 
+    # warthog.rolling
+    'BatchMetrics',
+    'NodeResult',
+    'RollingDeployment',
+    'RolloutResult',
+    'shell_hook',
+
+    # warthog.history
+    'StatsHistory',
+
+    # warthog.snapshot
+    'SnapshotChange',
+    'SnapshotDiffer',
+    'diff_snapshots',
+    'load_snapshot',
+
+    # warthog.tokens
+    'TokenCache',
+
+    # warthog.topology
+    'Member',
+    'Topology',
+    'VirtualPort',
+
     # warthog.transport
     'get_transport_factory',
 
@@ -72,7 +175,12 @@ __all__ = [
     'WarthogNodeError',
     'WarthogNodeStatusError',
     'WarthogNoSuchNodeError',
+    'WarthogDrainTimeoutError',
     'WarthogPermissionError',
+    'WarthogSessionPoolTimeoutError',
+    'WarthogAgentError',
+    'WarthogRollingError',
+    'WarthogCapacityError',
     'WarthogConfigError',
     'WarthogMalformedConfigFileError',
     'WarthogNoConfigFileError'
@@ -12,17 +12,54 @@ warthog.cli
 ~~~~~~~~~~~
 
 CLI interface for interacting with a load balancer using the Warthog client.
+
+Only modules that are cheap to import are imported at module load. The client,
+transport layer (and the requests library), token cache, and agent are imported
+by the commands that need them so that commands like ``config-path`` or ``--version``
+start quickly.
 """
+import collections
 import functools
 import os
 import os.path
+import shlex
+import signal
+import sys
+import time
 
 import click
-import requests
 
 import warthog
-import warthog.api
-from .packages import six
+import warthog.exceptions
+
+
+def _connection_errors():
+    """Get a tuple of the connection error types that may have been raised while
+    making requests to the load balancer. If the requests library hasn't been
+    loaded, no requests could have been made and the tuple is empty.
+    """
+    requests = sys.modules.get('requests')
+    return (requests.ConnectionError,) if requests is not None else ()
+
+
+def _command_errors():
+    """Get a tuple of the error types that a single client operation may raise and
+    that should fail only that operation: errors from the client, the transport layer,
+    and malformed responses from the load balancer.
+    """
+    requests = sys.modules.get('requests')
+    transport = (requests.RequestException,) if requests is not None else ()
+    return (click.ClickException, warthog.exceptions.WarthogError,
+            KeyError, ValueError, TypeError) + transport
+
+
+def _with_cause(err, cause):
+    """Record the type and API error code (if any) of the original error on the
+    click exception that replaces it, for use in machine readable output.
+    """
+    err.error_type = type(cause).__name__
+    err.api_code = getattr(cause, 'api_code', None)
+    return err
 
 
 def error_wrapper(func):
@@ -35,18 +72,84 @@ def error_wrapper(func):
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
-        except warthog.api.WarthogNoSuchNodeError as e:
-            raise click.BadParameter("{0} doesn't appear to be a known node".format(e.server))
-        except warthog.api.WarthogAuthFailureError as e:
-            raise click.ClickException(
-                "Authentication with the load balancer failed. The error was: {0}".format(e))
-        except requests.ConnectionError as e:
-            raise click.ClickException(
-                "Connecting to the load balancer failed. The error was {0}".format(e))
+        except warthog.exceptions.WarthogNoSuchNodeError as e:
+            raise _with_cause(click.BadParameter(
+                "{0} doesn't appear to be a known node".format(e.server)), e)
+        except warthog.exceptions.WarthogAuthFailureError as e:
+            raise _with_cause(click.ClickException(
+                "Authentication with the load balancer failed. The error was: {0}".format(e)), e)
+        except warthog.exceptions.WarthogAgentError as e:
+            raise _with_cause(click.ClickException(
+                "Communicating with the Warthog agent failed. The error was: {0}".format(e)), e)
+        except warthog.exceptions.WarthogCapacityError as e:
+            raise _with_cause(click.ClickException(str(e)), e)
+        except warthog.exceptions.WarthogDrainTimeoutError as e:
+            raise _with_cause(click.ClickException(
+                "Draining {0} did not finish within the grace period. The error was: {1}".format(
+                    e.server, e)), e)
+        except _connection_errors() as e:
+            raise _with_cause(click.ClickException(
+                "Connecting to the load balancer failed. The error was {0}".format(e)), e)
 
     return wrapper
 
 
+OUTPUT_TEXT = 'text'
+
+OUTPUT_JSON = 'json'
+
+OUTPUT_NDJSON = 'ndjson'
+
+
+class RecordWriter(object):
+    """Writer for machine readable output that writes each record as soon as it
+    is available instead of collecting all of them first.
+
+    In ``ndjson`` mode, each record is written as a JSON object on its own line. In
+    ``json`` mode, records are written as elements of a single JSON array that is
+    closed by :meth:`close`.
+    """
+
+    def __init__(self, fmt, stream=None):
+        self._fmt = fmt
+        self._stream = stream
+        self._count = 0
+
+    def write(self, record):
+        """Write a single record (a JSON serializable dictionary) and flush it."""
+        import json
+
+        line = json.dumps(record, sort_keys=True)
+        if self._fmt == OUTPUT_JSON:
+            line = ('[' if self._count == 0 else ',') + line
+
+        click.echo(line, file=self._stream)
+        self._count += 1
+
+    def close(self):
+        """Finish writing output, closing the JSON array in ``json`` mode."""
+        if self._fmt == OUTPUT_JSON:
+            click.echo('[]' if self._count == 0 else ']', file=self._stream)
+
+
+def error_record(err):
+    """Get the error message, type, and API error code for an error raised by a
+    client operation as a dictionary to include in machine readable output.
+    """
+    from .packages import six
+
+    if isinstance(err, click.ClickException):
+        message = err.format_message()
+    else:
+        message = six.text_type(err)
+
+    return {
+        'error': message,
+        'error_type': getattr(err, 'error_type', type(err).__name__),
+        'error_code': getattr(err, 'api_code', None),
+    }
+
+
 class WarthogClientFacade(object):
     """Wrapper around a :class:`warthog.client.WarthogClient` that coverts
     exceptions encountered into exceptions that click will handle automatically.
@@ -75,6 +178,36 @@ class WarthogClientFacade(object):
     def enable_server(self, *args, **kwargs):
         return self._client.enable_server(*args, **kwargs)
 
+    # pylint: disable=missing-docstring
+    @error_wrapper
+    def get_node_states(self, *args, **kwargs):
+        return self._client.get_node_states(*args, **kwargs)
+
+    # pylint: disable=missing-docstring
+    @error_wrapper
+    def get_node_stats(self, *args, **kwargs):
+        return self._client.get_node_stats(*args, **kwargs)
+
+    # pylint: disable=missing-docstring
+    def iter_servers(self, *args, **kwargs):
+        servers = iter(self._client.iter_servers(*args, **kwargs))
+        fetch = error_wrapper(lambda: next(servers, None))
+
+        while True:
+            server = fetch()
+            if server is None:
+                return
+            yield server
+
+    # pylint: disable=missing-docstring
+    @error_wrapper
+    def logout(self, *args, **kwargs):
+        return self._client.logout(*args, **kwargs)
+
+    # pylint: disable=missing-docstring
+    def close(self):
+        return self._client.close()
+
 
 @click.group()
 @click.version_option(version=warthog.__version__)
@@ -87,47 +220,112 @@ class WarthogClientFacade(object):
     help=('Enable warnings from underlying libraries when running on older Python '
           'versions known to cause intermittent failures of SSL/TLS connections.'),
     is_flag=True)
-# pylint: disable=unused-argument
-def main(config, enable_platform_warning):
+@click.option(
+    '--token-cache',
+    help=('Reuse the session with the load balancer between invocations by keeping '
+          'it in the keyring of the OS or a private cache file. Use "logout" to end it.'),
+    envvar='WARTHOG_TOKEN_CACHE',
+    is_flag=True)
+@click.option(
+    '--agent-socket',
+    help=('Path to the socket of a running Warthog agent to forward commands to. '
+          'Default is ~/.warthog/agent.sock'),
+    envvar='WARTHOG_AGENT_SOCKET',
+    type=click.Path(dir_okay=False))
+@click.option(
+    '--no-agent',
+    help='Do not forward commands to a Warthog agent even if one is running.',
+    is_flag=True)
+@click.option(
+    '--output',
+    help=('Output format. "json" and "ndjson" write a record per server (or batch '
+          'command) as soon as it completes. Default is "text".'),
+    envvar='WARTHOG_OUTPUT',
+    type=click.Choice([OUTPUT_TEXT, OUTPUT_JSON, OUTPUT_NDJSON]),
+    default=OUTPUT_TEXT)
+# Options are only used by subcommands when they create a client (see get_context_client)
+# so that help and commands that don't talk to the load balancer start quickly.
+# pylint: disable=unused-argument,too-many-arguments
+def main(config, enable_platform_warning, token_cache, agent_socket, no_agent, output):
     """Interact with a load balancer using the Warthog client."""
-    # We don't actually do anything with the config file argument at this point.
-    # The idea here is that we shouldn't be parsing the config file until we really
-    # need it (like when we're creating a client instance). This allows us to display
-    # help for subcommands without requiring the user to set up a config file first
-    # (which would be really annoying).
+
+
+def get_context_client(ctx, token_cache=None, shared_session=False, use_agent=True):
+    """Construct a new wrapped client based on the options given to the main command,
+    optionally overriding whether the token cache is used and sharing a single session
+    and pool of connections between all operations. If ``use_agent`` is false, the
+    client never forwards operations to an agent.
+    """
+    import warthog.agent
+
+    params = ctx.find_root().params
+    agent_socket = None
+    if use_agent and not params['no_agent']:
+        agent_socket = params['agent_socket'] or warthog.agent.DEFAULT_AGENT_SOCKET
+
+    return get_client(
+        params['config'],
+        token_cache=params['token_cache'] if token_cache is None else token_cache,
+        agent_socket=agent_socket,
+        platform_warning=params['enable_platform_warning'],
+        shared_session=shared_session)
+
+
+# pylint: disable=too-many-arguments
+def get_client(config, token_cache=False, agent_socket=None, platform_warning=True,
+               shared_session=False):
+    """Construct a new wrapped client based on the specified config file, optionally
+    keeping the session with the load balancer in the default token cache or forwarding
+    operations to an agent listening at the given socket if there is one running.
+    Optionally, a single session and pool of connections may be shared between all
+    operations performed by the client.
+    """
+    if agent_socket is not None:
+        import warthog.agent
+
+        agent = warthog.agent.AgentClient(socket_path=agent_socket, config=config)
+        if agent.is_running():
+            return WarthogClientFacade(agent)
+
+    import warthog.client
+    import warthog.config
+    import warthog.tokens
+    from .packages import six
 
     # Unless the user has specifically asked for this warning, we disable it because
     # it makes the CLI unusable on Python 2.6 or Python 2.7 < 2.7.9 (which is what CentOS
     # runs ATM).
-    if not enable_platform_warning:
+    if not platform_warning:
         disable_platform_warning()
 
-
-def get_client(config):
-    """Construct a new wrapped client based on the specified config file."""
-    # Passing the config file unconditionally here since if the user hasn't
-    # specified one it'll be None and the config loader will use the default
-    # locations.
-    loader = warthog.api.WarthogConfigLoader(config_file=config)
+    # We don't parse the config file until we're creating a client instance so that
+    # help for subcommands can be displayed without the user setting up a config file
+    # first (which would be really annoying). Passing the config file unconditionally
+    # here since if the user hasn't specified one it'll be None and the config loader
+    # will use the default locations.
+    loader = warthog.config.WarthogConfigLoader(config_file=config)
 
     try:
         # Expected errors that might be raised during parsing. These will
         # already have nice user-facing messages so we just reraise them as
         # BadParameter exceptions with the same message.
         loader.initialize()
-    except warthog.api.WarthogConfigError as e:
+    except warthog.exceptions.WarthogConfigError as e:
         raise click.ClickException(six.text_type(e))
 
     settings = loader.get_settings()
 
     # Wrap the client in a facade that translates expected errors into
     # exceptions that click will render as error messages for the user.
-    return WarthogClientFacade(warthog.api.WarthogClient(
+    return WarthogClientFacade(warthog.client.WarthogClient(
         settings.scheme_host,
         settings.username,
         settings.password,
         ssl_version=settings.ssl_version,
-        verify=settings.verify))
+        verify=settings.verify,
+        token_cache=warthog.tokens.TokenCache() if token_cache else None,
+        shared_session=shared_session,
+        reuse_connections=shared_session))
 
 
 def disable_platform_warning():
@@ -142,44 +340,893 @@ def disable_platform_warning():
     warnings.filterwarnings("ignore", category=InsecurePlatformWarning)
 
 
+# Outcome of running a CLI operation against a single server: whether it succeeded,
+# the message to print in text mode (or None), and fields to include in JSON output.
+ServerResult = collections.namedtuple('ServerResult', ['ok', 'message', 'fields'])
+
+
+def multi_server_options(func):
+    """Decorator that adds arguments and options to a command for specifying one
+    or more servers to operate on and how many to operate on at once.
+    """
+    func = click.argument('servers', nargs=-1)(func)
+    func = click.option(
+        '--from-file',
+        help='Read servers to operate on from a file, one per line. Use "-" for stdin.',
+        type=click.File('r'))(func)
+    func = click.option(
+        '-j', '--jobs',
+        help='Number of servers to operate on at once. Default is 1.',
+        type=click.IntRange(min=1),
+        default=1)(func)
+    return func
+
+
+def get_servers(servers, from_file):
+    """Combine servers given as arguments with those read from a file (ignoring
+    blank lines and comments) and make sure there is at least one.
+    """
+    out = list(servers)
+    if from_file is not None:
+        for line in from_file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                out.append(line)
+
+    if not out:
+        raise click.UsageError('At least one server must be given')
+    return out
+
+
+def run_for_servers(ctx, command, servers, jobs, operation):
+    """Run an operation for each server, printing output for each as it completes
+    and exiting with a non-zero status if the operation failed for any server.
+
+    The operation is called with a client and a server name and must return a
+    :class:`ServerResult`. Messages for failures should include the name of the server.
+
+    In text mode, when a single server is given, the output and any errors are
+    exactly what they would be for a single operation. When multiple servers are
+    given, every server is attempted, output for successes is prefixed with the
+    server name, failures are printed to stderr, and a summary of failures is
+    printed at the end.
+
+    In JSON modes, a record is written for every server as it completes. All servers
+    share a single client, session, and pool of connections.
+    """
+    import warthog.client
+
+    fmt = ctx.find_root().params['output']
+    if fmt == OUTPUT_TEXT and len(servers) == 1:
+        res = operation(get_context_client(ctx), servers[0])
+        if res.message is not None:
+            click.echo(res.message)
+        if not res.ok:
+            ctx.exit(1)
+        return
+
+    client = get_context_client(ctx, shared_session=len(servers) > 1)
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+    failures = 0
+
+    try:
+        for res in warthog.client.run_parallel(
+                lambda server: operation(client, server), servers, jobs=jobs):
+            ok = res.error is None and res.result.ok
+            if not ok:
+                failures += 1
+
+            if writer is not None:
+                record = {'command': command, 'server': res.item, 'ok': ok,
+                          'duration': round(res.duration, 3)}
+                if res.error is not None:
+                    record.update(error_record(res.error))
+                else:
+                    record.update(res.result.fields)
+                writer.write(record)
+            elif res.error is not None:
+                error = error_record(res.error)['error']
+                click.echo('{0}: Error: {1}'.format(res.item, error), err=True)
+            elif not ok:
+                click.echo(res.result.message, err=True)
+            elif res.result.message is not None:
+                click.echo('{0}: {1}'.format(res.item, res.result.message))
+    finally:
+        client.close()
+        if writer is not None:
+            writer.close()
+
+    if failures:
+        if writer is None:
+            click.echo('{0} of {1} servers failed'.format(failures, len(servers)), err=True)
+        ctx.exit(1)
+
+
+@click.command()
+@multi_server_options
+@click.pass_context
+def enable(ctx, servers, from_file, jobs):
+    """Enable one or more servers by hostname."""
+
+    # pylint: disable=missing-docstring
+    def operation(client, server):
+        if client.enable_server(server):
+            return ServerResult(True, None, {'enabled': True})
+        return ServerResult(False, '{0} could not be enabled'.format(server), {'enabled': False})
+
+    run_for_servers(ctx, 'enable', get_servers(servers, from_file), jobs, operation)
+
+
+# pylint: disable=unused-argument
+def validate_grace_period(ctx, param, value):
+    """Make sure a grace period, if given, is not negative. Checked with a callback
+    since click 6 has no FloatRange type.
+    """
+    if value is not None and value < 0:
+        raise click.BadParameter(
+            '{0} must be at least 0 seconds'.format(value), param_hint='--grace-period')
+    return value
+
+
+@click.command()
+@multi_server_options
+@click.option(
+    '--min-available',
+    help=('Refuse to disable a server unless at least this many other members of each '
+          'of its service groups are up. Default is not to check.'),
+    type=click.IntRange(min=0))
+@click.option(
+    '--port', 'ports',
+    help='Only wait for connections to this port to close. May be given more than once.',
+    type=int,
+    multiple=True)
+@click.option(
+    '--ignore-port', 'ignore_ports',
+    help=('Do not wait for connections to this port (e.g. a monitoring port) to close. '
+          'May be given more than once.'),
+    type=int,
+    multiple=True)
+@click.option(
+    '--grace-period',
+    help=('Max number of seconds to wait for connections to close. Default is to wait '
+          'a fixed number of times.'),
+    type=float,
+    callback=validate_grace_period)
+@click.option(
+    '--on-grace-expired',
+    help=('What to do if there are still connections when the grace period ends: reset '
+          'them ("force"), fail ("fail"), or report the server as not drained ("return"). '
+          'Default is "return".'),
+    type=click.Choice(['force', 'fail', 'return']),
+    default='return')
+@click.pass_context
+# pylint: disable=too-many-arguments
+def disable(ctx, servers, from_file, jobs, min_available, ports, ignore_ports, grace_period,
+            on_grace_expired):
+    """Disable one or more servers by hostname."""
+    kwargs = {}
+    if grace_period is not None:
+        kwargs['grace_period'] = grace_period
+        kwargs['on_grace_expired'] = on_grace_expired
+    if min_available is not None:
+        kwargs['min_available'] = min_available
+    if ports:
+        kwargs['ports'] = list(ports)
+    if ignore_ports:
+        kwargs['ignore_ports'] = list(ignore_ports)
+
+    # pylint: disable=missing-docstring
+    def operation(client, server):
+        if client.disable_server(server, **kwargs):
+            return ServerResult(True, None, {'disabled': True})
+        return ServerResult(
+            False, '{0} could not be disabled'.format(server), {'disabled': False})
+
+    run_for_servers(ctx, 'disable', get_servers(servers, from_file), jobs, operation)
+
+
+@click.command()
+@multi_server_options
+@click.pass_context
+def status(ctx, servers, from_file, jobs):
+    """Get the status of one or more servers by hostname."""
+
+    # pylint: disable=missing-docstring
+    def operation(client, server):
+        value = client.get_status(server)
+        return ServerResult(True, value, {'status': value})
+
+    run_for_servers(ctx, 'status', get_servers(servers, from_file), jobs, operation)
+
+
+@click.command()
+@multi_server_options
+@click.pass_context
+def connections(ctx, servers, from_file, jobs):
+    """Get active connections to one or more servers by hostname."""
+
+    # pylint: disable=missing-docstring
+    def operation(client, server):
+        value = client.get_connections(server)
+        return ServerResult(True, value, {'connections': value})
+
+    run_for_servers(ctx, 'connections', get_servers(servers, from_file), jobs, operation)
+
+
+def _batch_wait_drained(client, server, timeout, interval):
+    """Poll the active connections to a server until there are none or the timeout expires."""
+    deadline = time.time() + float(timeout)
+    while True:
+        conns = client.get_connections(server)
+        if conns == 0:
+            return True, 'drained'
+        if time.time() >= deadline:
+            return False, 'not drained after {0} seconds ({1} connections)'.format(timeout, conns)
+        time.sleep(interval)
+
+
+def run_batch_command(client, name, args, interval):
+    """Run a single parsed batch command and return a tuple of success and the result."""
+    server = args[0]
+
+    if name == 'disable':
+        ok = client.disable_server(server)
+        return ok, 'disabled' if ok else 'could not be disabled'
+    if name == 'enable':
+        ok = client.enable_server(server)
+        return ok, 'enabled' if ok else 'could not be enabled'
+    if name == 'status':
+        return True, client.get_status(server)
+    if name == 'connections':
+        return True, client.get_connections(server)
+    if name == 'wait-drained':
+        return _batch_wait_drained(client, server, args[1], interval)
+
+    raise ValueError('unknown command {0}'.format(name))
+
+
+# Commands supported in batch scripts and the number of arguments (including
+# the server) expected by each
+BATCH_COMMANDS = {
+    'disable': 1,
+    'enable': 1,
+    'status': 1,
+    'connections': 1,
+    'wait-drained': 2,
+}
+
+
+def parse_batch_line(line):
+    """Parse a single line of a batch script into a command and arguments, returning
+    ``None`` for blank lines and comments.
+
+    :raises ValueError: If the command is unknown or has the wrong number of arguments.
+    """
+    parts = shlex.split(line, comments=True)
+    if not parts:
+        return None
+
+    name, args = parts[0], parts[1:]
+    if name not in BATCH_COMMANDS:
+        raise ValueError('unknown command {0}'.format(name))
+    if len(args) != BATCH_COMMANDS[name]:
+        raise ValueError('{0} expects {1} argument(s), got {2}'.format(
+            name, BATCH_COMMANDS[name], len(args)))
+    if name == 'wait-drained':
+        float(args[1])
+    return name, args
+
+
 @click.command()
-@click.argument('server')
+@click.argument('script', type=click.File('r'), default='-')
+@click.option(
+    '--stop-on-error',
+    help='Stop running commands after the first one that fails.',
+    is_flag=True)
+@click.option(
+    '--interval',
+    help='Seconds to wait between checks for wait-drained commands. Default is 2.',
+    type=float,
+    default=2.0)
 @click.pass_context
-def enable(ctx, server):
-    """Enable a server by hostname."""
-    client = get_client(ctx.parent.params['config'])
-    if not client.enable_server(server):
-        click.echo('{0} could not be enabled'.format(server))
+def batch(ctx, script, stop_on_error, interval):
+    """Run commands read from a file or stdin over a single session.
+
+    Each line of SCRIPT (default stdin) is one of "disable SERVER", "enable SERVER",
+    "status SERVER", "connections SERVER", or "wait-drained SERVER TIMEOUT". A result
+    line is printed as each command completes.
+    """
+    fmt = ctx.find_root().params['output']
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+    client = get_context_client(ctx, shared_session=True)
+    failures = 0
+
+    try:
+        for num, line in enumerate(script, 1):
+            error = None
+            start = time.time()
+            try:
+                parsed = parse_batch_line(line)
+            except ValueError as e:
+                parsed, ok, result = None, False, 'line {0}: {1}'.format(num, e)
+            else:
+                if parsed is None:
+                    continue
+                name, args = parsed
+                try:
+                    ok, result = run_batch_command(client, name, args, interval)
+                except _command_errors() as e:
+                    error, ok, result = e, False, 'error: {0}'.format(error_record(e)['error'])
+
+            if writer is not None:
+                record = {'line': num, 'ok': ok, 'duration': round(time.time() - start, 3)}
+                if parsed is not None:
+                    record.update({'command': parsed[0], 'server': parsed[1][0]})
+                if error is not None:
+                    record.update(error_record(error))
+                elif not ok:
+                    record['error'] = result
+                else:
+                    record['result'] = result
+                writer.write(record)
+            else:
+                label = ' '.join([parsed[0], parsed[1][0]]) if parsed is not None else 'batch'
+                click.echo('{0}: {1}'.format(label, result), err=not ok)
+
+            if not ok:
+                failures += 1
+                if stop_on_error:
+                    break
+    finally:
+        client.close()
+        if writer is not None:
+            writer.close()
+
+    if failures:
         ctx.exit(1)
 
 
+def watch_rows(states, servers=None):
+    """Get the state of each of the given servers (or all servers, sorted by name, if
+    ``None``) from the result of a bulk request. Servers the load balancer doesn't know
+    about have a status and number of connections of ``None``.
+    """
+    import warthog.client
+
+    names = sorted(states) if servers is None else servers
+    return [states.get(name) or warthog.client.NodeState(name, None, None) for name in names]
+
+
+def watch_changes(previous, rows):
+    """Yield a record for each row with a status or number of connections different
+    from the previous refresh, and for each previously seen server that is gone.
+
+    :param dict previous: Server name to the row from the previous refresh.
+    :param list rows: Rows from the current refresh.
+    """
+    seen = set()
+    for row in rows:
+        seen.add(row.server)
+        if previous.get(row.server) != row:
+            yield {'server': row.server, 'status': row.status, 'connections': row.connections}
+
+    for server in sorted(set(previous) - seen):
+        yield {'server': server, 'status': None, 'connections': None}
+
+
+def print_watch_table(rows):
+    """Print a compact table of the status and connections of each server."""
+    width = max([len('SERVER')] + [len(row.server) for row in rows])
+    fmt = '{0:<' + str(width) + '}  {1:<9}  {2:>11}'
+
+    click.echo(time.strftime('%Y-%m-%d %H:%M:%S'))
+    click.echo(fmt.format('SERVER', 'STATUS', 'CONNECTIONS'))
+    for row in rows:
+        click.echo(fmt.format(
+            row.server,
+            row.status if row.status is not None else 'unknown',
+            row.connections if row.connections is not None else '-'))
+
+
+@click.command()
+@click.argument('servers', nargs=-1)
+@click.option(
+    '--from-file',
+    help='File to read server host names from, one per line. Use "-" for stdin.',
+    type=click.File('r'))
+@click.option(
+    '--all', 'all_servers',
+    help='Watch every server known to the load balancer.',
+    is_flag=True)
+@click.option(
+    '--interval',
+    help='Seconds to wait between refreshes. Default is 2.',
+    type=float,
+    default=2.0)
+@click.option(
+    '--count',
+    help='Stop after this many refreshes. Default is to run until interrupted.',
+    type=click.IntRange(min=0),
+    default=0)
+@click.pass_context
+# pylint: disable=too-many-arguments
+def watch(ctx, servers, from_file, all_servers, interval, count):
+    """Show status and connections of servers as they change.
+
+    Every refresh uses two bulk requests over a single session, no matter how many
+    servers are watched. In text mode, a table of every server is printed on each
+    refresh. With --output json or ndjson, a record is written only for servers whose
+    status or number of connections changed since the previous refresh.
+    """
+    if all_servers and (servers or from_file is not None):
+        raise click.UsageError('Servers cannot be given along with --all')
+    names = None if all_servers else get_servers(servers, from_file)
+
+    fmt = ctx.find_root().params['output']
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+    client = get_context_client(ctx, shared_session=True)
+    clear = writer is None and sys.stdout.isatty()
+    previous = {}
+    refreshes = 0
+
+    try:
+        while True:
+            rows = watch_rows(client.get_node_states(), names)
+            if writer is not None:
+                now = round(time.time(), 3)
+                for record in watch_changes(previous, rows):
+                    record['time'] = now
+                    writer.write(record)
+            else:
+                if clear:
+                    click.clear()
+                elif refreshes:
+                    click.echo()
+                print_watch_table(rows)
+
+            previous = dict((row.server, row) for row in rows)
+            refreshes += 1
+            if count and refreshes >= count:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        if writer is not None:
+            writer.close()
+
+
+SNAPSHOT_NDJSON = 'ndjson'
+
+SNAPSHOT_CSV = 'csv'
+
+
+def open_snapshot(path, compress):
+    """Open a text stream for writing a snapshot to the given path (or stdout
+    if ``-``), optionally compressing it with gzip.
+
+    The stream is a UTF-8 :mod:`codecs` writer around a binary file since gzip files
+    can't be wrapped with :class:`io.TextIOWrapper` on Python 2.
+    """
+    import codecs
+
+    if not compress:
+        raw = click.open_file(path, 'wb')
+    else:
+        import gzip
+
+        if path == '-':
+            # Closing the gzip stream finishes it without closing stdout
+            raw = gzip.GzipFile(fileobj=click.open_file('-', 'wb'), mode='wb')
+        else:
+            raw = gzip.open(path, 'wb')
+    return codecs.getwriter('utf-8')(raw)
+
+
+def snapshot_format(path):
+    """Get the format of a snapshot from the name of its file, ``csv`` if the name ends
+    in .csv or .csv.gz, ``ndjson`` otherwise.
+    """
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    return SNAPSHOT_CSV if name.endswith('.csv') else SNAPSHOT_NDJSON
+
+
+def read_snapshot(path):
+    """Read a snapshot written by the ``snapshot`` command from the given path (or
+    stdin if ``-``), decompressing it if the name ends in .gz.
+    """
+    import codecs
+    import warthog.snapshot
+
+    if path.endswith('.gz'):
+        import gzip
+
+        raw = gzip.open(path, 'rb')
+    else:
+        raw = click.open_file(path, 'rb')
+    stream = codecs.getreader('utf-8')(raw)
+
+    try:
+        return warthog.snapshot.load_snapshot(stream, fmt=snapshot_format(path))
+    finally:
+        stream.close()
+
+
+def write_snapshot(stream, fmt, nodes):
+    """Write the status and statistics of each server to the given stream one record
+    at a time, in order of server name, and return the number of records written.
+
+    :param stream: Text stream to write to.
+    :param str fmt: Either ``ndjson`` or ``csv``.
+    :param dict nodes: Server name to :class:`warthog.client.NodeStats`.
+    """
+    import warthog.snapshot
+
+    names = sorted(nodes)
+
+    if fmt == SNAPSHOT_CSV:
+        fields = set()
+        for node in nodes.values():
+            fields.update(node.stats)
+
+        # pylint: disable=protected-access
+        writer = warthog.snapshot._CsvWriter(stream, ['server', 'status'] + sorted(fields))
+        for name in names:
+            row = dict(nodes[name].stats)
+            row.update({'server': name, 'status': nodes[name].status})
+            writer.writerow(row)
+    else:
+        writer = RecordWriter(OUTPUT_NDJSON, stream=stream)
+        for name in names:
+            writer.write({'server': name, 'status': nodes[name].status,
+                          'stats': nodes[name].stats})
+
+    return len(names)
+
+
+@click.command()
+@click.option(
+    '--out',
+    help='File to write the snapshot to. Use "-" for stdout.',
+    type=click.Path(dir_okay=False, writable=True, allow_dash=True),
+    required=True)
+@click.option(
+    '--format', 'fmt',
+    help=('Format of the snapshot. Default is "csv" if the file name ends in .csv '
+          'or .csv.gz, "ndjson" otherwise.'),
+    type=click.Choice([SNAPSHOT_NDJSON, SNAPSHOT_CSV]))
+@click.option(
+    '--gzip', 'compress',
+    help='Compress the snapshot with gzip. Default is true if the file name ends in .gz.',
+    is_flag=True)
+@click.pass_context
+def snapshot(ctx, out, fmt, compress):
+    """Write the status and stats of every server to a file.
+
+    The status and stats of all servers are fetched with two bulk requests and written
+    one record per server, as NDJSON or CSV.
+    """
+    compress = compress or out.endswith('.gz')
+    if fmt is None:
+        fmt = snapshot_format(out)
+
+    client = get_context_client(ctx)
+    try:
+        nodes = client.get_node_stats()
+    finally:
+        client.close()
+
+    stream = open_snapshot(out, compress)
+    try:
+        count = write_snapshot(stream, fmt, nodes)
+    finally:
+        stream.close()
+
+    if out != '-':
+        click.echo('Wrote {0} servers to {1}'.format(count, out), err=True)
+
+
+@click.command('diff')
+@click.argument('before', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.argument('after', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option(
+    '--threshold',
+    help=('Only show changes in the number of active connections of a server larger '
+          'than this. Default is 0.'),
+    type=click.IntRange(min=0),
+    default=0)
+@click.pass_context
+def diff_snapshots(ctx, before, after, threshold):
+    """Show changes between two snapshots.
+
+    Compare two files written by the snapshot command and show servers that were added
+    or removed, changes in status, and changes in the number of active connections.
+    With --output json or ndjson, a record is written for each change.
+    """
+    import warthog.snapshot
+
+    if before == '-' and after == '-':
+        raise click.UsageError('Only one snapshot can be read from stdin')
+
+    fmt = ctx.find_root().params['output']
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+    changes = warthog.snapshot.diff_snapshots(
+        read_snapshot(before), read_snapshot(after), threshold=threshold)
+
+    try:
+        for change in changes:
+            if writer is not None:
+                writer.write({'server': change.server, 'change': change.kind,
+                              'previous': change.previous, 'current': change.current})
+            else:
+                click.echo('{0}  {1}  {2} -> {3}'.format(
+                    change.server, change.kind, change.previous, change.current))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+@click.command('servers')
+@click.option(
+    '--page-size',
+    help='Number of servers to get from the load balancer with each request. Default is 100.',
+    type=click.IntRange(min=1),
+    default=100)
+@click.pass_context
+def list_servers(ctx, page_size):
+    """List every server known to the load balancer.
+
+    Servers are fetched a page at a time and printed as they arrive, one per line
+    with the address, configured status, and ports of each.
+    """
+    fmt = ctx.find_root().params['output']
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+
+    client = get_context_client(ctx)
+    try:
+        for server in client.iter_servers(page_size=page_size):
+            ports = ['{0}/{1}'.format(port, protocol) for port, protocol in server.ports]
+            if writer is None:
+                click.echo('{0} {1} {2} {3}'.format(
+                    server.server, server.host, server.status, ','.join(ports) or '-'))
+            else:
+                writer.write({
+                    'server': server.server,
+                    'host': server.host,
+                    'status': server.status,
+                    'ports': ports,
+                })
+    finally:
+        client.close()
+        if writer is not None:
+            writer.close()
+
+
+def parse_max_unavailable(value):
+    """Parse a max number of unavailable servers given as a count ("2"), a fraction
+    ("0.25"), or a percentage ("25%"). Fractions and percentages are returned as a float
+    of at most one and counts as an int, see :func:`warthog.rolling.resolve_max_unavailable`.
+    """
+    try:
+        if value.endswith('%'):
+            parsed = float(value[:-1]) / 100
+        elif '.' in value:
+            parsed = float(value)
+        else:
+            parsed = int(value)
+    except ValueError:
+        raise click.BadParameter(
+            '{0} is not a count, fraction, or percentage'.format(value),
+            param_hint='--max-unavailable')
+
+    if isinstance(parsed, float) and not 0 < parsed <= 1:
+        raise click.BadParameter(
+            '{0} must be a fraction greater than 0 and at most 1 (or 100%)'.format(value),
+            param_hint='--max-unavailable')
+    if isinstance(parsed, int) and parsed < 1:
+        raise click.BadParameter(
+            '{0} must be a count of at least 1'.format(value), param_hint='--max-unavailable')
+    return parsed
+
+
+def rolling_record(res):
+    """Get a JSON serializable record of the outcome of a rolling deployment for a server."""
+    record = {
+        'server': res.server,
+        'ok': res.ok,
+        'rollback': res.rollback,
+        'phase': res.phase,
+        'timings': dict((phase, round(seconds, 3)) for phase, seconds in res.timings.items()),
+    }
+    if res.error is not None:
+        record.update(error_record(res.error))
+    return record
+
+
+def format_rolling_result(res):
+    """Get a single line describing the outcome and timings for a server."""
+    timings = ' '.join('{0}={1:.1f}s'.format(phase, seconds)
+                       for phase, seconds in res.timings.items())
+    label = '{0} (rollback)'.format(res.server) if res.rollback else res.server
+    if res.ok:
+        return '{0}: ok {1}'.format(label, timings)
+    return '{0}: failed in {1}: {2} {3}'.format(
+        label, res.phase, error_record(res.error)['error'], timings)
+
+
 @click.command()
-@click.argument('server')
+@click.argument('servers', nargs=-1)
+@click.option(
+    '--from-file',
+    help='File to read server host names from, one per line. Use "-" for stdin.',
+    type=click.File('r'))
+@click.option(
+    '--hook',
+    help=('Shell command to deploy to each server. "{server}" is replaced by the server '
+          'name, which is also in the WARTHOG_SERVER environment variable.'),
+    required=True)
+@click.option(
+    '--max-unavailable',
+    help='Max servers out of rotation at once, as a count, fraction, or percentage. Default 1.',
+    default='1')
+@click.option(
+    '--max-failures',
+    help='Number of servers that may fail before stopping. Default is 0.',
+    type=click.IntRange(min=0),
+    default=0)
+@click.option(
+    '--on-failure',
+    help='What to do once too many servers fail. Default is "stop".',
+    type=click.Choice(['stop', 'rollback']),
+    default='stop')
+@click.option(
+    '--rollback-hook',
+    help='Shell command to roll back each deployed server, required for --on-failure=rollback.')
+@click.option(
+    '--verify-hook',
+    help='Shell command to check each server is healthy after it is enabled.')
+@click.option(
+    '--drain-timeout',
+    help='Seconds to wait for active connections to reach zero. Default is 300.',
+    type=float,
+    default=300.0)
+@click.option(
+    '--interval',
+    help='Seconds to wait between checks while draining or verifying. Default is 2.',
+    type=float,
+    default=2.0)
+@click.option(
+    '--schedule',
+    help=('Order to deploy to servers in: "order" (as given), "least-loaded" (fewest active '
+          'connections first), "most-loaded" (most active connections first), or "grouped" '
+          '(servers with similar active connections together). Default is "order".'),
+    type=click.Choice(['order', 'least-loaded', 'most-loaded', 'grouped']),
+    default='order')
+@click.option(
+    '--pipeline',
+    help=('Fetch state for scheduling the next servers while the current ones deploy and '
+          'start the next server as soon as the current one is back in rotation.'),
+    is_flag=True)
 @click.pass_context
-def disable(ctx, server):
-    """Disable a server by hostname."""
-    client = get_client(ctx.parent.params['config'])
-    if not client.disable_server(server):
-        click.echo('{0} could not be disabled'.format(server))
+# pylint: disable=too-many-arguments,too-many-locals
+def rolling(ctx, servers, from_file, hook, max_unavailable, max_failures, on_failure,
+            rollback_hook, verify_hook, drain_timeout, interval, schedule, pipeline):
+    """Deploy to servers, a few at a time.
+
+    Each server is disabled, drained, deployed to with the --hook command, enabled,
+    and verified. As many servers are handled at once as --max-unavailable allows.
+    A line with per-phase timings is printed as each server completes.
+    """
+    import warthog.rolling
+
+    names = get_servers(servers, from_file)
+    max_unavailable = parse_max_unavailable(max_unavailable)
+    try:
+        warthog.rolling.resolve_max_unavailable(max_unavailable, len(names))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--max-unavailable')
+    if on_failure == warthog.rolling.ON_FAILURE_ROLLBACK and not rollback_hook:
+        raise click.UsageError('--rollback-hook is required for --on-failure=rollback')
+
+    fmt = ctx.find_root().params['output']
+    writer = RecordWriter(fmt) if fmt != OUTPUT_TEXT else None
+
+    def callback(res):
+        if writer is not None:
+            writer.write(rolling_record(res))
+        else:
+            click.echo(format_rolling_result(res), err=not res.ok)
+
+    start = time.time()
+    client = get_context_client(ctx, shared_session=True)
+    try:
+        result = warthog.rolling.RollingDeployment(
+            client, warthog.rolling.shell_hook(hook),
+            max_unavailable=max_unavailable,
+            max_failures=max_failures,
+            on_failure=on_failure,
+            rollback_hook=warthog.rolling.shell_hook(rollback_hook) if rollback_hook else None,
+            verify=warthog.rolling.shell_hook(verify_hook) if verify_hook else None,
+            drain_timeout=drain_timeout,
+            interval=interval,
+            callback=callback,
+            schedule=schedule,
+            pipeline=pipeline).run(names)
+
+        if writer is not None:
+            for num, batch in enumerate(result.batches, 1):
+                writer.write({'batch': num, 'servers': batch.servers,
+                              'gap': round(batch.gap, 3), 'overlap': round(batch.overlap, 3)})
+    finally:
+        client.close()
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        click.echo('Phase totals (total / max seconds):')
+        for phase, (total, slowest) in warthog.rolling.summarize_timings(
+                result.results).items():
+            click.echo('  {0:<8} {1:>8.1f} {2:>8.1f}'.format(phase, total, slowest))
+        if result.batches:
+            gaps = [batch.gap for batch in result.batches]
+            click.echo('{0} groups started, gap between groups {1:.2f}s mean / {2:.2f}s max, '
+                       '{3:.1f}s overlapped'.format(
+                           len(gaps), sum(gaps) / len(gaps), max(gaps),
+                           sum(batch.overlap for batch in result.batches)))
+        click.echo('{0} of {1} servers deployed in {2:.1f}s'.format(
+            len([res for res in result.results if res.ok]), len(names), time.time() - start))
+        if result.skipped:
+            click.echo('Skipped: {0}'.format(', '.join(result.skipped)), err=True)
+
+    if result.aborted or not all(res.ok for res in result.results):
         ctx.exit(1)
 
 
 @click.command()
-@click.argument('server')
 @click.pass_context
-def status(ctx, server):
-    """Get the status of a server by hostname."""
-    client = get_client(ctx.parent.params['config'])
-    click.echo(client.get_status(server))
+def logout(ctx):
+    """End the session kept in the token cache."""
+    # The agent manages its own sessions, the token cache is only used directly
+    client = get_context_client(ctx, token_cache=True, use_agent=False)
+    client.logout()
 
 
 @click.command()
-@click.argument('server')
 @click.pass_context
-def connections(ctx, server):
-    """Get active connections to a server by hostname."""
-    client = get_client(ctx.parent.params['config'])
-    click.echo(client.get_connections(server))
+def agent(ctx):
+    """Run an agent that keeps sessions warm for other commands."""
+    import warthog.agent
+
+    params = ctx.find_root().params
+    if not params['enable_platform_warning']:
+        disable_platform_warning()
+
+    token_cache = None
+    if params['token_cache']:
+        import warthog.tokens
+        token_cache = warthog.tokens.TokenCache()
+
+    try:
+        server = warthog.agent.AgentServer(
+            socket_path=params['agent_socket'], token_cache=token_cache)
+    except warthog.exceptions.WarthogAgentError as e:
+        raise click.ClickException(e.msg)
+
+    # Make sure that the socket gets cleaned up and sessions get closed when
+    # we're asked to stop by a process manager and not just on Ctrl-C.
+    def handle_term(*_):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_term)
+    click.echo('Warthog agent listening on {0}'.format(server.socket_path), err=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
 
 
 @click.command('default-config')
@@ -198,12 +1245,22 @@ def default_config():
 @click.command('config-path')
 def config_path():
     """Print the config file search PATH."""
-    click.echo(os.linesep.join(warthog.api.DEFAULT_CONFIG_LOCATIONS))
+    import warthog.config
+
+    click.echo(os.linesep.join(warthog.config.DEFAULT_CONFIG_LOCATIONS))
 
 
 main.add_command(enable)
 main.add_command(disable)
 main.add_command(status)
 main.add_command(connections)
+main.add_command(batch)
+main.add_command(watch)
+main.add_command(snapshot)
+main.add_command(diff_snapshots)
+main.add_command(list_servers)
+main.add_command(rolling)
+main.add_command(logout)
+main.add_command(agent)
 main.add_command(default_config)
 main.add_command(config_path)
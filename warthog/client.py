@@ -14,12 +14,18 @@ warthog.client
 Simple interface for a load balancer with retry logic and intelligent draining of nodes.
 """
 
+import atexit
+import collections
 import contextlib
+import threading
 import time
+import weakref
 
 import warthog.core
 import warthog.exceptions
-import warthog.transport
+import warthog.topology
+# pylint: disable=import-error
+from .packages.six.moves import queue
 
 
 class CommandFactory(object):
@@ -105,6 +111,36 @@ class CommandFactory(object):
         return warthog.core.NodeDisableCommand(
             self._transport_factory(), scheme_host, session_id, server)
 
+    def get_server_address(self, scheme_host, session_id, server):
+        """Get a new command to get the IP address of a server.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of the
+            load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :param basestring server: Host name of the server to get the address of.
+        :return: A new command to get the address of a server.
+        :rtype: warthog.core.NodeAddressCommand
+        """
+        return warthog.core.NodeAddressCommand(
+            self._transport_factory(), scheme_host, session_id, server)
+
+    def get_reset_connections(self, scheme_host, session_id, address):
+        """Get a new command to reset all remaining connections to a server.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of the
+            load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :param basestring address: IP address of the server to reset connections to.
+        :return: A new command to reset connections to a server.
+        :rtype: warthog.core.NodeResetConnectionsCommand
+        """
+        return warthog.core.NodeResetConnectionsCommand(
+            self._transport_factory(), scheme_host, session_id, address)
+
     def get_active_connections(self, scheme_host, session_id, server):
         """Get a new command to get the number of active connections to a server.
 
@@ -119,35 +155,363 @@ class CommandFactory(object):
         return warthog.core.NodeActiveConnectionsCommand(
             self._transport_factory(), scheme_host, session_id, server)
 
+    def get_port_connections(self, scheme_host, session_id, server):
+        """Get a new command to get active connections to each port of a server.
 
-def _get_default_cmd_factory(verify, ssl_version):
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :param basestring server: Host name of the server to get the number of
+            active connections to each port of.
+        :return: A new command to get active connections to each port of a server.
+        :rtype: warthog.core.NodePortConnectionsCommand
+        """
+        return warthog.core.NodePortConnectionsCommand(
+            self._transport_factory(), scheme_host, session_id, server)
+
+    def get_server_state(self, scheme_host, session_id, server):
+        """Get a new command to get the status and active connections to each port of
+        a server with a single request.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :param basestring server: Host name of the server to get the state of.
+        :return: A new command to get the status and active connections of a server.
+        :rtype: warthog.core.NodeStateCommand
+        """
+        return warthog.core.NodeStateCommand(
+            self._transport_factory(), scheme_host, session_id, server)
+
+    def get_all_server_status(self, scheme_host, session_id):
+        """Get a new command to get the status of every server.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :return: A new command to get the status of every server.
+        :rtype: warthog.core.NodeStatusListCommand
+        """
+        return warthog.core.NodeStatusListCommand(
+            self._transport_factory(), scheme_host, session_id)
+
+    def get_servers(self, scheme_host, session_id, start=0, count=None):
+        """Get a new command to get the configuration of a page of servers.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :param int start: Offset of the first server to get.
+        :param int|None count: Max number of servers to get, ``None`` for all of them.
+        :return: A new command to get the configuration of servers.
+        :rtype: warthog.core.ServerListCommand
+        """
+        return warthog.core.ServerListCommand(
+            self._transport_factory(), scheme_host, session_id, start=start, count=count)
+
+    def get_service_groups(self, scheme_host, session_id):
+        """Get a new command to get every service group and its members.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :return: A new command to get every service group.
+        :rtype: warthog.core.ServiceGroupListCommand
+        """
+        return warthog.core.ServiceGroupListCommand(
+            self._transport_factory(), scheme_host, session_id)
+
+    def get_virtual_servers(self, scheme_host, session_id):
+        """Get a new command to get every virtual server and its ports.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :return: A new command to get every virtual server.
+        :rtype: warthog.core.VirtualServerListCommand
+        """
+        return warthog.core.VirtualServerListCommand(
+            self._transport_factory(), scheme_host, session_id)
+
+    def get_all_server_stats(self, scheme_host, session_id):
+        """Get a new command to get the statistics of every server.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        :return: A new command to get the statistics of every server.
+        :rtype: warthog.core.NodeStatsListCommand
+        """
+        return warthog.core.NodeStatsListCommand(
+            self._transport_factory(), scheme_host, session_id)
+
+
+def _get_default_cmd_factory(verify, ssl_version, shared=False):
     """Get a :class:`CommandFactory` instance configured to use the provided TLS
-    version and cert verification policy
+    version and cert verification policy, optionally sharing a single transport
+    between all commands.
 
     :param bool verify: ``True`` to perform certificate validation when using HTTPS,
         ``False`` otherwise, ``None`` to use the default.
     :param int ssl_version: :mod:`ssl` module constant for specifying which SSL or
         TLS version to use for connecting to the load balancer over HTTPS, ``None``
         to use the default.
+    :param bool shared: ``True`` to reuse the same transport (and its connections)
+        for every command.
     :return: Default command factory for building new commands to interact
         with the A10 load balancer.
     :rtype: WarthogCommandFactory
     """
+    # Imported here since the transport layer (and the requests library) is
+    # comparatively expensive to load and isn't needed until we make requests.
+    import warthog.transport
+
     return CommandFactory(warthog.transport.get_transport_factory(
-        verify=verify, ssl_version=ssl_version
+        verify=verify, ssl_version=ssl_version, shared=shared
     ))
 
 
+# Deferred logoff queues with worker threads that haven't been closed yet, by ID. Held
+# weakly so that registering for cleanup at exit doesn't keep them alive.
+_open_logoffs = weakref.WeakValueDictionary()
+
+# Max number of seconds to spend closing pending sessions at exit, in total across every
+# deferred logoff queue, so that an unreachable load balancer doesn't hang the exit.
+_EXIT_TIMEOUT = 5.0
+
+
+def _close_open_logoffs(timeout=_EXIT_TIMEOUT):
+    """Close the pending sessions of every deferred logoff queue still open at exit,
+    dropping any sessions that aren't closed within the timeout.
+    """
+    deadline = time.time() + timeout
+    for logoff in list(_open_logoffs.values()):
+        if not logoff.close(timeout=max(0.0, deadline - time.time())):
+            logoff._discard(timeout)  # pylint: disable=protected-access
+
+
+atexit.register(_close_open_logoffs)
+
+
+class DeferredLogoff(object):
+    """Queue of sessions to be closed in the background by a small number of
+    worker threads instead of by the caller that was using the session.
+
+    Closing a session requires a full round trip to the load balancer that
+    the caller gains nothing from waiting on. Sessions submitted to this queue
+    are closed by worker threads, each of which takes up to ``batch_size``
+    pending sessions at a time so that bursts of operations are drained quickly.
+    Any sessions still pending are closed when :meth:`close` is called or when
+    the interpreter exits. At exit, sessions that aren't closed within a few seconds
+    are dropped and left for the load balancer to expire.
+
+    Errors closing a session are logged and otherwise ignored, the load balancer
+    will expire the session on its own eventually.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+    _default_workers = 2
+    _default_batch_size = 10
+
+    def __init__(self, commands, workers=_default_workers, batch_size=_default_batch_size):
+        """Set the factory for creating session end commands and the number of
+        background threads to use for closing sessions.
+
+        :param CommandFactory commands: Factory instance for creating new commands
+            for ending sessions with the load balancer.
+        :param int workers: Number of background threads closing sessions in parallel.
+        :param int batch_size: Max number of pending sessions a worker thread will
+            take from the queue at a time.
+        """
+        self._commands = commands
+        self._num_workers = max(1, workers)
+        self._batch_size = max(1, batch_size)
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._workers = []
+        self._closed = False
+
+    def _start_workers(self):
+        """Start the worker threads and track this queue for cleanup at exit, if not
+        already done.
+        """
+        if self._workers:
+            return
+
+        for i in range(self._num_workers):
+            worker = threading.Thread(
+                target=self._run, name='warthog-logoff-{0}'.format(i))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        _open_logoffs[id(self)] = self
+
+    def submit(self, scheme_host, session_id):
+        """Queue a session to be closed by a background thread.
+
+        If this queue has already been closed, the session is closed synchronously
+        in the calling thread instead.
+
+        :param basestring scheme_host: Scheme, host, and port combination of
+            the load balancer.
+        :param basestring session_id: Previously authenticated session ID.
+        """
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._start_workers()
+                self._pending += 1
+                self._queue.put((scheme_host, session_id))
+
+        if closed:
+            self._end_session(scheme_host, session_id)
+
+    def flush(self, timeout=None):
+        """Block until all sessions submitted so far have been closed.
+
+        :param float|None timeout: Max number of seconds to wait, ``None`` to
+            wait for as long as it takes.
+        :return: True if there are no more pending sessions, false otherwise.
+        :rtype: bool
+        """
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self._cond:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """Close all pending sessions and stop the worker threads.
+
+        Sessions submitted after this method is called are closed synchronously.
+
+        :param float|None timeout: Max number of seconds to wait for pending
+            sessions to be closed, ``None`` to wait for as long as it takes.
+        :return: True if all pending sessions were closed, false otherwise.
+        :rtype: bool
+        """
+        with self._cond:
+            if self._closed:
+                return self._pending == 0
+            self._closed = True
+
+        _open_logoffs.pop(id(self), None)
+        done = self.flush(timeout=timeout)
+        for _ in self._workers:
+            self._queue.put(None)
+        return done
+
+    def _discard(self, timeout):
+        """Drop sessions that are still waiting to be closed instead of closing them,
+        leaving the load balancer to expire them on its own.
+
+        Sessions that a worker thread is already closing are not affected.
+
+        :param float timeout: Number of seconds spent closing sessions before giving
+            up, used for logging.
+        :return: The number of sessions dropped.
+        :rtype: int
+        """
+        dropped = 0
+        sentinels = 0
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                sentinels += 1
+            else:
+                dropped += 1
+
+        for _ in range(sentinels):
+            self._queue.put(None)
+
+        with self._cond:
+            self._pending -= dropped
+            self._cond.notify_all()
+
+        if dropped:
+            self._logger.warning(
+                'Dropped %s sessions that were not closed within %s seconds', dropped, timeout)
+        return dropped
+
+    def _run(self):
+        """Take batches of pending sessions from the queue and close them until
+        a sentinel (``None``) is encountered.
+        """
+        while True:
+            batch = []
+            item = self._queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            for scheme_host, session_id in batch:
+                self._end_session(scheme_host, session_id)
+
+            with self._cond:
+                self._pending -= len(batch)
+                self._cond.notify_all()
+
+            if item is None:
+                return
+
+    def _end_session(self, scheme_host, session_id):
+        """Close a single session, logging instead of raising any errors."""
+        try:
+            self._commands.get_session_end(scheme_host, session_id).send()
+        # pylint: disable=broad-except
+        except Exception as e:
+            self._logger.warning('Unable to close session for %s: %s', scheme_host, e)
+
+
 @contextlib.contextmanager
-def session_context(scheme_host, username, password, commands):
+def session_context(scheme_host, username, password, commands, closer=None):
     """Context manager that makes a request to start an authenticated session, yields the
     session ID, and then closes the session afterwards.
 
+    .. versionchanged:: 2.0.0
+        Added the optional ``closer`` parameter to allow sessions to be closed
+        in the background.
+
     :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
     :param basestring username: Name of the user to authenticate with.
     :param basestring password: Password for the user to authenticate with.
     :param CommandFactory commands: Factory instance for creating new commands
         for starting and ending sessions with the load balancer.
+    :param DeferredLogoff closer: Optional queue to hand the session to for closing
+        instead of closing it before returning.
     :return: The session ID of the newly established session.
     """
     session = None
@@ -158,8 +522,351 @@ def session_context(scheme_host, username, password, commands):
         yield session
     finally:
         if session is not None:
-            end_cmd = commands.get_session_end(scheme_host, session)
-            end_cmd.send()
+            if closer is not None:
+                closer.submit(scheme_host, session)
+            else:
+                end_cmd = commands.get_session_end(scheme_host, session)
+                end_cmd.send()
+
+
+# Simple immutable struct for point-in-time usage information about a SessionPool
+SessionPoolMetrics = collections.namedtuple(
+    'SessionPoolMetrics', ['size', 'open', 'in_use', 'waits', 'wait_time', 'replaced'])
+
+
+class SessionPool(object):
+    """Bounded pool of authenticated sessions that are checked out for the
+    duration of a single operation and then returned for reuse.
+
+    Load balancers limit the number of concurrent sessions an admin user
+    may have open. The pool will never have more than ``size`` sessions open
+    at once, starting new sessions lazily as they are needed. When all
+    sessions are in use, callers block until one is returned or until the
+    timeout expires.
+
+    Sessions that the load balancer reports as invalid are discarded instead
+    of being returned to the pool and a replacement is started the next time
+    a session is needed.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+    _default_size = 4
+    _default_timeout = 30.0
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, scheme_host, username, password, commands,
+                 size=_default_size, timeout=_default_timeout):
+        """Set the load balancer, credentials, and factory for commands to use for
+        starting and ending sessions as well as the size of the pool.
+
+        :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
+        :param basestring username: Name of the user to authenticate with.
+        :param basestring password: Password for the user to authenticate with.
+        :param CommandFactory commands: Factory instance for creating new commands
+            for starting and ending sessions with the load balancer.
+        :param int size: Max number of sessions that may be open at once.
+        :param float|None timeout: Default max number of seconds to wait for a session
+            to become available, ``None`` to wait for as long as it takes.
+        """
+        self._scheme_host = scheme_host
+        self._username = username
+        self._password = password
+        self._commands = commands
+        self._size = max(1, size)
+        self._timeout = timeout
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._open = 0
+        self._in_use = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._replaced = 0
+        self._closed = False
+
+    def checkout(self, timeout=None):
+        """Get an authenticated session for exclusive use, starting a new one if there
+        are none idle and the pool isn't full, waiting for one to be returned otherwise.
+
+        :param float|None timeout: Max number of seconds to wait for a session to become
+            available, ``None`` to use the pool default.
+        :return: The ID of an authenticated session.
+        :rtype: unicode
+        :raises warthog.exceptions.WarthogSessionPoolTimeoutError: If no session became
+            available before the timeout expired.
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session.
+        :raises RuntimeError: If the pool has already been closed.
+        """
+        timeout = timeout if timeout is not None else self._timeout
+        start = time.time()
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Session pool has already been closed')
+                if self._idle or self._open < self._size:
+                    break
+
+                remaining = None if timeout is None else timeout - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    self._record_wait(waited, start)
+                    raise warthog.exceptions.WarthogSessionPoolTimeoutError(
+                        'No session for {0} became available within {1} seconds'.format(
+                            self._scheme_host, timeout))
+
+                waited = True
+                self._cond.wait(remaining)
+
+            self._record_wait(waited, start)
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            # Reserve a slot for the new session before releasing the lock to
+            # authenticate so that other callers can't exceed the pool size.
+            self._open += 1
+
+        try:
+            return self._commands.get_session_start(
+                self._scheme_host, self._username, self._password).send()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _record_wait(self, waited, start):
+        """Update wait metrics, must be called with the lock held."""
+        if waited:
+            self._waits += 1
+            self._wait_time += time.time() - start
+
+    def checkin(self, session, invalid=False):
+        """Return a previously checked out session to the pool.
+
+        :param unicode session: Session ID previously returned by :meth:`checkout`.
+        :param bool invalid: ``True`` if the load balancer no longer recognizes this
+            session and it should be discarded instead of reused.
+        """
+        logoff = False
+
+        with self._cond:
+            self._in_use -= 1
+            if invalid:
+                self._open -= 1
+                self._replaced += 1
+            elif self._closed:
+                self._open -= 1
+                logoff = True
+            else:
+                self._idle.append(session)
+            self._cond.notify()
+
+        if logoff:
+            self._end_session(session)
+
+    @contextlib.contextmanager
+    def session(self, timeout=None):
+        """Context manager that checks out a session, yields it, and then returns
+        it to the pool. If the load balancer reports that the session is invalid,
+        it is discarded instead of being returned.
+
+        :param float|None timeout: Max number of seconds to wait for a session to become
+            available, ``None`` to use the pool default.
+        :return: The ID of an authenticated session.
+        """
+        session = self.checkout(timeout=timeout)
+        invalid = False
+        try:
+            yield session
+        except warthog.exceptions.WarthogInvalidSessionError:
+            invalid = True
+            raise
+        finally:
+            self.checkin(session, invalid=invalid)
+
+    def close(self):
+        """Close all idle sessions and prevent any more sessions from being checked out.
+        Sessions that are in use will be closed when they are returned to the pool.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+
+        for session in idle:
+            self._end_session(session)
+
+    def metrics(self):
+        """Get current usage information about the pool.
+
+        :return: Size of the pool, number of sessions open and in use, the number of
+            times callers had to wait for a session and the total time spent waiting
+            (in seconds), and the number of invalid sessions that were replaced.
+        :rtype: SessionPoolMetrics
+        """
+        with self._cond:
+            return SessionPoolMetrics(
+                size=self._size, open=self._open, in_use=self._in_use, waits=self._waits,
+                wait_time=self._wait_time, replaced=self._replaced)
+
+    def _end_session(self, session):
+        """Close a single session, logging instead of raising any errors."""
+        try:
+            self._commands.get_session_end(self._scheme_host, session).send()
+        # pylint: disable=broad-except
+        except Exception as e:
+            self._logger.warning('Unable to close session for %s: %s', self._scheme_host, e)
+
+
+class SharedSession(object):
+    """Single session shared by all operations and threads, started when it
+    is first needed and started again if the load balancer stops recognizing it.
+
+    Optionally, the session token may be kept in a :class:`warthog.tokens.TokenCache`
+    so that it can be reused by other processes. When a cache is used, the session
+    is left open when :meth:`close` is called so that the next process can use it.
+    It will be closed by the load balancer when it expires or by calling :meth:`logout`.
+    Without a cache, the session is closed when :meth:`close` is called.
+
+    The last-used time of a cached token is only written to the cache when the token
+    changes or when it was last written more than half the TTL of the cache ago, not
+    after every operation, so that concurrent operations don't wait on the cache file.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, scheme_host, username, password, commands, token_cache=None,
+                 clock=None):
+        """Set the load balancer, credentials, and factory for commands to use for
+        starting and ending the session and optionally, a cache to store the session
+        token in.
+
+        :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
+        :param basestring username: Name of the user to authenticate with.
+        :param basestring password: Password for the user to authenticate with.
+        :param CommandFactory commands: Factory instance for creating new commands
+            for starting and ending sessions with the load balancer.
+        :param warthog.tokens.TokenCache token_cache: Optional cache to load the session
+            token from and store it in.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        self._scheme_host = scheme_host
+        self._username = username
+        self._password = password
+        self._commands = commands
+        self._cache = token_cache
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+        self._token = None
+        self._stored = None
+        self._stored_at = None
+
+    def _acquire(self):
+        """Get the current session token, loading it from the cache or starting a
+        new session if there isn't one yet.
+        """
+        with self._lock:
+            if self._token is not None:
+                return self._token
+
+            if self._cache is not None:
+                self._token = self._cache.get(self._scheme_host, self._username)
+
+            if self._token is None:
+                self._token = self._commands.get_session_start(
+                    self._scheme_host, self._username, self._password).send()
+            else:
+                self._logger.debug('Using cached session for %s', self._scheme_host)
+
+            return self._token
+
+    def _invalidate(self, token):
+        """Forget the given token if it is still the current token."""
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._stored = None
+                if self._cache is not None:
+                    self._cache.remove(self._scheme_host, self._username)
+
+    @contextlib.contextmanager
+    def session(self):
+        """Context manager that yields the shared session, starting it if required.
+        If the load balancer reports that the session is invalid, it is discarded
+        and a new session will be started the next time one is needed.
+
+        :return: The ID of an authenticated session.
+        """
+        token = self._acquire()
+        valid = True
+        try:
+            yield token
+        except warthog.exceptions.WarthogInvalidSessionError:
+            valid = False
+            self._invalidate(token)
+            raise
+        finally:
+            if valid and self._cache is not None:
+                self._touch(token)
+
+    def _touch(self, token):
+        """Refresh the last-used time of the cached token if it is new or was last
+        stored more than half the TTL of the cache ago. The load balancer only expires
+        sessions after they have been idle for some time.
+        """
+        now = self._clock()
+        with self._lock:
+            if token == self._stored and now - self._stored_at < self._cache.ttl / 2.0:
+                return
+            self._stored, self._stored_at = token, now
+        self._cache.put(self._scheme_host, self._username, token)
+
+    def close(self):
+        """Close the shared session unless it is being kept in a token cache."""
+        if self._cache is None:
+            self.logout()
+
+    def logout(self):
+        """Close the shared session and remove it from the token cache, if any."""
+        with self._lock:
+            token, self._token = self._token, None
+            self._stored = None
+            if self._cache is not None:
+                cached = self._cache.remove(self._scheme_host, self._username)
+                token = token if token is not None else cached
+
+        if token is None:
+            return
+
+        try:
+            self._commands.get_session_end(self._scheme_host, token).send()
+        # pylint: disable=broad-except
+        except Exception as e:
+            self._logger.debug('Unable to close session for %s: %s', self._scheme_host, e)
+
+
+# Reset the remaining connections to a server when its grace period to drain ends
+ON_GRACE_FORCE = 'force'
+
+# Raise an error when the grace period for a server to drain ends
+ON_GRACE_FAIL = 'fail'
+
+# Leave the server disabled and return false when the grace period for it to drain ends
+ON_GRACE_RETURN = 'return'
+
+ON_GRACE_EXPIRED = (ON_GRACE_FORCE, ON_GRACE_FAIL, ON_GRACE_RETURN)
 
 
 class WarthogClient(object):
@@ -179,7 +886,16 @@ class WarthogClient(object):
                  verify=None,
                  ssl_version=None,
                  wait_interval=_default_wait_interval,
-                 commands=None):
+                 commands=None,
+                 deferred_logoff=False,
+                 max_sessions=None,
+                 shared_session=False,
+                 token_cache=None,
+                 reuse_connections=False,
+                 resolve_servers=False,
+                 negative_cache=None,
+                 stale_reads=None,
+                 stats_history=None):
         """Set the load balancer scheme/host/port combination, username and password
         to use for connecting and authenticating with the load balancer.
 
@@ -199,6 +915,32 @@ class WarthogClient(object):
         to be used by each command. It is typically only necessary to override this for
         unit testing purposes.
 
+        Optionally, sessions may be closed in the background after each operation
+        instead of before returning the result of the operation to the caller. When
+        enabled, :meth:`close` should be called when the client is no longer needed
+        to make sure that all sessions are closed (this will also happen automatically
+        when the interpreter exits).
+
+        Optionally, a bounded pool of sessions may be used instead of starting and
+        ending a session for each operation. Sessions in the pool are reused between
+        operations and are closed when :meth:`close` is called.
+
+        Optionally, a single session may be shared by all operations. If a token cache
+        is supplied, the shared session is loaded from and stored in the cache so that
+        it may be reused by other processes and is left open when :meth:`close` is
+        called. Use :meth:`logout` to close a cached session.
+
+        Optionally, servers may be given to each method by IP address or FQDN as well as
+        by their name on the load balancer. Names are looked up with a :class:`ServerResolver`
+        built from a single listing of all servers.
+
+        Optionally, servers that the load balancer reported as unknown may be remembered
+        in a :class:`NegativeCache` so that repeated operations on them fail immediately.
+
+        Optionally, the :class:`StaleReadCache` used by :meth:`read_status` and
+        :meth:`read_connections` to remember the last good value read for each server
+        may be supplied, to change how long reads may take before a previous value is used.
+
         .. versionchanged:: 0.9.0
             Added the optional ``verify`` parameter to make use of self-signed certs
             easier.
@@ -207,6 +949,36 @@ class WarthogClient(object):
             Added the optional ``ssl_version`` parameter to make use of alternate SSL
             or TLS versions easier.
 
+        .. versionchanged:: 2.0.0
+            Added the optional ``deferred_logoff`` parameter to close sessions in
+            the background.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``max_sessions`` parameter to reuse a bounded pool
+            of sessions.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``shared_session`` and ``token_cache`` parameters to
+            reuse a single session, optionally between processes.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``reuse_connections`` parameter to keep connections
+            to the load balancer alive between commands.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``resolve_servers`` parameter to accept addresses of
+            servers as well as their names.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``negative_cache`` parameter to remember unknown servers.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``stale_reads`` parameter for :meth:`read_status` and
+            :meth:`read_connections`.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``stats_history`` parameter to record bulk stats reads.
+
         :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
         :param basestring username: Name of the user to authenticate with.
         :param basestring password: Password for the user to authenticate with.
@@ -221,18 +993,172 @@ class WarthogClient(object):
             to close, etc.).
         :param CommandFactory commands: Factory instance for creating new commands for
             starting and ending sessions with the load balancer.
+        :param bool deferred_logoff: ``True`` to close sessions in the background
+            after each operation, ``False`` to close them before returning. The
+            default is to close them before returning.
+        :param int|None max_sessions: Max number of sessions to keep open in a
+            :class:`SessionPool` shared by all operations, ``None`` to start and end a
+            session for each operation. The default is to not use a pool.
+        :param bool shared_session: ``True`` to share a single :class:`SharedSession`
+            between all operations. The default is to not share a session.
+        :param warthog.tokens.TokenCache token_cache: Cache to load a shared session
+            from and store it in for reuse by other processes. Implies ``shared_session``.
+        :param bool reuse_connections: ``True`` to use a single pool of keep-alive
+            connections for all commands. Ignored if ``commands`` is supplied. The
+            default is to use new connections for each command.
+        :param bool resolve_servers: ``True`` to accept the IP address or FQDN of servers
+            as well as their name on the load balancer. The default is to only accept names.
+        :param NegativeCache negative_cache: Cache of servers reported as unknown by the
+            load balancer, possibly shared with other clients. The default is to not
+            remember unknown servers.
+        :param StaleReadCache stale_reads: Last good values read by :meth:`read_status`
+            and :meth:`read_connections`. The default is a :class:`StaleReadCache` with
+            its default latency budget.
+        :param warthog.history.StatsHistory stats_history: History to record the result
+            of each call to :meth:`get_node_stats` and :meth:`get_fleet_snapshot` in. The
+            default is to not record them.
         """
         self._scheme_host = scheme_host
         self._username = username
         self._password = password
         self._interval = wait_interval
         self._commands = commands if commands is not None else \
-            _get_default_cmd_factory(verify, ssl_version)
+            _get_default_cmd_factory(verify, ssl_version, shared=reuse_connections)
+        self._closer = DeferredLogoff(self._commands) if deferred_logoff else None
+        self._pool = None
+        self._sessions = None
+        self._topology = None
+        self._topology_lock = threading.Lock()
+        self._resolver = ServerResolver(self) if resolve_servers else None
+        self._unknown = negative_cache
+        self._stale_reads = stale_reads if stale_reads is not None else StaleReadCache()
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        self._history = stats_history
+
+        if token_cache is not None or shared_session:
+            self._sessions = SharedSession(
+                scheme_host, username, password, self._commands, token_cache=token_cache)
+        elif max_sessions is not None:
+            self._sessions = self._pool = SessionPool(
+                scheme_host, username, password, self._commands, size=max_sessions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def session_pool(self):
+        """The :class:`SessionPool` used by this client or ``None`` if the client
+        starts and ends a session for each operation.
+
+        .. versionadded:: 2.0.0
+        """
+        return self._pool
+
+    @property
+    def topology(self):
+        """The :class:`warthog.topology.Topology` of service groups and virtual servers
+        on the load balancer, created and fetched the first time it is used.
+
+        .. versionadded:: 2.0.0
+        """
+        with self._topology_lock:
+            if self._topology is None:
+                self._topology = warthog.topology.Topology(self)
+            return self._topology
+
+    @property
+    def resolver(self):
+        """The :class:`ServerResolver` used to look up the names of servers or ``None``
+        if the client only accepts names.
+
+        .. versionadded:: 2.0.0
+        """
+        return self._resolver
+
+    def _resolve(self, server):
+        return self._resolver.resolve(server) if self._resolver is not None else server
+
+    def close(self):
+        """Close any pooled or shared sessions or sessions that are still pending being
+        closed in the background. Shared sessions kept in a token cache are left open.
+
+        Any subscriptions to changes in the state of servers are cancelled.
+
+        This method is a no-op unless the client was created with ``deferred_logoff``
+        enabled, with ``max_sessions`` set, or with a shared session, or has subscriptions.
+
+        .. versionadded:: 2.0.0
+        """
+        if self._poller is not None:
+            self._poller.close()
+        if self._sessions is not None:
+            self._sessions.close()
+        if self._closer is not None:
+            self._closer.close()
+
+    def logout(self):
+        """Close the shared session, even if it is kept in a token cache.
+
+        This method is a no-op unless the client was created with a shared session.
+
+        .. versionadded:: 2.0.0
+        """
+        if isinstance(self._sessions, SharedSession):
+            self._sessions.logout()
 
     def _session_context(self):
-        """Get a new context manager that starts and ends a session with the load balancer."""
+        """Get a new context manager that starts and ends a session with the load
+        balancer or uses the pooled or shared session if one is being used.
+        """
+        if self._sessions is not None:
+            return self._sessions.session()
+
         self._logger.debug('Creating new session context for %s', self._scheme_host)
-        return session_context(self._scheme_host, self._username, self._password, self._commands)
+        return session_context(
+            self._scheme_host, self._username, self._password, self._commands,
+            closer=self._closer)
+
+    def _run(self, operation):
+        """Run the given operation with an authenticated session, retrying once with a
+        new session if a reused session was no longer recognized by the load balancer.
+
+        :param callable operation: Callable that accepts a session ID.
+        :return: The result of the operation.
+        """
+        retries = 0 if self._sessions is None else 1
+
+        while True:
+            try:
+                with self._session_context() as session:
+                    return operation(session)
+            except warthog.exceptions.WarthogInvalidSessionError:
+                if retries <= 0:
+                    raise
+                self._logger.debug('Session for %s was invalid, retrying...', self._scheme_host)
+                retries -= 1
+
+    def _run_for_server(self, server, operation):
+        """Run the given operation for a single server, failing immediately if the server
+        is remembered as unknown and remembering it if the load balancer reports it as unknown.
+        """
+        if self._unknown is None:
+            return self._run(operation)
+
+        self._unknown.check(self._scheme_host, server)
+        try:
+            return self._run(operation)
+        except warthog.exceptions.WarthogNoSuchNodeError as e:
+            self._unknown.add(self._scheme_host, server, e)
+            raise
+
+    def _seen(self, servers):
+        """Forget that any of the given servers, just listed by the load balancer, are unknown."""
+        if self._unknown is not None:
+            self._unknown.seen(self._scheme_host, servers)
 
     def get_status(self, server):
         """Get the current status of the given server, at the node level.
@@ -251,11 +1177,15 @@ class WarthogClient(object):
         :raises warthog.exceptions.WarthogNodeStatusError: If there are any other
             problems getting the status of the given server.
         """
-        with self._session_context() as session:
+        server = self._resolve(server)
+
+        def operation(session):
             cmd = self._commands.get_server_status(
                 self._scheme_host, session, server)
             return cmd.send()
 
+        return self._run_for_server(server, operation)
+
     def get_connections(self, server):
         """Get the current number of active connections to a server, at the node level.
 
@@ -276,12 +1206,81 @@ class WarthogClient(object):
 
         .. versionadded:: 0.4.0
         """
-        with self._session_context() as session:
+        server = self._resolve(server)
+
+        def operation(session):
             cmd = self._commands.get_active_connections(
                 self._scheme_host, session, server)
             return cmd.send()
 
-    def disable_server(self, server, max_retries=5):
+        return self._run_for_server(server, operation)
+
+    def get_port_connections(self, server):
+        """Get the current number of active connections to each port of a server.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring server: Hostname of the server to get the number of active
+            connections to each port of.
+        :return: The port, protocol, and number of active connections of each port.
+        :rtype: list[PortConnections]
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the load balancer does
+            not recognize the given hostname.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the active connections for the given server.
+        """
+        server = self._resolve(server)
+
+        def operation(session):
+            cmd = self._commands.get_port_connections(self._scheme_host, session, server)
+            return [PortConnections(*entry) for entry in cmd.send()]
+
+        return self._run_for_server(server, operation)
+
+    def read_status(self, server):
+        """Get the status of the given server like :meth:`get_status`, using the last
+        good status read for the server if getting the current status fails or takes
+        longer than the latency budget of the :class:`StaleReadCache` of this client.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring server: Hostname of the server to get the status of.
+        :return: The status of the server and how many seconds old it is.
+        :rtype: Reading
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the load balancer does
+            not recognize the given hostname.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the status of the server and there is no previous status to use.
+        """
+        server = self._resolve(server)
+        return self._stale_reads.read(('status', server), lambda: self.get_status(server))
+
+    def read_connections(self, server):
+        """Get the number of active connections to the given server like
+        :meth:`get_connections`, using the last good number read for the server if
+        getting the current number fails or takes longer than the latency budget of
+        the :class:`StaleReadCache` of this client.
+
+        .. versionadded:: 2.0.0
+
+        :param basestring server: Hostname of the server to get active connections for.
+        :return: The number of active connections and how many seconds old it is.
+        :rtype: Reading
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the load balancer does
+            not recognize the given hostname.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the active connections and there is no previous number to use.
+        """
+        server = self._resolve(server)
+        return self._stale_reads.read(
+            ('connections', server), lambda: self.get_connections(server))
+
+    # pylint: disable=too-many-arguments
+    def disable_server(self, server, max_retries=5, min_available=None, ports=None,
+                       ignore_ports=None, grace_period=None, on_grace_expired=ON_GRACE_RETURN):
         """Disable a server at the node level, optionally retrying when there are transient
         errors and waiting for the number of active connections to the server to reach zero.
 
@@ -289,49 +1288,378 @@ class WarthogClient(object):
         or to wait until there are no active connections to the server, the method will
         try a single time to disable the server and then return immediately.
 
+        If ``min_available`` is set, the :attr:`topology` of the load balancer is used to
+        make sure that at least that many other members of every service group the server
+        is in are up before disabling it.
+
+        If ``ports`` or ``ignore_ports`` are set, only active connections to the given
+        ports (or to ports other than the ignored ones) are waited for, e.g. to ignore
+        health check connections to a monitoring port.
+
+        If ``grace_period`` is set, the method waits up to that many seconds for active
+        connections to close (instead of ``max_retries`` times) and then, if there are
+        still active connections, does one of the following based on ``on_grace_expired``:
+        ``force`` resets the remaining connections by the address of the server, ``fail``
+        raises an error, and ``return`` returns false. The server is left disabled in
+        every case.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``min_available`` parameter to check remaining capacity
+            before disabling a server.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``ports`` and ``ignore_ports`` parameters to wait for
+            connections to only some ports to close.
+
+        .. versionchanged:: 2.0.0
+            Added the optional ``grace_period`` and ``on_grace_expired`` parameters to
+            bound the time spent waiting for connections to close.
+
         :param basestring server: Hostname of the server to disable
         :param int max_retries: Max number of times to sleep and retry when encountering
             some sort of transient error when disabling the server and while waiting for
             the number of active connections to a server to reach zero.
-        :return: True if the server was disabled, false otherwise.
+        :param int|None min_available: Min number of other members of each service group
+            that must remain up, ``None`` to skip the check. The default is to skip it.
+        :param collections.Iterable ports: Port numbers to wait for connections to
+            close on, ``None`` for all ports. The default is all ports.
+        :param collections.Iterable ignore_ports: Port numbers to not wait for connections
+            to close on, ``None`` to not ignore any. The default is to not ignore any.
+        :param float|None grace_period: Max number of seconds to wait for connections
+            to close, ``None`` to wait ``max_retries`` times. The default is to wait
+            ``max_retries`` times.
+        :param str on_grace_expired: One of ``force``, ``fail``, or ``return``. The
+            default is ``return``.
+        :return: True if the server was disabled (and drained, if ``grace_period`` is
+            set), false otherwise.
         :rtype: bool
         :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
             the load balancer failed when trying to establish a new session for this
             operation.
+        :raises warthog.exceptions.WarthogCapacityError: If disabling the server would
+            leave fewer than ``min_available`` members of a service group up.
+        :raises warthog.exceptions.WarthogDrainTimeoutError: If there are still active
+            connections when the grace period ends and ``on_grace_expired`` is ``fail``,
+            or when ``on_grace_expired`` is ``force`` and connections remain after they
+            are reset or the server has no IP address to reset them by.
         :raises warthog.exceptions.WarthogNoSuchNodeError: If the load balancer does
             not recognize the given hostname.
         :raises warthog.exceptions.WarthogNodeDisableError: If there are any other
             problems disabling the given server.
         """
-        with self._session_context() as session:
+        if on_grace_expired not in ON_GRACE_EXPIRED:
+            raise ValueError('Unknown grace period action {0}'.format(on_grace_expired))
+
+        server = self._resolve(server)
+        if min_available is not None:
+            self.topology.claim(server, min_available)
+
+        def operation(session):
             disable = self._commands.get_disable_server(self._scheme_host, session, server)
             self._try_repeatedly(disable.send, max_retries)
 
-            active = self._commands.get_active_connections(self._scheme_host, session, server)
-            self._wait_for_connections(active.send, max_retries)
+            probe = _NodeProbe(
+                self._commands, self._scheme_host, session, server,
+                ports=ports, ignore_ports=ignore_ports)
+            if grace_period is None:
+                self._wait_for_connections(probe, max_retries)
+            elif not self._wait_for_grace_period(probe, grace_period):
+                if not self._grace_expired(session, server, probe, on_grace_expired):
+                    return False
 
-            status = self._commands.get_server_status(
-                self._scheme_host, session, server)
-            return warthog.core.STATUS_DISABLED == status.send()
+            return warthog.core.STATUS_DISABLED == probe.latest_status()
+
+        try:
+            return self._run_for_server(server, operation)
+        except Exception:
+            if min_available is not None:
+                self.topology.release(server)
+            raise
+
+    def get_node_states(self):
+        """Get the status and number of active connections of every server known to
+        the load balancer using two bulk requests within a single session.
+
+        Servers with a status that is not recognized have a status of ``None``.
+
+        .. versionadded:: 2.0.0
+
+        :return: Dictionary of server name to the state of the server.
+        :rtype: dict
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the status or active connections of the servers.
+        """
+        states = self._run(self._node_states)
+        self._seen(states)
+        return states
+
+    def _node_states(self, session):
+        """Get the state of every server using the given session."""
+        statuses = self._commands.get_all_server_status(self._scheme_host, session).send()
+        stats = self._commands.get_all_server_stats(self._scheme_host, session).send()
+
+        out = {}
+        for server, status in statuses.items():
+            conns = stats.get(server, {}).get('curr-conn')
+            out[server] = NodeState(server, status, conns)
+        return out
+
+    def subscribe(self, servers, callback, interval=2.0):
+        """Call a function with each change in the status or number of active connections
+        of the given servers, as detected by a single background :class:`StatePoller`
+        shared by all subscriptions made with this client.
+
+        The function is called with a :class:`StateChange` from the background thread,
+        first once for each server with its current state and then for each change.
+
+        .. versionadded:: 2.0.0
+
+        :param collections.Iterable|None servers: Names of the servers to get changes for,
+            ``None`` for every server known to the load balancer.
+        :param callable callback: Function to call with each change.
+        :param float interval: Max number of seconds between checks for changes.
+        :return: Subscription that may be cancelled to stop getting changes.
+        :rtype: Subscription
+        """
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = StatePoller(self)
+            poller = self._poller
+        return poller.subscribe(servers, callback, interval=interval)
+
+    def iter_changes(self, servers=None, interval=2.0):
+        """Get each change in the status or number of active connections of the given
+        servers, like :meth:`subscribe`, as a generator. The subscription is cancelled
+        when the generator is closed.
+
+        .. versionadded:: 2.0.0
+
+        :param collections.Iterable|None servers: Names of the servers to get changes for,
+            ``None`` for every server known to the load balancer.
+        :param float interval: Max number of seconds between checks for changes.
+        :return: Generator of changes.
+        :rtype: collections.Iterable[StateChange]
+        """
+        changes = queue.Queue()
+        subscription = self.subscribe(servers, changes.put, interval=interval)
+        try:
+            while True:
+                yield changes.get()
+        finally:
+            subscription.cancel()
+
+    def get_node_stats(self):
+        """Get the status and all statistics of every server known to the load balancer
+        using two bulk requests within a single session.
+
+        Servers with a status that is not recognized have a status of ``None``.
+
+        .. versionadded:: 2.0.0
+
+        :return: Dictionary of server name to the status and statistics of the server.
+        :rtype: dict
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the status or statistics of the servers.
+        """
+        def operation(session):
+            statuses = self._commands.get_all_server_status(self._scheme_host, session).send()
+            stats = self._commands.get_all_server_stats(self._scheme_host, session).send()
+
+            out = {}
+            for server, status in statuses.items():
+                out[server] = NodeStats(server, status, stats.get(server, {}))
+            return out
+
+        stats = self._run(operation)
+        self._seen(stats)
+        if self._history is not None:
+            self._history.record(stats)
+        return stats
+
+    def get_fleet_snapshot(self, fields=None):
+        """Get the status and counters of every server known to the load balancer using
+        two bulk requests within a single session, as a compact
+        :class:`warthog.core.FleetSnapshot` instead of a dictionary per server.
+
+        .. versionadded:: 2.0.0
+
+        :param collections.Iterable fields: Names of the counters to keep, such as
+            ``curr-conn``, ``None`` to keep every integer counter.
+        :return: Snapshot of every server.
+        :rtype: warthog.core.FleetSnapshot
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the status or statistics of the servers.
+        """
+        def operation(session):
+            statuses = self._commands.get_all_server_status(self._scheme_host, session).send()
+            stats = self._commands.get_all_server_stats(self._scheme_host, session).send()
+            return warthog.core.FleetSnapshot(statuses, stats, fields=fields)
+
+        snapshot = self._run(operation)
+        self._seen(snapshot)
+        if self._history is not None:
+            self._history.record(snapshot)
+        return snapshot
+
+    def get_servers(self, start=0, count=None):
+        """Get the configuration of a single page of servers known to the load balancer.
+
+        .. versionadded:: 2.0.0
+
+        :param int start: Offset of the first server to get.
+        :param int|None count: Max number of servers to get, ``None`` to get all of them.
+        :return: Servers in the order they are configured on the load balancer.
+        :rtype: list[ServerRecord]
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the servers.
+        """
+        def operation(session):
+            cmd = self._commands.get_servers(self._scheme_host, session, start=start, count=count)
+            return [ServerRecord(*entry) for entry in cmd.send()]
+
+        servers = self._run(operation)
+        self._seen([record.server for record in servers])
+        return servers
+
+    def iter_servers(self, page_size=100):
+        """Get the configuration of every server known to the load balancer, one page
+        at a time, fetching the next page in the background while the current one is
+        being consumed.
+
+        .. versionadded:: 2.0.0
+
+        :param int page_size: Number of servers to get with each request.
+        :return: Generator of every server, in the order they are configured.
+        :rtype: collections.Iterable[ServerRecord]
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the servers.
+        """
+        return iter_pages(self.get_servers, page_size)
+
+    def get_service_groups(self):
+        """Get the members of every service group with a single bulk request.
+
+        .. versionadded:: 2.0.0
+
+        :return: Dictionary of service group name to a list of tuples of server name
+            and port for each member.
+        :rtype: dict
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the service groups.
+        """
+        def operation(session):
+            return self._commands.get_service_groups(self._scheme_host, session).send()
+
+        return self._run(operation)
+
+    def get_virtual_servers(self):
+        """Get the ports of every virtual server with a single bulk request.
+
+        .. versionadded:: 2.0.0
+
+        :return: Dictionary of virtual server name to a list of tuples of port number,
+            protocol, and service group name for each port.
+        :rtype: dict
+        :raises warthog.exceptions.WarthogAuthFailureError: If authentication with
+            the load balancer failed when trying to establish a new session for this
+            operation.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the virtual servers.
+        """
+        def operation(session):
+            return self._commands.get_virtual_servers(self._scheme_host, session).send()
+
+        return self._run(operation)
 
     # NOTE: there's a fair amount of duplicate code between this method and _wait_for_status
     # and we could consolidate them to one method that just accepts a function and waits for
     # it to return true and then break. But, this way we have more useful debug information
     # logged at the expense of duplicate code.
     # pylint: disable=missing-docstring
-    def _wait_for_connections(self, conn_method, max_retries):
+    def _wait_for_connections(self, probe, max_retries):
         retries = 0
 
         while retries < max_retries:
-            conns = conn_method()
+            conns = probe.read_connections()
             if conns == 0:
                 break
 
             self._logger.debug(
                 "Connections still active: %s, sleeping for %s seconds...", conns, self._interval)
             time.sleep(self._interval)
+            probe.expire()
             retries += 1
 
+    def _wait_for_grace_period(self, probe, grace_period):
+        """Wait up to the grace period for active connections to close and return
+        true if they did.
+        """
+        deadline = time.time() + grace_period
+
+        while True:
+            conns = probe.read_connections()
+            remaining = deadline - time.time()
+            if conns == 0:
+                return True
+            if remaining <= 0:
+                return False
+
+            self._logger.debug(
+                "Connections still active: %s, %.1f seconds of grace period left...",
+                conns, remaining)
+            time.sleep(min(self._interval, remaining))
+            probe.expire()
+
+    def _grace_expired(self, session, server, probe, action):
+        """Take the given action for a server that still has active connections at the
+        end of its grace period and return true if the server should be considered drained.
+        """
+        conns = probe.connections
+        self._logger.info(
+            'Grace period for %s ended with %s active connections, action: %s',
+            server, conns, action)
+
+        if action == ON_GRACE_FAIL:
+            raise warthog.exceptions.WarthogDrainTimeoutError(
+                '{0} still had {1} active connections at the end of its grace period'.format(
+                    server, conns), server=server, connections=conns)
+        if action == ON_GRACE_RETURN:
+            return False
+
+        address = self._commands.get_server_address(self._scheme_host, session, server).send()
+        if address is None:
+            raise warthog.exceptions.WarthogDrainTimeoutError(
+                '{0} still had {1} active connections at the end of its grace period and '
+                'has no IP address to reset them by'.format(server, conns),
+                server=server, connections=conns)
+
+        self._commands.get_reset_connections(self._scheme_host, session, address).send()
+        probe.expire()
+        conns = probe.read_connections()
+        if conns:
+            raise warthog.exceptions.WarthogDrainTimeoutError(
+                '{0} still had {1} active connections after resetting them'.format(
+                    server, conns), server=server, connections=conns)
+        return True
+
     def enable_server(self, server, max_retries=5):
         """Enable a server at the node level, optionally retrying when there are transient
         errors and waiting for the server to enter the expected, enabled state.
@@ -353,21 +1681,28 @@ class WarthogClient(object):
         :raises warthog.exceptions.WarthogNodeEnableError: If there are any other
             problems enabling the given server.
         """
-        with self._session_context() as session:
+        server = self._resolve(server)
+
+        def operation(session):
             enable = self._commands.get_enable_server(self._scheme_host, session, server)
             self._try_repeatedly(enable.send, max_retries)
 
-            status = self._commands.get_server_status(self._scheme_host, session, server)
-            self._wait_for_enable(status.send, max_retries)
+            probe = _NodeProbe(self._commands, self._scheme_host, session, server)
+            self._wait_for_enable(probe, max_retries)
+
+            return warthog.core.STATUS_ENABLED == probe.latest_status()
 
-            return warthog.core.STATUS_ENABLED == status.send()
+        enabled = self._run_for_server(server, operation)
+        if enabled and self._topology is not None:
+            self._topology.set_status(server, warthog.core.STATUS_ENABLED)
+        return enabled
 
     # pylint: disable=missing-docstring
-    def _wait_for_enable(self, status_method, max_retries):
+    def _wait_for_enable(self, probe, max_retries):
         retries = 0
 
         while retries < max_retries:
-            status = status_method()
+            status = probe.read_status()
             if status == warthog.core.STATUS_ENABLED:
                 break
 
@@ -375,6 +1710,7 @@ class WarthogClient(object):
                 "Server is not yet enabled (%s), sleeping for %s seconds...",
                 status, self._interval)
             time.sleep(self._interval)
+            probe.expire()
             retries += 1
 
     def _try_repeatedly(self, method, max_retries):
@@ -396,5 +1732,862 @@ class WarthogClient(object):
                 retries += 1
 
 
+class _NodeProbe(object):
+    """Status and active connections of a single server read during one operation, so
+    that the result of the last read is used instead of reading it again.
+
+    Both are read together with a single request, falling back to a separate request
+    for active connections if the load balancer does not include them in the state of
+    the server. Values are only reused until :meth:`expire` is called, e.g. after
+    sleeping between retries or changing the state of the server.
+
+    If ``ports`` or ``ignore_ports`` are given, active connections are the sum of the
+    active connections to the selected ports instead of the total for the server.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, commands, scheme_host, session, server, ports=None, ignore_ports=None):
+        self._commands = commands
+        self._args = (scheme_host, session, server)
+        self._ports = frozenset(ports) if ports is not None else None
+        self._ignore_ports = frozenset(ignore_ports) if ignore_ports is not None else None
+        self._state = None
+        self._conns = None
+        self.status = None
+        self.connections = None
+
+    def read_status(self):
+        if self._state is None:
+            self._state = self._commands.get_server_state(*self._args)
+        self.status, ports = self._state.send()
+        self.connections = self._count(ports) if ports is not None else None
+        return self.status
+
+    def read_connections(self):
+        if self._conns is None:
+            self.read_status()
+            if self.connections is not None:
+                return self.connections
+
+        # Connections are not part of the state of the server on this load balancer
+        if self._ports is None and self._ignore_ports is None:
+            if self._conns is None:
+                self._conns = self._commands.get_active_connections(*self._args)
+            self.connections = self._conns.send()
+            return self.connections
+
+        if self._conns is None:
+            self._conns = self._commands.get_port_connections(*self._args)
+        self.connections = self._count(self._conns.send())
+        return self.connections
+
+    def _count(self, ports):
+        return sum(
+            conns for port, _, conns in ports
+            if (self._ports is None or port in self._ports) and
+            (self._ignore_ports is None or port not in self._ignore_ports))
+
+    def latest_status(self):
+        return self.status if self.status is not None else self.read_status()
+
+    def latest_connections(self):
+        return self.connections if self.connections is not None else self.read_connections()
+
+    def expire(self):
+        self.status = None
+        self.connections = None
+
+
+# Simple immutable struct for the number of active connections to a single port of a server
+PortConnections = collections.namedtuple('PortConnections', ['port', 'protocol', 'connections'])
+
+
+# Simple immutable struct for the status and number of active connections of a server
+NodeState = collections.namedtuple('NodeState', ['server', 'status', 'connections'])
+
+
+# Simple immutable struct for the status and all statistics of a server
+NodeStats = collections.namedtuple('NodeStats', ['server', 'status', 'stats'])
+
+
+# Simple immutable struct for the configuration of a server: its address (IP or FQDN),
+# configured status, and a list of tuples of port number and protocol
+ServerRecord = collections.namedtuple('ServerRecord', ['server', 'host', 'status', 'ports'])
+
+
+class NegativeCache(object):
+    """Short lived record of servers that a load balancer reported as unknown, used to
+    fail repeated operations on them without making any requests.
+
+    Entries are keyed by the scheme/host of the load balancer and the server so that a
+    single cache may be shared by clients for different load balancers. Entries expire
+    after ``ttl`` seconds and are removed early when a listing of servers from the load
+    balancer includes the server again.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, ttl=30.0, clock=None):
+        """Set how long to remember that a server is unknown for.
+
+        :param float ttl: Number of seconds to remember that a server is unknown for.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        self._ttl = ttl
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def add(self, scheme_host, server, error):
+        """Remember that a server is unknown to a load balancer.
+
+        :param basestring scheme_host: Scheme, host, and port of the load balancer.
+        :param basestring server: Name of the server.
+        :param warthog.exceptions.WarthogNoSuchNodeError error: Error raised by the
+            load balancer for the server.
+        """
+        now = self._clock()
+        with self._lock:
+            for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+            self._entries[(scheme_host, server)] = (now + self._ttl, error)
+
+    def check(self, scheme_host, server):
+        """Raise the error the load balancer last reported for a server if it is still
+        remembered as unknown, do nothing otherwise.
+
+        :param basestring scheme_host: Scheme, host, and port of the load balancer.
+        :param basestring server: Name of the server.
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the server is unknown.
+        """
+        key = (scheme_host, server)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            expires, error = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                return
+
+        raise warthog.exceptions.WarthogNoSuchNodeError(
+            error.msg, api_msg=error.api_msg, api_code=error.api_code, server=server)
+
+    def discard(self, scheme_host, server):
+        """Forget that a server is unknown to a load balancer.
+
+        :param basestring scheme_host: Scheme, host, and port of the load balancer.
+        :param basestring server: Name of the server.
+        """
+        with self._lock:
+            self._entries.pop((scheme_host, server), None)
+
+    def seen(self, scheme_host, servers):
+        """Forget that any of the given servers, just listed by a load balancer, are
+        unknown to it.
+
+        :param basestring scheme_host: Scheme, host, and port of the load balancer.
+        :param collections.Iterable servers: Names of the servers.
+        """
+        with self._lock:
+            if not self._entries:
+                return
+            names = servers if isinstance(servers, (dict, set, frozenset)) else set(servers)
+            for key in [key for key in self._entries if key[0] == scheme_host and key[1] in names]:
+                del self._entries[key]
+
+    def clear(self):
+        """Forget every server."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Simple immutable struct for a change in the state of a server, the previous state is
+# None the first time the state of the server is seen, the current state is None if the
+# server is no longer known to the load balancer
+StateChange = collections.namedtuple('StateChange', ['server', 'previous', 'current'])
+
+
+class Subscription(object):
+    """Registration of a function to call with changes to the state of some servers.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, poller, servers, callback, interval):
+        self._poller = poller
+        self.servers = frozenset(servers) if servers is not None else None
+        self.callback = callback
+        self.interval = interval
+        self.primed = False
+
+    def wants(self, server):
+        """Return true if this subscription is for changes to the given server."""
+        return self.servers is None or server in self.servers
+
+    def cancel(self):
+        """Stop getting changes."""
+        self._poller.unsubscribe(self)
+
+
+class StatePoller(object):
+    """Single background thread that gets the state of every server with bulk requests
+    on a reused session and calls the functions subscribed to changes to each server.
+
+    The thread is started when the first function subscribes and stopped when the last
+    one is cancelled. The interval between polls is the shortest interval of all
+    current subscriptions.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, client):
+        """Set the client to get the state of servers with.
+
+        :param WarthogClient client: Client to get the state of servers with.
+        """
+        self._client = client
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._subscriptions = []
+        self._snapshot = {}
+        self._thread = None
+
+    def subscribe(self, servers, callback, interval=2.0):
+        """Call a function with each change to the state of the given servers.
+
+        :param collections.Iterable|None servers: Names of the servers to get changes
+            for, ``None`` for every server.
+        :param callable callback: Function to call with each :class:`StateChange`.
+        :param float interval: Max number of seconds between checks for changes.
+        :return: Subscription that may be cancelled to stop getting changes.
+        :rtype: Subscription
+        """
+        subscription = Subscription(self, servers, callback, interval)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='warthog-state-poller')
+                self._thread.daemon = True
+                self._thread.start()
+            self._wakeup.notify_all()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop calling the function of a subscription."""
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            self._wakeup.notify_all()
+
+    def close(self):
+        """Cancel all subscriptions and stop the background thread."""
+        with self._lock:
+            del self._subscriptions[:]
+            self._wakeup.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _interval(self):
+        return min(subscription.interval for subscription in self._subscriptions)
+
+    def _run(self):
+        while True:
+            try:
+                # pylint: disable=protected-access
+                with self._client._session_context() as session:
+                    while self._poll(session):
+                        pass
+                    return
+            except warthog.exceptions.WarthogInvalidSessionError:
+                self._logger.debug('Session for state poller was invalid, retrying...')
+            # pylint: disable=broad-except
+            except Exception as e:
+                self._logger.warning('Unable to get the state of servers: %s', e)
+                with self._lock:
+                    if not self._wait():
+                        return
+
+    def _wait(self):
+        """Wait for the poll interval or a change in subscriptions, return false (with
+        the lock held) if there are no subscriptions left and the thread should stop.
+        """
+        if self._subscriptions:
+            self._wakeup.wait(self._interval())
+        if not self._subscriptions:
+            self._thread = None
+            self._snapshot = {}
+            return False
+        return True
+
+    def _poll(self, session):
+        """Get the state of every server, publish the changes, and wait for the next
+        poll. Return false if the thread should stop.
+        """
+        with self._lock:
+            if not self._subscriptions:
+                self._thread = None
+                self._snapshot = {}
+                return False
+
+        # pylint: disable=protected-access
+        states = self._client._node_states(session)
+        self._client._seen(states)
+        self._publish(states)
+
+        with self._lock:
+            return self._wait()
+
+    def _publish(self, states):
+        with self._lock:
+            previous, self._snapshot = self._snapshot, states
+            subscriptions = list(self._subscriptions)
+
+        changes = []
+        for server, state in states.items():
+            if previous.get(server) != state:
+                changes.append(StateChange(server, previous.get(server), state))
+        for server in set(previous) - set(states):
+            changes.append(StateChange(server, previous[server], None))
+
+        for subscription in subscriptions:
+            if subscription.primed:
+                wanted = [change for change in changes if subscription.wants(change.server)]
+            else:
+                wanted = [StateChange(server, None, state) for server, state in states.items()
+                          if subscription.wants(server)]
+                subscription.primed = True
+
+            for change in wanted:
+                try:
+                    subscription.callback(change)
+                # pylint: disable=broad-except
+                except Exception as e:
+                    self._logger.warning('Error in state change callback: %s', e)
+
+
+# Simple immutable struct for a value read from the load balancer and how many seconds
+# old it is, zero if it was just read
+Reading = collections.namedtuple('Reading', ['value', 'age'])
+
+
+class _PendingRead(object):
+    """Outcome of a read running in a background thread."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class StaleReadCache(object):
+    """Last good value of each read, used in place of a fresh value when reading
+    fails or takes longer than a latency budget.
+
+    Values read less than ``max_age`` seconds ago are returned without reading them
+    again. Otherwise, if there is a last good value, the read runs in a background
+    thread. If it succeeds within ``budget`` seconds, its value is returned. Otherwise
+    the last good value is returned along with its age, and the read keeps running in
+    the background to update the value for next time. If there is no previous value
+    (or it is older than ``max_stale`` seconds), the read runs in the calling thread
+    and callers get its value or error. Only one read runs at a time for each key,
+    concurrent callers share it.
+
+    Errors for unknown servers are always raised instead of using a previous value.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, budget=1.0, max_stale=None, max_age=1.0, clock=None):
+        """Set the latency budget for reads and how old values may be.
+
+        :param float budget: Max number of seconds to wait for a read before using
+            the last good value.
+        :param float|None max_stale: Max age in seconds of values to use in place of
+            a fresh value, ``None`` for no limit. The default is no limit.
+        :param float max_age: Max age in seconds of values to use without reading them
+            again, zero to always read them again. The default is one second.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        self._budget = budget
+        self._max_stale = max_stale
+        self._max_age = max_age
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+        self._values = {}
+        self._pending = {}
+
+    def _claim(self, key):
+        """Get the read in progress for the key and false, or a new read and true if
+        there is none in progress and the caller must run it.
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending, False
+            pending = self._pending[key] = _PendingRead()
+            return pending, True
+
+    def _run(self, key, fetch, pending):
+        try:
+            pending.value = fetch()
+            with self._lock:
+                self._values[key] = (pending.value, self._clock())
+        # pylint: disable=broad-except
+        except Exception as e:
+            pending.error = e
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def _last(self, key):
+        with self._lock:
+            last = self._values.get(key)
+        if last is None:
+            return None
+
+        value, when = last
+        age = self._clock() - when
+        if self._max_stale is not None and age > self._max_stale:
+            return None
+        return Reading(value, age)
+
+    def read(self, key, fetch):
+        """Read a fresh value or use the last good value for the key.
+
+        :param collections.Hashable key: Key to remember the value of the read by.
+        :param callable fetch: Function to read a fresh value.
+        :return: The value and how many seconds old it is, zero if it is fresh.
+        :rtype: Reading
+        """
+        last = self._last(key)
+        if last is not None and last.age < self._max_age:
+            return last
+
+        pending, owner = self._claim(key)
+        if owner and last is None:
+            self._run(key, fetch, pending)
+        elif owner:
+            thread = threading.Thread(
+                target=self._run, args=(key, fetch, pending), name='warthog-stale-read')
+            thread.daemon = True
+            thread.start()
+
+        pending.done.wait(self._budget if last is not None else None)
+
+        if pending.done.is_set() and pending.error is None:
+            return Reading(pending.value, 0.0)
+        if not isinstance(pending.error, warthog.exceptions.WarthogNoSuchNodeError):
+            last = self._last(key)
+            if last is not None:
+                self._logger.debug(
+                    'Using %s second old value for %s: %s', last.age, key,
+                    pending.error if pending.done.is_set() else 'read is too slow')
+                return last
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return Reading(pending.value, 0.0)
+
+    def clear(self):
+        """Forget all values."""
+        with self._lock:
+            self._values.clear()
+
+
+class ServerResolver(object):
+    """Index of server names, addresses (IP or FQDN), and lower cased names mapped to the
+    name of the server on the load balancer, built from a single listing of all servers.
+
+    The index is refreshed when it is older than ``max_age`` seconds or when an identifier
+    isn't found in it, at most once every ``miss_interval`` seconds so that lookups of
+    unknown identifiers don't cause a listing each time.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, client, max_age=300.0, miss_interval=5.0, clock=None):
+        """Set the client to list servers with and how long to use the index for.
+
+        :param WarthogClient client: Client to list servers with.
+        :param float max_age: Max number of seconds to use the index for before
+            refreshing it.
+        :param float miss_interval: Min number of seconds between refreshes caused
+            by an identifier not being found.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        self._client = client
+        self._max_age = max_age
+        self._miss_interval = miss_interval
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._index = {}
+        self._refreshed = None
+
+    def refresh(self):
+        """List every server and rebuild the index."""
+        with self._refresh_lock:
+            index = {}
+            for record in self._client.iter_servers():
+                index[record.server] = record.server
+                index.setdefault(record.server.lower(), record.server)
+                if record.host:
+                    index.setdefault(record.host.lower(), record.server)
+
+            with self._lock:
+                self._index = index
+                self._refreshed = self._clock()
+
+        self._logger.debug('Refreshed server index, %s identifiers', len(index))
+
+    def _lookup(self, identifier):
+        with self._lock:
+            name = self._index.get(identifier)
+            if name is None:
+                name = self._index.get(identifier.lower())
+            return name, self._refreshed
+
+    def resolve(self, identifier):
+        """Get the name of the server on the load balancer with the given name or
+        address, or the identifier unchanged if there is no such server.
+
+        :param basestring identifier: Name, IP address, or FQDN of the server.
+        :return: Name of the server on the load balancer.
+        :rtype: basestring
+        """
+        name, refreshed = self._lookup(identifier)
+        now = self._clock()
+
+        if refreshed is None or now - refreshed >= self._max_age or \
+                (name is None and now - refreshed >= self._miss_interval):
+            self.refresh()
+            name, _ = self._lookup(identifier)
+
+        return name if name is not None else identifier
+
+
+# Take servers out of rotation in the order they were given
+SCHEDULE_ORDER = 'order'
+
+# Take servers with the fewest active connections out of rotation first
+SCHEDULE_LEAST_LOADED = 'least-loaded'
+
+# Take servers with the most active connections out of rotation first
+SCHEDULE_MOST_LOADED = 'most-loaded'
+
+# Take servers with similar numbers of active connections out of rotation together
+SCHEDULE_GROUPED = 'grouped'
+
+SCHEDULES = (SCHEDULE_ORDER, SCHEDULE_LEAST_LOADED, SCHEDULE_MOST_LOADED, SCHEDULE_GROUPED)
+
+
+class DrainScheduler(object):
+    """Decide which servers to take out of rotation next based on the number of
+    active connections to each, so that slow draining servers don't hold up others.
+
+    The number of active connections for all pending servers is read with a single
+    bulk request (see :meth:`WarthogClient.get_node_states`) and refreshed whenever it
+    is older than ``max_age`` seconds, re-ranking the remaining servers as counts change.
+    Servers that the load balancer doesn't report on are scheduled last.
+
+    With the ``least-loaded`` strategy, each batch is the servers with the fewest active
+    connections and with ``most-loaded``, the servers with the most. With the ``grouped``
+    strategy, each batch is the run of servers (ordered by active connections) with the
+    smallest difference between the most and fewest connections, so that servers in a
+    batch take about as long to drain. The ``order`` strategy keeps the order the servers
+    were given in and never makes any requests.
+
+    When each batch waits for its slowest server, ``least-loaded`` and ``grouped`` keep
+    fast servers from waiting on slow ones. When a new server is started as soon as any
+    other finishes (like :class:`warthog.rolling.RollingDeployment`), ``most-loaded``
+    keeps the slowest servers from being left until the end. See ``bench/schedule.py``.
+
+    The default is ``order``: ranking by connections only helps in one of the two styles
+    (``least-loaded`` and ``grouped`` are slower than ``order`` when a new server starts
+    as soon as another finishes) so callers pick a strategy for the style they use.
+
+    This class is not thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, client, servers, strategy=SCHEDULE_ORDER, max_age=5.0,
+                 clock=None):
+        """Set the client to get active connections with, servers to schedule, and
+        the strategy to use.
+
+        :param WarthogClient client: Client to get active connections with.
+        :param list servers: Host names of the servers to schedule.
+        :param str strategy: One of ``order``, ``least-loaded``, ``most-loaded``, or
+            ``grouped``.
+        :param float max_age: Max number of seconds to use active connection counts
+            for before refreshing them.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        if strategy not in SCHEDULES:
+            raise ValueError('Unknown schedule {0}'.format(strategy))
+
+        self._client = client
+        self._pending = list(servers)
+        self._strategy = strategy
+        self._max_age = max_age
+        self._clock = clock if clock is not None else time.time
+        self._connections = {}
+        self._refreshed = None
+        self._lock = threading.Lock()
+        self._prefetching = False
+        self._prefetched = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def pending(self):
+        """Servers that have not been scheduled yet, in their original order."""
+        return list(self._pending)
+
+    def refresh(self):
+        """Get the number of active connections to every pending server with a single
+        bulk request.
+        """
+        self._apply(self._client.get_node_states(), self._clock())
+
+    def _apply(self, states, when):
+        self._connections = dict(
+            (server, states[server].connections if server in states else None)
+            for server in self._pending)
+        self._refreshed = when
+
+    def prefetch(self):
+        """Start refreshing the number of active connections to every pending server in
+        a background thread, so that the next call to :meth:`next_batch` doesn't have
+        to wait for it. Does nothing if a prefetch is already running or the strategy
+        is ``order``.
+        """
+        if self._strategy == SCHEDULE_ORDER:
+            return
+
+        with self._lock:
+            if self._prefetching:
+                return
+            self._prefetching = True
+
+        def run():
+            try:
+                result = self._client.get_node_states(), self._clock()
+            # pylint: disable=broad-except
+            except Exception as e:
+                self._logger.warning('Unable to prefetch active connections: %s', e)
+                result = None
+
+            with self._lock:
+                self._prefetched = result
+                self._prefetching = False
+
+        thread = threading.Thread(target=run, name='warthog-scheduler-prefetch')
+        thread.daemon = True
+        thread.start()
+
+    def _maybe_refresh(self):
+        if self._strategy == SCHEDULE_ORDER:
+            return
+
+        with self._lock:
+            prefetched, self._prefetched = self._prefetched, None
+        if prefetched is not None:
+            self._apply(*prefetched)
+
+        if self._refreshed is not None and self._clock() - self._refreshed < self._max_age:
+            return
+
+        try:
+            self.refresh()
+        # pylint: disable=broad-except
+        except Exception as e:
+            # Scheduling with stale (or no) counts is better than failing the operation
+            self._logger.warning('Unable to refresh active connections for scheduling: %s', e)
+
+    def _rank(self, server):
+        conns = self._connections.get(server)
+        if conns is None:
+            return True, 0
+        return False, -conns if self._strategy == SCHEDULE_MOST_LOADED else conns
+
+    def _spread(self, window):
+        first, last = self._connections.get(window[0]), self._connections.get(window[-1])
+        if first is None or last is None:
+            return float('inf')
+        return last - first
+
+    def next_batch(self, size):
+        """Remove and return up to ``size`` servers to take out of rotation next.
+
+        :param int size: Max number of servers to return.
+        :return: Host names of the servers to take out of rotation next.
+        :rtype: list
+        """
+        self._maybe_refresh()
+
+        if self._strategy == SCHEDULE_ORDER:
+            batch = self._pending[:size]
+        else:
+            # Sorting is stable so servers with the same count keep their original order
+            ranked = sorted(self._pending, key=self._rank)
+            batch = ranked[:size]
+
+            if self._strategy == SCHEDULE_GROUPED and size < len(ranked):
+                best = None
+                for i in range(len(ranked) - size + 1):
+                    spread = self._spread(ranked[i:i + size])
+                    if best is None or spread < best:
+                        best, batch = spread, ranked[i:i + size]
+
+        for server in batch:
+            self._pending.remove(server)
+        return batch
+
+
+# Simple immutable struct for the outcome of running an operation against a single item
+ParallelResult = collections.namedtuple(
+    'ParallelResult', ['item', 'result', 'error', 'duration'])
+
+
+def iter_pages(fetch, page_size):
+    """Iterate over every item of a paginated listing, fetching the next page in a
+    background thread while the current page is being consumed.
+
+    At most three pages are held in memory at once: the one being consumed, the next
+    one, and the one after that while it is being fetched.
+
+    .. versionadded:: 2.0.0
+
+    :param callable fetch: Callable that accepts the offset of the first item and the
+        max number of items to get and returns a list of items. A page with fewer than
+        ``page_size`` items is assumed to be the last one.
+    :param int page_size: Number of items to fetch at once.
+    :return: Generator of every item.
+    :rtype: collections.Iterable
+    """
+    if page_size < 1:
+        raise ValueError('Page size must be at least 1, got {0}'.format(page_size))
+
+    pages = queue.Queue(maxsize=1)
+    stopped = threading.Event()
+
+    def offer(item):
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        start = 0
+        while True:
+            try:
+                page = fetch(start, page_size)
+            # pylint: disable=broad-except
+            except Exception as e:
+                offer((None, e))
+                return
+
+            if not offer((page, None)) or len(page) < page_size:
+                return
+            start += len(page)
+
+    thread = threading.Thread(target=worker, name='warthog-page-prefetch')
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            page, error = pages.get()
+            if error is not None:
+                raise error
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+    finally:
+        stopped.set()
+
+
+def run_parallel(operation, items, jobs=1):
+    """Run an operation for each of the given items using up to ``jobs`` threads,
+    yielding the outcome for each item as soon as it completes.
+
+    Exceptions raised by the operation are not propagated, they are included in the
+    outcome for the item instead. Results are yielded in the order they complete,
+    not the order of the items. If the caller stops consuming results early, items
+    that haven't been started yet are skipped.
+
+    .. versionadded:: 2.0.0
+
+    :param callable operation: Callable that accepts a single item.
+    :param iterable items: Items to run the operation for.
+    :param int jobs: Max number of items to run the operation for at once.
+    :return: Generator of the outcome for each item.
+    :rtype: collections.Iterable[ParallelResult]
+    """
+    items = list(items)
+    pending = queue.Queue()
+    results = queue.Queue()
+    stopped = threading.Event()
+
+    for item in items:
+        pending.put(item)
+
+    def worker():
+        while not stopped.is_set():
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+
+            start = time.time()
+            try:
+                results.put(ParallelResult(item, operation(item), None, time.time() - start))
+            # pylint: disable=broad-except
+            except Exception as e:
+                results.put(ParallelResult(item, None, e, time.time() - start))
+
+    for i in range(max(1, min(jobs, len(items)))):
+        thread = threading.Thread(target=worker, name='warthog-worker-{0}'.format(i))
+        thread.daemon = True
+        thread.start()
+
+    try:
+        for _ in items:
+            yield results.get()
+    finally:
+        stopped.set()
+
+
 # NOTE: This alias is only for transitioning to the v3 API
 CommandFactory3 = CommandFactory
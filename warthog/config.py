@@ -22,8 +22,14 @@ import os.path
 
 import warthog.exceptions
 import warthog.ssl
-from .packages import six
-from .packages.six.moves import configparser
+
+# Import the INI parser directly instead of via six.moves since this module is
+# loaded by the CLI and the vendored six module is comparatively slow to import.
+# pylint: disable=import-error
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
 
 # List of locations (from most preferred to least preferred) that will
 # be searched for a configuration file. These locations are typically
@@ -254,6 +260,8 @@ class WarthogConfigParser(object):
 
     def _load_file(self, path, encoding, checked):
         """Open and load the configuration file at the given path."""
+        from .packages import six
+
         if path is None:
             raise warthog.exceptions.WarthogNoConfigFileError(
                 "No configuration file was specified. Please set a "
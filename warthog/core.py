@@ -14,13 +14,13 @@ warthog.core
 Basic building blocks for authentication and interaction with a load balancer.
 """
 
+import array
 import logging
 
-import requests
-
 import warthog.exceptions
 # pylint: disable=import-error,no-name-in-module
-from .packages.six.moves import urllib
+from .packages.six import integer_types
+from .packages.six.moves import intern, urllib
 
 STATUS_ENABLED = 'enabled'
 
@@ -34,16 +34,73 @@ ERROR_CODE_BAD_PERMISSION = 419545856
 
 TRANSIENT_ERRORS = frozenset([])
 
+# HTTP status codes the response handlers check for. These are defined here instead
+# of using the requests library lookup so that importing this module doesn't load
+# requests, the transport layer is only loaded when it's actually needed.
+_HTTP_BAD_REQUEST = 400
+
+_HTTP_UNAUTHORIZED = 401
+
+_HTTP_FORBIDDEN = 403
+
+_HTTP_NOT_FOUND = 404
+
 _PATH_AUTH = '/axapi/v3/auth'
 
 _PATH_LOGOFF = '/axapi/v3/logoff'
 
-_PATH_ENABLE = _PATH_DISABLE = '/axapi/v3/slb/server/{server}'
+_PATH_ENABLE = _PATH_DISABLE = _PATH_SERVER = '/axapi/v3/slb/server/{server}'
 
 _PATH_STATUS = '/axapi/v3/slb/server/{server}/oper'
 
 _PATH_CONNS = '/axapi/v3/slb/server/{server}/stats'
 
+_PATH_CLEAR_SESSIONS = '/axapi/v3/clear/sessions'
+
+_PATH_SERVERS = '/axapi/v3/slb/server'
+
+_PATH_ALL_STATUS = '/axapi/v3/slb/server/oper'
+
+_PATH_ALL_STATS = '/axapi/v3/slb/server/stats'
+
+_PATH_SERVICE_GROUPS = '/axapi/v3/slb/service-group'
+
+_PATH_VIRTUAL_SERVERS = '/axapi/v3/slb/virtual-server'
+
+# Mapping of node states reported by the load balancer to our status constants
+_STATUS_BY_STATE = {
+    'Disabled': STATUS_DISABLED,
+    'Up': STATUS_ENABLED,
+    'Down': STATUS_DOWN,
+}
+
+# Mapping of the configured action of a node to our status constants
+_STATUS_BY_ACTION = {
+    'enable': STATUS_ENABLED,
+    'disable': STATUS_DISABLED,
+}
+
+# Keys of the IP address of a node in its configuration, in order of preference
+_IP_ADDRESS_KEYS = ('host', 'server-ipv6-addr')
+
+# Keys of the address of a node in its configuration, in order of preference
+_ADDRESS_KEYS = _IP_ADDRESS_KEYS + ('fqdn-name',)
+
+# Keys of the session filter for connections to an IPv4 or IPv6 address
+_SESSION_FILTER_IPV4 = 'dest-addr'
+
+_SESSION_FILTER_IPV6 = 'dest-ipv6-addr'
+
+
+def _server_address(entry, keys=_ADDRESS_KEYS):
+    """Get the address of a node from its configuration, ``None`` if it has none
+    of the given keys.
+    """
+    for key in keys:
+        if entry.get(key):
+            return entry[key]
+    return None
+
 
 def get_log():
     """Get the :class:`logging.Logger` instance used by the Warthog library.
@@ -75,8 +132,7 @@ class _AuthErrorHandler(object):
 
     # pylint: disable=no-self-use
     def can_handle(self, response):
-        # pylint: disable=no-member
-        return response.status_code == requests.codes.forbidden
+        return response.status_code == _HTTP_FORBIDDEN
 
     def handle(self, response):
         payload = response.json()
@@ -94,8 +150,7 @@ class _SessionErrorHandler(object):
 
     # pylint: disable=no-self-use
     def can_handle(self, response):
-        # pylint: disable=no-member
-        return response.status_code == requests.codes.unauthorized
+        return response.status_code == _HTTP_UNAUTHORIZED
 
     def handle(self, response):
         payload = response.json()
@@ -113,8 +168,7 @@ class _PermissionErrorHandler(object):
 
     # pylint: disable=no-self-use
     def can_handle(self, response):
-        # pylint: disable=no-member
-        if response.status_code != requests.codes.bad_request:
+        if response.status_code != _HTTP_BAD_REQUEST:
             return False
 
         payload = response.json()
@@ -137,8 +191,7 @@ class _NoSuchServerErrorHandler(object):
 
     # pylint: disable=no-self-use
     def can_handle(self, response):
-        # pylint: disable=no-member
-        if response.status_code != requests.codes.not_found:
+        if response.status_code != _HTTP_NOT_FOUND:
             return False
 
         payload = response.json()
@@ -426,6 +479,106 @@ class NodeDisableCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
         return payload['server']['action'] == 'disable'
 
 
+class NodeAddressCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get the IP address a particular server is configured with.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, transport, scheme_host, session_id, server):
+        """Set the requests transport layer, scheme and host of the load balancer,
+        existing session ID to use for authentication, and hostname of the server
+        to get the address of.
+
+        :param requests.Session transport: Configured requests session instance to
+            use for making HTTP or HTTPS requests to the load balancer API.
+        :param basestring scheme_host: Scheme and hostname of the load balancer to use for
+            making API requests. E.g. 'https://lb.example.com' or 'http://10.1.2.3'.
+        :param basestring session_id: Session ID from a previous authentication request
+            made to the load balancer.
+        :param basestring server: Host name of the server to get the address of.
+        """
+        super(NodeAddressCommand, self).__init__(transport, scheme_host, session_id)
+        self._server = server
+
+    def send(self):
+        """Get the IPv4 or IPv6 address of a server, or ``None`` if the server is
+        configured with an FQDN instead.
+
+        :return: The IP address of the server
+        :rtype: basestring
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the server was not
+            recognized by the load balancer.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the configuration of the server.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_SERVER)
+        url = url.format(server=self._server)
+
+        self._logger.debug('Making node config GET request for %s', self._server)
+        response = self._transport.get(url, headers=self._auth_header())
+        payload = self._extract_payload(response)
+
+        return _server_address(payload['server'], keys=_IP_ADDRESS_KEYS)
+
+
+class NodeResetConnectionsCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to reset (clear the sessions of) all remaining connections to a
+    particular server, by its IP address.
+
+    The load balancer filters sessions to clear by address, not by the name of the
+    server, so the address can be found with :class:`NodeAddressCommand` first.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, transport, scheme_host, session_id, address):
+        """Set the requests transport layer, scheme and host of the load balancer,
+        existing session ID to use for authentication, and IP address of the server
+        to reset connections to.
+
+        :param requests.Session transport: Configured requests session instance to
+            use for making HTTP or HTTPS requests to the load balancer API.
+        :param basestring scheme_host: Scheme and hostname of the load balancer to use for
+            making API requests. E.g. 'https://lb.example.com' or 'http://10.1.2.3'.
+        :param basestring session_id: Session ID from a previous authentication request
+            made to the load balancer.
+        :param basestring address: IPv4 or IPv6 address of the server to reset
+            connections to.
+        """
+        super(NodeResetConnectionsCommand, self).__init__(transport, scheme_host, session_id)
+        self._address = address
+
+    def send(self):
+        """Clear the sessions of all connections to an address and return ``True``.
+
+        :return: True if the sessions were cleared
+        :rtype: bool
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogPermissionError: If the user doesn't
+            have the required permissions to clear sessions.
+        :raises warthog.exceptions.WarthogApiError: If the sessions could not be
+            cleared for any other reason.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_CLEAR_SESSIONS)
+        key = _SESSION_FILTER_IPV6 if ':' in self._address else _SESSION_FILTER_IPV4
+        params = {'sessions': {key: self._address}}
+
+        self._logger.debug('Making session clear POST request for %s', self._address)
+        response = self._transport.post(url, headers=self._auth_header(), json=params)
+        self._logger.debug(response.text)
+        self._extract_payload(response)
+
+        return True
+
+
 class NodeStatusCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
     """Command to get the current status ('enabled', 'disabled', 'down') of a particular
     server.
@@ -473,12 +626,8 @@ class NodeStatusCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
         payload = self._extract_payload(response)
 
         status = payload['server']['oper']['state']
-        if status == 'Disabled':
-            return STATUS_DISABLED
-        if status == 'Up':
-            return STATUS_ENABLED
-        if status == 'Down':
-            return STATUS_DOWN
+        if status in _STATUS_BY_STATE:
+            return _STATUS_BY_STATE[status]
 
         raise warthog.exceptions.WarthogNodeStatusError(
             'Unknown status of {0}: status={1}'.format(self._server, status))
@@ -527,3 +676,484 @@ class NodeActiveConnectionsCommand(_AuthenticatedCommand, _ResponseHandlerMixin)
         payload = self._extract_payload(response)
 
         return payload['server']['stats']['curr-conn']
+
+
+class NodePortConnectionsCommand(NodeActiveConnectionsCommand):
+    """Command to get the current number of active connections to each port of a
+    particular server.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the current number of active connections to each port of a node as a
+        list of tuples of port number, protocol, and number of active connections.
+
+        :return: The number of active connections to each port of a node
+        :rtype: list
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the server was not
+            recognized by the load balancer.
+        :raises warthog.exceptions.WarthogApiError: If the number of active
+            connections to the server could not be determined for any other reason.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_CONNS)
+        url = url.format(server=self._server)
+
+        self._logger.debug('Making port connection count GET request for %s', self._server)
+        response = self._transport.get(url, headers=self._auth_header())
+        self._logger.debug(response.text)
+        payload = self._extract_payload(response)
+
+        out = []
+        for port in payload['server'].get('port-list', []):
+            stats = port.get('stats', {})
+            # Port stats use underscores on some versions of the API
+            conns = stats.get('curr-conn', stats.get('curr_conn', 0))
+            out.append((port.get('port-number'), port.get('protocol'), conns))
+        return out
+
+
+class NodeStateCommand(NodeStatusCommand):
+    """Command to get the current status and the number of active connections to each
+    port of a particular server with a single request.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the current status of a server at the node level as one of the
+        ``STATUS_ENABLED``, ``STATUS_DISABLED``, ``STATUS_DOWN`` constants and the current
+        number of active connections to each port of the server as a list of tuples of
+        port number, protocol, and number of active connections.
+
+        Some versions of the API do not include the number of active connections in the
+        operational state of ports, in which case the list of ports is ``None`` and the
+        connections must be read with a :class:`NodePortConnectionsCommand` instead.
+
+        :return: The status of the server and the active connections to each port
+        :rtype: tuple
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogNoSuchNodeError: If the server was not
+            recognized by the load balancer.
+        :raises warthog.exceptions.WarthogNodeStatusError: If the status of the server
+            was not a recognized status.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the state of the server.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_STATUS)
+        url = url.format(server=self._server)
+
+        self._logger.debug('Making node state GET request for %s', self._server)
+        response = self._transport.get(url, headers=self._auth_header())
+        self._logger.debug(response.text)
+        payload = self._extract_payload(response)
+
+        status = payload['server']['oper']['state']
+        if status not in _STATUS_BY_STATE:
+            raise warthog.exceptions.WarthogNodeStatusError(
+                'Unknown status of {0}: status={1}'.format(self._server, status))
+
+        ports = []
+        for port in payload['server'].get('port-list', []):
+            oper = port.get('oper', {})
+            # Port state uses underscores on some versions of the API
+            conns = oper.get('curr-conn', oper.get('curr_conn'))
+            if conns is None:
+                ports = None
+                break
+            ports.append((port.get('port-number'), port.get('protocol'), conns))
+
+        return _STATUS_BY_STATE[status], ports
+
+
+class NodeStatusListCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get the current status of every server known to the load balancer
+    with a single request.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the current status of all servers at the node level as a dictionary of
+        server name to one of the ``STATUS_ENABLED``, ``STATUS_DISABLED``, ``STATUS_DOWN``
+        constants. Servers with a status that is not recognized are mapped to ``None``
+        instead of causing the entire request to fail.
+
+        :return: The status of each server as a constant string
+        :rtype: dict
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the status of the servers.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_ALL_STATUS)
+
+        self._logger.debug('Making bulk node status GET request to %s', url)
+        response = self._transport.get(url, headers=self._auth_header())
+        payload = self._extract_payload(response)
+
+        out = {}
+        for entry in payload.get('server-list', []):
+            state = entry.get('oper', {}).get('state')
+            if state not in _STATUS_BY_STATE:
+                self._logger.debug('Unknown status of %s: status=%s', entry['name'], state)
+            out[entry['name']] = _STATUS_BY_STATE.get(state)
+        return out
+
+
+class NodeStatsListCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get the statistics (including the number of active connections)
+    of every server known to the load balancer with a single request.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the current statistics for all servers as a dictionary of server name
+        to a dictionary of statistics as returned by the load balancer. The number of
+        active connections is the ``curr-conn`` key of the statistics.
+
+        :return: The statistics of each server
+        :rtype: dict
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the statistics of the servers.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_ALL_STATS)
+
+        self._logger.debug('Making bulk node stats GET request to %s', url)
+        response = self._transport.get(url, headers=self._auth_header())
+        payload = self._extract_payload(response)
+
+        out = {}
+        for entry in payload.get('server-list', []):
+            out[entry['name']] = entry.get('stats', {})
+        return out
+
+
+class ServerListCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get the configuration of servers known to the load balancer, either
+    all of them or a single page of them.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, transport, scheme_host, session_id, start=0, count=None):
+        """Set the requests transport layer, scheme and host of the load balancer,
+        existing session ID to use for authentication, and the page of servers to get.
+
+        :param requests.Session transport: Configured requests session instance to
+            use for making HTTP or HTTPS requests to the load balancer API.
+        :param basestring scheme_host: Scheme and hostname of the load balancer to use for
+            making API requests. E.g. 'https://lb.example.com' or 'http://10.1.2.3'.
+        :param basestring session_id: Session ID from a previous authentication request
+            made to the load balancer.
+        :param int start: Offset of the first server to get.
+        :param int|None count: Max number of servers to get, ``None`` to get all of them.
+        """
+        super(ServerListCommand, self).__init__(transport, scheme_host, session_id)
+        self._start = start
+        self._count = count
+
+    def send(self):
+        """Get servers as a list of tuples of name, address (IP or FQDN), configured
+        status (``STATUS_ENABLED`` or ``STATUS_DISABLED``), and a list of tuples of port
+        number and protocol, in the order they are configured on the load balancer.
+
+        :return: The configuration of each server
+        :rtype: list
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the servers.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_SERVERS)
+        params = None
+        if self._count is not None:
+            params = {'start': self._start, 'count': self._count}
+
+        self._logger.debug('Making server list GET request to %s with %s', url, params)
+        response = self._transport.get(url, headers=self._auth_header(), params=params)
+        payload = self._extract_payload(response)
+
+        out = []
+        for entry in payload.get('server-list', []):
+            out.append((
+                entry['name'],
+                _server_address(entry),
+                _STATUS_BY_ACTION.get(entry.get('action', 'enable')),
+                [(port.get('port-number'), port.get('protocol'))
+                 for port in entry.get('port-list', [])]))
+        return out
+
+
+class ServiceGroupListCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get every service group and its members with a single request.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the members of every service group as a dictionary of service group name
+        to a list of tuples of server name and port.
+
+        :return: The members of each service group
+        :rtype: dict
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the service groups.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_SERVICE_GROUPS)
+
+        self._logger.debug('Making bulk service group GET request to %s', url)
+        response = self._transport.get(url, headers=self._auth_header())
+        payload = self._extract_payload(response)
+
+        out = {}
+        for entry in payload.get('service-group-list', []):
+            out[entry['name']] = [
+                (member['name'], member.get('port')) for member in entry.get('member-list', [])]
+        return out
+
+
+class VirtualServerListCommand(_AuthenticatedCommand, _ResponseHandlerMixin):
+    """Command to get every virtual server and the service group behind each of its
+    ports with a single request.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def send(self):
+        """Get the ports of every virtual server as a dictionary of virtual server name
+        to a list of tuples of port number, protocol, and service group name (or ``None``).
+
+        :return: The ports of each virtual server
+        :rtype: dict
+        :raises warthog.exceptions.WarthogInvalidSessionError: If the load balancer
+            did not recognize the session this command is being run as part of.
+        :raises warthog.exceptions.WarthogApiError: If there are any other problems
+            getting the virtual servers.
+        """
+        url = _get_endpoint_url(self._scheme_host, _PATH_VIRTUAL_SERVERS)
+
+        self._logger.debug('Making bulk virtual server GET request to %s', url)
+        response = self._transport.get(url, headers=self._auth_header())
+        payload = self._extract_payload(response)
+
+        out = {}
+        for entry in payload.get('virtual-server-list', []):
+            out[entry['name']] = [
+                (port.get('port-number'), port.get('protocol'), port.get('service-group'))
+                for port in entry.get('port-list', [])]
+        return out
+
+
+# Small integer code of each status in a FleetSnapshot, the code being the index
+_STATUS_CODES = (None, STATUS_ENABLED, STATUS_DISABLED, STATUS_DOWN)
+
+# Value of a counter in a FleetSnapshot for servers without the counter
+_MISSING_COUNTER = -1
+
+
+def _counter_typecode():
+    """Get the typecode of the largest signed integer array type available."""
+    try:
+        array.array('q')
+        return 'q'
+    except ValueError:
+        # 64 bit integer arrays are only available on Python 3.3+
+        return 'l'
+
+
+def _is_counter(value):
+    return isinstance(value, integer_types) and not isinstance(value, bool)
+
+
+def _intern(name):
+    try:
+        return intern(name)
+    except TypeError:
+        # Unicode strings can't be interned on Python 2
+        return name
+
+
+class SnapshotRow(object):
+    """View of the status and counters of a single server in a :class:`FleetSnapshot`.
+
+    Rows hold only a reference to the snapshot and their position in it, values are
+    read from the columns of the snapshot when accessed.
+
+    .. versionadded:: 2.0.0
+    """
+    __slots__ = ('_snapshot', '_row')
+
+    def __init__(self, snapshot, row):
+        self._snapshot = snapshot
+        self._row = row
+
+    @property
+    def server(self):
+        """Name of the server."""
+        # pylint: disable=protected-access
+        return self._snapshot._names[self._row]
+
+    @property
+    def status(self):
+        """One of the ``STATUS_*`` constants or ``None`` if the status is not recognized."""
+        # pylint: disable=protected-access
+        return _STATUS_CODES[self._snapshot._statuses[self._row]]
+
+    @property
+    def connections(self):
+        """Number of active connections, or ``None`` if not known."""
+        return self.get('curr-conn')
+
+    def get(self, field, default=None):
+        """Get the value of a counter, or ``default`` if the server doesn't have it.
+
+        :param str field: Name of the counter, e.g. ``curr-conn``.
+        """
+        # pylint: disable=protected-access
+        column = self._snapshot._columns.get(field)
+        if column is None or column[self._row] == _MISSING_COUNTER:
+            return default
+        return column[self._row]
+
+    @property
+    def stats(self):
+        """Dictionary of every counter the server has to its value."""
+        # pylint: disable=protected-access
+        out = {}
+        for field, column in self._snapshot._columns.items():
+            if column[self._row] != _MISSING_COUNTER:
+                out[field] = column[self._row]
+        return out
+
+    def __eq__(self, other):
+        return isinstance(other, SnapshotRow) and (self.server, self.status, self.stats) == \
+            (other.server, other.status, other.stats)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.server)
+
+    def __repr__(self):
+        return 'SnapshotRow(server={0!r}, status={1!r}, connections={2!r})'.format(
+            self.server, self.status, self.connections)
+
+
+class FleetSnapshot(object):
+    """Compact, read-only snapshot of the status and counters of every server.
+
+    Instead of a dictionary of statistics per server, as returned by
+    :class:`NodeStatsListCommand`, each counter is kept in a single array with one entry
+    per server, each status is kept as a small integer code, and server names are
+    interned. Servers are looked up by name through a single dictionary of name to row.
+    This uses a fraction of the memory of the dictionaries for thousands of servers.
+
+    Only integer counters are kept, other statistics are dropped. Counters are expected
+    to be zero or more, negative values are treated as missing.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    __slots__ = ('_names', '_index', '_statuses', '_columns')
+
+    def __init__(self, statuses, stats, fields=None):
+        """Build the snapshot from the results of the bulk status and stats commands.
+
+        :param dict statuses: Server name to status, as returned by
+            :class:`NodeStatusListCommand`. Only servers with a status are included.
+        :param dict stats: Server name to a dictionary of statistics, as returned by
+            :class:`NodeStatsListCommand`.
+        :param collections.Iterable fields: Names of the counters to keep, ``None``
+            to keep every integer counter.
+        """
+        codes = dict((status, code) for code, status in enumerate(_STATUS_CODES))
+        self._names = [_intern(name) for name in sorted(statuses)]
+        self._index = dict((name, row) for row, name in enumerate(self._names))
+        self._statuses = array.array(
+            'b', [codes.get(statuses[name], 0) for name in self._names])
+
+        if fields is None:
+            fields = set()
+            for name in self._names:
+                for field, value in stats.get(name, {}).items():
+                    if _is_counter(value):
+                        fields.add(field)
+
+        typecode = _counter_typecode()
+        self._columns = {}
+        for field in sorted(fields):
+            column = array.array(typecode)
+            for name in self._names:
+                value = stats.get(name, {}).get(field)
+                column.append(value if _is_counter(value) and value >= 0 else _MISSING_COUNTER)
+            self._columns[_intern(field)] = column
+
+    @property
+    def fields(self):
+        """Sorted names of the counters kept in this snapshot."""
+        return sorted(self._columns)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, server):
+        return server in self._index
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __getitem__(self, server):
+        return SnapshotRow(self, self._index[server])
+
+    def get(self, server, default=None):
+        """Get the row of a server, or ``default`` if it isn't in the snapshot.
+
+        :param str server: Name of the server.
+        :rtype: SnapshotRow
+        """
+        row = self._index.get(server)
+        return SnapshotRow(self, row) if row is not None else default
+
+    def rows(self):
+        """Get the row of every server, in order of server name.
+
+        :rtype: collections.Iterable[SnapshotRow]
+        """
+        return (SnapshotRow(self, row) for row in range(len(self._names)))
+
+    def column(self, field):
+        """Get the values of a counter for every server, in order of server name, with
+        ``None`` for servers that don't have it.
+
+        :param str field: Name of the counter, e.g. ``curr-conn``.
+        :rtype: list
+        """
+        column = self._columns.get(field)
+        if column is None:
+            return [None] * len(self._names)
+        return [None if value == _MISSING_COUNTER else value for value in column]
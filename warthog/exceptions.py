@@ -61,6 +61,46 @@ class WarthogMalformedConfigFileError(WarthogConfigError):
         return '. '.join(out)
 
 
+class WarthogSessionPoolTimeoutError(WarthogError):
+    """No pooled session became available within the allowed time.
+
+    .. versionadded:: 2.0.0
+    """
+
+
+class WarthogAgentError(WarthogError):
+    """There was some error communicating with the local Warthog agent or the
+    agent encountered an unexpected error performing an operation.
+
+    .. versionadded:: 2.0.0
+    """
+
+
+class WarthogRollingError(WarthogError):
+    """Some phase of a rolling deployment failed for a node.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, msg, server=None, phase=None):
+        super(WarthogRollingError, self).__init__(msg)
+        self.server = server
+        self.phase = phase
+
+
+class WarthogCapacityError(WarthogError):
+    """Taking a node out of rotation would leave too few members of one or more of
+    its service groups up.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, msg, server=None, groups=None):
+        super(WarthogCapacityError, self).__init__(msg)
+        self.server = server
+        self.groups = dict(groups) if groups is not None else {}
+
+
 class WarthogApiError(WarthogError):
     """Base for errors raised in the course of interacting with the load balancer."""
 
@@ -106,5 +146,17 @@ class WarthogPermissionError(WarthogNodeError):
     """
 
 
+class WarthogDrainTimeoutError(WarthogNodeError):
+    """A node still had active connections when the grace period for it to drain ended.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, msg, api_msg=None, api_code=None, server=None, connections=None):
+        super(WarthogDrainTimeoutError, self).__init__(
+            msg, api_msg=api_msg, api_code=api_code, server=server)
+        self.connections = connections
+
+
 class WarthogNodeStatusError(WarthogNodeError):
     """There was some error while getting the status of a node."""
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.history
+~~~~~~~~~~~~~~~
+
+Fixed-size, in-memory history of the statistics of every server, recorded from bulk
+stats reads, and whole-fleet calculations over it: rates of change, exponentially
+weighted moving averages, percentiles, time until connections drain, and totals per
+group of servers. NumPy is used for the calculations when it is installed.
+"""
+
+import array
+import math
+import threading
+import time
+
+import warthog.client
+import warthog.core
+
+# pylint: disable=import-error,invalid-name
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_NAN = float('nan')
+
+
+def _value(node, field):
+    """Get a counter of a :class:`warthog.client.NodeStats`,
+    :class:`warthog.client.NodeState`, or :class:`warthog.core.SnapshotRow` as a float,
+    NaN if the node doesn't have it.
+    """
+    if isinstance(node, warthog.core.SnapshotRow):
+        value = node.get(field)
+    elif isinstance(node, warthog.client.NodeState):
+        value = node.connections if field == 'curr-conn' else None
+    else:
+        value = node.stats.get(field)
+
+    try:
+        return float(value) if value is not None else _NAN
+    except (TypeError, ValueError):
+        return _NAN
+
+
+def _percentile(ordered, q):
+    """Get a percentile of sorted values by linear interpolation between the closest
+    ranks, the same as the default method of ``numpy.percentile``.
+    """
+    pos = (len(ordered) - 1) * q / 100.0
+    low = int(math.floor(pos))
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+class StatsHistory(object):
+    """Ring buffer of the last ``capacity`` samples of some counters of every server.
+
+    Each sample keeps one array of floats per counter with an entry for each server,
+    servers being assigned a position in the arrays the first time they are recorded.
+    Once the buffer is full, recording a sample replaces the oldest one. Servers missing
+    from a sample, or without a counter, have no value for it in that sample.
+
+    Calculations are done for every server at once, using NumPy if it is installed
+    (unless disabled with ``use_numpy``) and plain Python otherwise, and return a
+    dictionary of server name to result, with ``None`` for servers without enough values.
+
+    A history can be given to :class:`warthog.client.WarthogClient` to record the result
+    of every call to :meth:`warthog.client.WarthogClient.get_node_stats` and
+    :meth:`warthog.client.WarthogClient.get_fleet_snapshot`.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, capacity=60, fields=None, use_numpy=None, clock=None):
+        """Set the number of samples to keep and the counters to keep for each server.
+
+        :param int capacity: Max number of samples to keep.
+        :param collections.Iterable fields: Names of the counters to keep, ``curr-conn``
+            (the number of active connections) by default.
+        :param bool use_numpy: Use NumPy for calculations, ``None`` to use it if it is
+            installed.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        :raises ValueError: If the capacity is less than one or ``use_numpy`` is set
+            but NumPy is not installed.
+        """
+        if capacity < 1:
+            raise ValueError('Capacity must be at least one, got {0}'.format(capacity))
+        if use_numpy and numpy is None:
+            raise ValueError('NumPy is not installed')
+
+        self._capacity = capacity
+        self._fields = tuple(fields) if fields is not None else ('curr-conn',)
+        self._numpy = numpy is not None if use_numpy is None else use_numpy
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+
+        self._servers = []
+        self._index = {}
+        self._times = []
+        self._samples = []
+        self._next = 0
+
+    @property
+    def fields(self):
+        """Names of the counters kept for each server."""
+        return self._fields
+
+    @property
+    def servers(self):
+        """Names of every server recorded, in the order they were first recorded."""
+        with self._lock:
+            return list(self._servers)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._samples)
+
+    def clear(self):
+        """Remove every sample and server."""
+        with self._lock:
+            self._servers = []
+            self._index = {}
+            self._times = []
+            self._samples = []
+            self._next = 0
+
+    def record(self, nodes, timestamp=None):
+        """Record a sample of the counters of every server.
+
+        :param dict nodes: Server name to :class:`warthog.client.NodeStats` or
+            :class:`warthog.client.NodeState`, such as returned by
+            :meth:`warthog.client.WarthogClient.get_node_stats`, or a
+            :class:`warthog.core.FleetSnapshot`.
+        :param float timestamp: Time of the sample in seconds, now if not given.
+        """
+        timestamp = self._clock() if timestamp is None else timestamp
+
+        with self._lock:
+            for server in nodes:
+                if server not in self._index:
+                    self._index[server] = len(self._servers)
+                    self._servers.append(server)
+
+            size = len(self._servers)
+            sample = {}
+            for field in self._fields:
+                column = array.array('d', [_NAN]) * size
+                for server in nodes:
+                    column[self._index[server]] = _value(nodes[server], field)
+                sample[field] = column
+
+            if len(self._samples) < self._capacity:
+                self._times.append(timestamp)
+                self._samples.append(sample)
+            else:
+                self._times[self._next] = timestamp
+                self._samples[self._next] = sample
+            self._next = (self._next + 1) % self._capacity
+
+    def _window(self, field, window):
+        """Get the names of servers, times of samples, and values of the given counter
+        in each sample (oldest first) no older than ``window`` seconds before the newest.
+        """
+        if field not in self._fields:
+            raise ValueError('Counter {0} is not kept in this history'.format(field))
+
+        with self._lock:
+            servers = list(self._servers)
+            if len(self._samples) < self._capacity:
+                order = range(len(self._samples))
+            else:
+                order = list(range(self._next, self._capacity)) + list(range(self._next))
+            times = [self._times[i] for i in order]
+            columns = [self._samples[i][field] for i in order]
+
+        if window is not None and times:
+            start = 0
+            while times[start] < times[-1] - window:
+                start += 1
+            times, columns = times[start:], columns[start:]
+        return servers, times, columns
+
+    @staticmethod
+    def _matrix(servers, columns):
+        """Convert columns of possibly different lengths into a 2D array of samples by
+        servers, with NaN for servers added after a sample was recorded.
+        """
+        out = numpy.full((len(columns), len(servers)), numpy.nan)
+        for row, column in enumerate(columns):
+            out[row, :len(column)] = numpy.frombuffer(column, dtype=numpy.float64)
+        return out
+
+    @staticmethod
+    def _result(servers, values):
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            # Converting all at once is much faster than one element at a time
+            values = values.tolist()
+        return dict((server, None if math.isnan(value) else float(value))
+                    for server, value in zip(servers, values))
+
+    @staticmethod
+    def _get(column, pos):
+        return column[pos] if pos < len(column) else _NAN
+
+    def latest(self, field='curr-conn'):
+        """Get the value of a counter in the newest sample.
+
+        :param str field: Name of the counter.
+        :return: Server name to value.
+        :rtype: dict
+        """
+        servers, _, columns = self._window(field, None)
+        if not columns:
+            return dict((server, None) for server in servers)
+        return self._result(servers, [self._get(columns[-1], i) for i in range(len(servers))])
+
+    def _rates(self, servers, times, columns):
+        if len(times) < 2 or times[-1] <= times[0]:
+            return [_NAN] * len(servers)
+
+        elapsed = times[-1] - times[0]
+        if self._numpy:
+            matrix = self._matrix(servers, [columns[0], columns[-1]])
+            return (matrix[1] - matrix[0]) / elapsed
+
+        first, last = columns[0], columns[-1]
+        return [(self._get(last, i) - self._get(first, i)) / elapsed
+                for i in range(len(servers))]
+
+    def rates(self, field='curr-conn', window=None):
+        """Get the rate of change per second of a counter between the oldest and newest
+        samples. For ``curr-conn``, a negative rate is how quickly a server is draining.
+
+        :param str field: Name of the counter.
+        :param float window: Only use samples no more than this many seconds older than
+            the newest sample, ``None`` to use every sample.
+        :return: Server name to rate per second.
+        :rtype: dict
+        """
+        servers, times, columns = self._window(field, window)
+        return self._result(servers, self._rates(servers, times, columns))
+
+    def ewma(self, field='curr-conn', alpha=0.3, window=None):
+        """Get the exponentially weighted moving average of a counter over the samples,
+        oldest first. Samples without a value for a server are skipped for that server.
+
+        :param str field: Name of the counter.
+        :param float alpha: Weight of each newer sample, between zero and one.
+        :param float window: Only use samples no more than this many seconds older than
+            the newest sample, ``None`` to use every sample.
+        :return: Server name to average.
+        :rtype: dict
+        """
+        servers, _, columns = self._window(field, window)
+        if not columns:
+            return dict((server, None) for server in servers)
+
+        if self._numpy:
+            matrix = self._matrix(servers, columns)
+            average = matrix[0].copy()
+            for row in matrix[1:]:
+                average = numpy.where(
+                    numpy.isnan(average), row,
+                    numpy.where(numpy.isnan(row), average, alpha * row + (1 - alpha) * average))
+            return self._result(servers, average)
+
+        averages = []
+        for i in range(len(servers)):
+            average = _NAN
+            for column in columns:
+                value = self._get(column, i)
+                if math.isnan(value):
+                    continue
+                average = value if math.isnan(average) else \
+                    alpha * value + (1 - alpha) * average
+            averages.append(average)
+        return self._result(servers, averages)
+
+    def percentiles(self, field='curr-conn', q=(50, 90, 99), servers=None):
+        """Get percentiles of a counter across servers in the newest sample, for example
+        the median number of active connections per server.
+
+        :param str field: Name of the counter.
+        :param collections.Iterable q: Percentiles to get, between 0 and 100.
+        :param collections.Iterable servers: Names of the servers to include, ``None``
+            for every server with a value.
+        :return: Percentile to value, ``None`` if no server has a value.
+        :rtype: dict
+        """
+        names, _, columns = self._window(field, None)
+        latest = columns[-1] if columns else array.array('d')
+        rows = None
+        if servers is not None:
+            positions = dict((name, i) for i, name in enumerate(names))
+            rows = [positions[server] for server in servers if server in positions]
+
+        if self._numpy:
+            values = self._matrix(names, [latest])[0]
+            values = values[rows] if rows is not None else values
+            values = values[~numpy.isnan(values)]
+            if not values.size:
+                return dict((percent, None) for percent in q)
+            results = numpy.percentile(values, list(q)).tolist()
+            return dict(zip(q, results))
+
+        values = [self._get(latest, row) for row in rows] if rows is not None else latest
+        ordered = sorted(value for value in values if not math.isnan(value))
+        if not ordered:
+            return dict((percent, None) for percent in q)
+        return dict((percent, _percentile(ordered, percent)) for percent in q)
+
+    def time_to_zero(self, field='curr-conn', window=None):
+        """Estimate the number of seconds until a counter reaches zero at the rate it has
+        been falling, for example how long until a server being drained has no active
+        connections.
+
+        :param str field: Name of the counter.
+        :param float window: Only use samples no more than this many seconds older than
+            the newest sample, ``None`` to use every sample.
+        :return: Server name to seconds, zero for servers already at zero and ``None`` for
+            servers with a counter that is not falling.
+        :rtype: dict
+        """
+        servers, times, columns = self._window(field, window)
+        rates = self._rates(servers, times, columns)
+        latest = columns[-1] if columns else array.array('d')
+
+        if self._numpy:
+            current = self._matrix(servers, [latest])[0]
+            rates = numpy.asarray(rates, dtype=numpy.float64)
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                estimates = numpy.where(rates < 0, current / -rates, numpy.nan)
+            estimates = numpy.where(current == 0, 0.0, estimates)
+            return self._result(servers, estimates)
+
+        estimates = []
+        for i, rate in enumerate(rates):
+            current = self._get(latest, i)
+            if current == 0:
+                estimates.append(0.0)
+            elif rate < 0:
+                estimates.append(current / -rate)
+            else:
+                estimates.append(_NAN)
+        return self._result(servers, estimates)
+
+    def group_totals(self, groups, field='curr-conn'):
+        """Get the sum of a counter over the servers in each group in the newest sample,
+        for example the active connections of each service group.
+
+        :param dict groups: Group name to the names of the servers in it. Servers in a
+            group more than once, such as members of a service group on several ports,
+            are counted once.
+        :param str field: Name of the counter.
+        :return: Group name to total, ignoring servers without a value.
+        :rtype: dict
+        """
+        servers, _, columns = self._window(field, None)
+        positions = dict((server, i) for i, server in enumerate(servers))
+        latest = columns[-1] if columns else array.array('d')
+        if self._numpy:
+            latest = self._matrix(servers, [latest])[0]
+
+        out = {}
+        for group, members in groups.items():
+            rows = sorted(set(positions[member] for member in members if member in positions))
+            if self._numpy:
+                out[group] = float(numpy.nansum(latest[rows])) if rows else 0.0
+            else:
+                values = [self._get(latest, row) for row in rows]
+                out[group] = sum((value for value in values if not math.isnan(value)), 0.0)
+        return out
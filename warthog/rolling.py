@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.rolling
+~~~~~~~~~~~~~~~
+
+Rolling deployments: take servers out of rotation, deploy to them, and put
+them back, as many at a time as the allowed number of unavailable servers permits.
+"""
+
+import collections
+import os
+import subprocess
+import threading
+import time
+
+import warthog.client
+import warthog.core
+import warthog.exceptions
+# pylint: disable=import-error
+from .packages.six.moves import queue, shlex_quote
+
+PHASE_DISABLE = 'disable'
+
+PHASE_DRAIN = 'drain'
+
+PHASE_DEPLOY = 'deploy'
+
+PHASE_ENABLE = 'enable'
+
+PHASE_VERIFY = 'verify'
+
+# All phases each server goes through, in order
+PHASES = (PHASE_DISABLE, PHASE_DRAIN, PHASE_DEPLOY, PHASE_ENABLE, PHASE_VERIFY)
+
+# Stop starting new servers once the failure threshold is exceeded
+ON_FAILURE_STOP = 'stop'
+
+# Stop starting new servers and run the rollback hook on every server the
+# deploy hook was run on once the failure threshold is exceeded
+ON_FAILURE_ROLLBACK = 'rollback'
+
+# Simple immutable struct for the outcome of a rolling deployment for a single
+# server: the phase it failed in (or None), the error, seconds spent in each phase,
+# and whether the server was being rolled back.
+NodeResult = collections.namedtuple(
+    'NodeResult', ['server', 'ok', 'phase', 'error', 'timings', 'rollback'])
+
+# Simple immutable struct for timing of a group of servers started at the same time: the
+# seconds between a slot freeing up and the servers being started, and the seconds they
+# spent being disabled and drained while previous servers were still being verified.
+BatchMetrics = collections.namedtuple('BatchMetrics', ['servers', 'gap', 'overlap'])
+
+# Simple immutable struct for the outcome of an entire rolling deployment. It is aborted
+# only if more than max_failures servers failed, servers skipped because failed servers
+# used up the unavailable budget don't abort it.
+RolloutResult = collections.namedtuple(
+    'RolloutResult', ['results', 'skipped', 'aborted', 'rollback', 'batches'])
+
+
+def resolve_max_unavailable(value, total):
+    """Convert a max number of unavailable servers given as a count or a fraction
+    of the total into a count, rounding fractions down but never below one.
+
+    Floats between zero and one (inclusive) are fractions, so ``1.0`` is every server
+    while ``1`` is a single server.
+
+    :param int|float value: Count (one or greater) or fraction (greater than zero and
+        at most one).
+    :param int total: Total number of servers in the deployment.
+    :return: Max number of servers that may be out of rotation at once.
+    :rtype: int
+    :raises ValueError: If the value is not a positive count or a fraction.
+    """
+    if isinstance(value, float) and 0 < value <= 1:
+        return max(1, int(value * total))
+    if value >= 1 and int(value) == value:
+        return int(value)
+    raise ValueError(
+        'Max unavailable must be a positive count or a fraction, got {0}'.format(value))
+
+
+def shell_hook(command):
+    """Create a hook that runs a shell command for a server.
+
+    Occurrences of ``{server}`` in the command are replaced by the (shell quoted)
+    name of the server and the ``WARTHOG_SERVER`` environment variable is set to it.
+
+    :param str|unicode command: Shell command to run.
+    :return: Callable that accepts a server name and raises an error if the
+        command exits with a non-zero status.
+    :rtype: callable
+    """
+    def hook(server):
+        env = dict(os.environ)
+        env['WARTHOG_SERVER'] = server
+        code = subprocess.call(
+            command.replace('{server}', shlex_quote(server)), shell=True, env=env)
+        if code != 0:
+            raise warthog.exceptions.WarthogRollingError(
+                'Hook for {0} exited with status {1}'.format(server, code), server=server)
+
+    return hook
+
+
+def summarize_timings(results):
+    """Get the total and max number of seconds spent in each phase across all servers.
+
+    :param list results: :class:`NodeResult` instances.
+    :return: Ordered mapping of phase to a tuple of total and max seconds.
+    :rtype: collections.OrderedDict
+    """
+    out = collections.OrderedDict()
+    for phase in PHASES:
+        times = [res.timings[phase] for res in results if phase in res.timings]
+        if times:
+            out[phase] = (sum(times), max(times))
+    return out
+
+
+class RollingDeployment(object):
+    """Run a deployment hook for each of a list of servers, taking each out of rotation
+    in the load balancer before the hook and putting it back afterwards.
+
+    Each server goes through the phases disable, drain (wait for active connections to
+    reach zero), deploy (run the hook), enable, and verify (wait for the server to be
+    enabled and run the optional verify hook). As many servers are processed at once as
+    ``max_unavailable`` allows. A new server is started as soon as any other finishes.
+
+    With ``pipeline`` enabled, the active connections used for scheduling the next servers
+    are fetched in the background while the current servers deploy, and the slot of each
+    server is given to the next one as soon as it is back in rotation (enabled), so that
+    disabling and draining the next server overlaps with verifying the current one.
+
+    Servers that fail while out of rotation are left as they are and count against
+    ``max_unavailable`` for the rest of the deployment. Once more than ``max_failures``
+    servers have failed, no new servers are started and, if ``on_failure`` is ``rollback``,
+    the rollback hook is run (using the same phases) for every server the deploy hook was
+    run on.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, client, hook, max_unavailable=1, max_failures=0,
+                 on_failure=ON_FAILURE_STOP, rollback_hook=None, verify=None,
+                 drain_timeout=300.0, verify_timeout=60.0, interval=2.0, callback=None,
+                 schedule=warthog.client.SCHEDULE_ORDER, pipeline=False):
+        """Set the client and hooks to use and the constraints of the deployment.
+
+        :param warthog.client.WarthogClient client: Client to use for interacting with
+            the load balancer. It should be safe to use from multiple threads.
+        :param callable hook: Callable that accepts a server name and deploys to it,
+            raising an exception or returning ``False`` on failure.
+        :param int|float max_unavailable: Max number (or fraction) of servers that may
+            be out of rotation at once.
+        :param int max_failures: Max number of servers that may fail before the deployment
+            is stopped.
+        :param str on_failure: Either ``stop`` or ``rollback``.
+        :param callable rollback_hook: Callable with the same signature as ``hook`` to
+            run for each server the deploy hook was run on, when rolling back.
+        :param callable verify: Optional callable with the same signature as ``hook`` that
+            checks that a server is healthy after it has been enabled.
+        :param float drain_timeout: Max seconds to wait for active connections to reach zero.
+        :param float verify_timeout: Max seconds to wait for a server to become enabled.
+        :param float interval: Seconds to wait between checks while draining or verifying.
+        :param callable callback: Optional callable invoked with each :class:`NodeResult`
+            as soon as it is available.
+        :param str schedule: Strategy for picking the next servers to deploy to, one of
+            ``order``, ``least-loaded``, ``most-loaded``, or ``grouped``. See
+            :class:`warthog.client.DrainScheduler`.
+        :param bool pipeline: Prefetch active connections for scheduling in the background
+            and start the next server as soon as the current one is back in rotation.
+        """
+        if on_failure not in (ON_FAILURE_STOP, ON_FAILURE_ROLLBACK):
+            raise ValueError('Unknown failure mode {0}'.format(on_failure))
+        if on_failure == ON_FAILURE_ROLLBACK and rollback_hook is None:
+            raise ValueError('A rollback hook is required to roll back on failure')
+        if schedule not in warthog.client.SCHEDULES:
+            raise ValueError('Unknown schedule {0}'.format(schedule))
+
+        self._client = client
+        self._hook = hook
+        self._max_unavailable = max_unavailable
+        self._max_failures = max_failures
+        self._on_failure = on_failure
+        self._rollback_hook = rollback_hook
+        self._verify = verify
+        self._drain_timeout = drain_timeout
+        self._verify_timeout = verify_timeout
+        self._interval = interval
+        self._callback = callback
+        self._schedule = schedule
+        self._pipeline = pipeline
+
+    def run(self, servers):
+        """Deploy to each of the given servers, rolling back if required, and return
+        the outcome for every server.
+
+        :param list servers: Host names of the servers to deploy to.
+        :return: Outcome of the entire deployment.
+        :rtype: RolloutResult
+        """
+        servers = list(servers)
+        limit = resolve_max_unavailable(self._max_unavailable, len(servers))
+        scheduler = warthog.client.DrainScheduler(
+            self._client, servers, strategy=self._schedule, max_age=self._interval)
+        results, skipped, aborted, batches = self._roll(scheduler, self._hook, limit)
+
+        rollback = []
+        if aborted and self._on_failure == ON_FAILURE_ROLLBACK:
+            deployed = [res.server for res in results
+                        if res.phase not in (PHASE_DISABLE, PHASE_DRAIN)]
+            self._logger.info('Rolling back %s servers', len(deployed))
+            scheduler = warthog.client.DrainScheduler(
+                self._client, deployed, strategy=warthog.client.SCHEDULE_ORDER)
+            rollback, _, _, _ = self._roll(scheduler, self._rollback_hook, limit, rollback=True)
+
+        return RolloutResult(results, skipped, aborted, rollback, batches)
+
+    def _roll(self, pending, hook, limit, rollback=False):
+        """Process servers picked by the scheduler with up to ``limit`` out of rotation at
+        once, returning the results, the servers that were never started, whether the
+        failure threshold was exceeded, and metrics for each group of servers started.
+
+        Servers that are never started because failed servers used up the unavailable
+        budget are skipped without the deployment being aborted.
+        """
+        done = queue.Queue()
+        results = []
+        batches = []
+        finished = {}
+        released = set()
+        running = 0
+        holding = 0
+        stuck = 0
+        failures = 0
+        aborted = False
+        freed = time.time()
+
+        while True:
+            free = limit - holding - stuck
+            if pending and not aborted and free > 0:
+                batch = pending.next_batch(free)
+                started = time.time()
+                batches.append((batch, started - freed, started, list(released)))
+                for server in batch:
+                    self._start(server, hook, rollback, done)
+                running += len(batch)
+                holding += len(batch)
+
+                if self._pipeline and pending:
+                    pending.prefetch()
+
+            if running == 0:
+                break
+
+            server, res = done.get()
+            if res is None:
+                # Back in rotation while still being verified
+                released.add(server)
+                holding -= 1
+                freed = time.time()
+                continue
+
+            running -= 1
+            finished[server] = time.time()
+            in_rotation = server in released
+            if in_rotation:
+                released.discard(server)
+            else:
+                holding -= 1
+                freed = finished[server]
+
+            results.append(res)
+            if self._callback is not None:
+                self._callback(res)
+
+            if not res.ok:
+                failures += 1
+                if not in_rotation:
+                    stuck += 1
+                aborted = not rollback and failures > self._max_failures
+
+        if pending and not aborted:
+            self._logger.warning(
+                'Failed servers have used up the unavailable budget, %s servers skipped',
+                len(pending))
+
+        metrics = []
+        for batch, gap, started, overlapping in batches:
+            overlap = max([finished.get(server, started) - started
+                           for server in overlapping] + [0])
+            metrics.append(BatchMetrics(batch, gap, overlap))
+        return results, pending.pending, aborted, metrics
+
+    def _start(self, server, hook, rollback, done):
+        """Process a single server in a background thread."""
+        thread = threading.Thread(
+            target=lambda: done.put((server, self._process(server, hook, rollback, done))),
+            name='warthog-rolling-{0}'.format(server))
+        thread.daemon = True
+        thread.start()
+
+    def _process(self, server, hook, rollback, done):
+        """Run every phase for a single server, stopping at the first that fails."""
+        timings = collections.OrderedDict()
+        enabled = []
+        steps = [
+            (PHASE_DISABLE, self._disable),
+            (PHASE_DRAIN, self._drain),
+            (PHASE_DEPLOY, lambda s: self._run_hook(hook, s, PHASE_DEPLOY)),
+            (PHASE_ENABLE, lambda s: enabled.append(self._enable(s))),
+            (PHASE_VERIFY, lambda s: self._verify_enabled(s, done, any(enabled))),
+        ]
+
+        for phase, step in steps:
+            start = time.time()
+            try:
+                step(server)
+            # pylint: disable=broad-except
+            except Exception as e:
+                timings[phase] = time.time() - start
+                self._logger.debug('Rolling deployment of %s failed in %s: %s', server, phase, e)
+                return NodeResult(server, False, phase, e, timings, rollback)
+            timings[phase] = time.time() - start
+
+        return NodeResult(server, True, None, None, timings, rollback)
+
+    def _disable(self, server):
+        if not self._client.disable_server(server, max_retries=0):
+            raise warthog.exceptions.WarthogRollingError(
+                '{0} could not be disabled'.format(server), server=server, phase=PHASE_DISABLE)
+
+    def _drain(self, server):
+        deadline = time.time() + self._drain_timeout
+        while True:
+            conns = self._client.get_connections(server)
+            if conns == 0:
+                return
+            if time.time() >= deadline:
+                raise warthog.exceptions.WarthogRollingError(
+                    '{0} not drained after {1} seconds ({2} connections)'.format(
+                        server, self._drain_timeout, conns), server=server, phase=PHASE_DRAIN)
+            time.sleep(self._interval)
+
+    @staticmethod
+    def _run_hook(hook, server, phase):
+        if hook(server) is False:
+            raise warthog.exceptions.WarthogRollingError(
+                'Hook for {0} failed'.format(server), server=server, phase=phase)
+
+    def _enable(self, server):
+        return self._client.enable_server(server, max_retries=0)
+
+    def _verify_enabled(self, server, done, enabled=False):
+        # The status read when enabling the server is reused instead of read again
+        if not enabled:
+            self._wait_enabled(server)
+        if self._pipeline:
+            done.put((server, None))
+
+        if self._verify is not None:
+            self._run_hook(self._verify, server, PHASE_VERIFY)
+
+    def _wait_enabled(self, server):
+        deadline = time.time() + self._verify_timeout
+        while True:
+            status = self._client.get_status(server)
+            if status == warthog.core.STATUS_ENABLED:
+                break
+            if time.time() >= deadline:
+                raise warthog.exceptions.WarthogRollingError(
+                    '{0} not enabled after {1} seconds ({2})'.format(
+                        server, self._verify_timeout, status), server=server, phase=PHASE_VERIFY)
+            time.sleep(self._interval)
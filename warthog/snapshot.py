@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.snapshot
+~~~~~~~~~~~~~~~~
+
+Reading snapshots of the status and statistics of every server and computing the
+changes between two of them: servers added or removed, status transitions, and
+changes in the number of active connections larger than a threshold.
+"""
+
+import collections
+import csv
+import io
+import threading
+
+import warthog.client
+import warthog.core
+from .packages import six
+
+CHANGE_ADDED = 'added'
+
+CHANGE_REMOVED = 'removed'
+
+CHANGE_STATUS = 'status'
+
+CHANGE_CONNECTIONS = 'connections'
+
+# Simple immutable struct for a single difference between two snapshots: the kind of
+# change and the previous and current value of what changed. For added and removed
+# servers, the values are the status of the server (or None when it isn't known).
+SnapshotChange = collections.namedtuple(
+    'SnapshotChange', ['server', 'kind', 'previous', 'current'])
+
+
+def _connections(node):
+    """Get the number of active connections of a :class:`warthog.client.NodeState`,
+    :class:`warthog.client.NodeStats`, or :class:`warthog.core.SnapshotRow`, or ``None``
+    if it isn't known.
+    """
+    if isinstance(node, (warthog.client.NodeState, warthog.core.SnapshotRow)):
+        return node.connections
+    return node.stats.get('curr-conn')
+
+
+def _delta(previous, current):
+    if previous is None or current is None:
+        return None if previous == current else float('inf')
+    return abs(current - previous)
+
+
+def diff_snapshots(previous, current, threshold=0):
+    """Yield the changes between two snapshots, in order of server name.
+
+    Servers only in one of the snapshots are reported as added or removed without
+    any other changes. Servers in both are compared only by status and number of active
+    connections. Changes in the number of connections are only reported when they are
+    larger than ``threshold``.
+
+    .. versionadded:: 2.0.0
+
+    :param dict previous: Server name to :class:`warthog.client.NodeStats` or
+        :class:`warthog.client.NodeState`, such as returned by
+        :meth:`warthog.client.WarthogClient.get_node_stats` or :func:`load_snapshot`,
+        or a :class:`warthog.core.FleetSnapshot`.
+    :param dict current: Newer snapshot, in the same form as ``previous``.
+    :param int threshold: Min difference in the number of active connections of a
+        server that is reported, exclusive.
+    :return: Generator of changes.
+    :rtype: collections.Iterable[SnapshotChange]
+    """
+    before = set(previous)
+    after = set(current)
+    added = after - before
+    removed = before - after
+
+    for server in sorted(before | after):
+        if server in added:
+            yield SnapshotChange(server, CHANGE_ADDED, None, current[server].status)
+            continue
+        if server in removed:
+            yield SnapshotChange(server, CHANGE_REMOVED, previous[server].status, None)
+            continue
+
+        old, new = previous[server], current[server]
+        if old == new:
+            continue
+        if old.status != new.status:
+            yield SnapshotChange(server, CHANGE_STATUS, old.status, new.status)
+
+        old_conns, new_conns = _connections(old), _connections(new)
+        delta = _delta(old_conns, new_conns)
+        if delta is not None and delta > threshold:
+            yield SnapshotChange(server, CHANGE_CONNECTIONS, old_conns, new_conns)
+
+
+class SnapshotDiffer(object):
+    """Stateful diff of a stream of snapshots for change feeds, each snapshot being
+    compared to the one before it.
+
+    Changes in the number of active connections are compared to the number last
+    reported for the server rather than the previous snapshot so that many small changes
+    each below the threshold are still reported once they add up to more than it.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+
+    def __init__(self, threshold=0, initial=None):
+        """Set the threshold for reporting changes in active connections.
+
+        :param int threshold: Min difference in the number of active connections of a
+            server that is reported, exclusive.
+        :param dict initial: Optional snapshot to compare the first update to. If not
+            given, every server in the first update is reported as added.
+        """
+        self._threshold = threshold
+        self._lock = threading.Lock()
+        self._baseline = dict(initial) if initial is not None else {}
+
+    def update(self, current):
+        """Get the changes since the previous snapshot and remember this one.
+
+        :param dict current: Server name to :class:`warthog.client.NodeStats` or
+            :class:`warthog.client.NodeState`, or a :class:`warthog.core.FleetSnapshot`.
+        :return: Changes, in order of server name.
+        :rtype: list
+        """
+        with self._lock:
+            changes = list(diff_snapshots(self._baseline, current, threshold=self._threshold))
+            reported = set(change.server for change in changes
+                           if change.kind == CHANGE_CONNECTIONS)
+
+            baseline = dict((server, current[server]) for server in current)
+            for server, node in baseline.items():
+                old = self._baseline.get(server)
+                if old is not None and server not in reported:
+                    # Keep the connections last reported so that small changes add up
+                    baseline[server] = _with_connections(node, _connections(old))
+            self._baseline = baseline
+            return changes
+
+
+def _with_connections(node, connections):
+    if isinstance(node, warthog.core.SnapshotRow):
+        return warthog.client.NodeState(node.server, node.status, connections)
+    if isinstance(node, warthog.client.NodeState):
+        return node._replace(connections=connections)
+
+    stats = dict(node.stats)
+    if connections is None:
+        stats.pop('curr-conn', None)
+    else:
+        stats['curr-conn'] = connections
+    return node._replace(stats=stats)
+
+
+def _parse_value(value):
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class _CsvWriter(object):
+    """Write dictionaries as CSV rows, with a header, to a text stream.
+
+    The :mod:`csv` module of Python 2 only writes byte strings, so there each row
+    is written to a buffer with its values encoded as UTF-8 and then decoded again
+    before being written to the stream.
+    """
+
+    def __init__(self, stream, fields):
+        self._stream = stream
+        self._buffer = io.BytesIO() if six.PY2 else io.StringIO()
+        self._writer = csv.DictWriter(self._buffer, fields, lineterminator='\n')
+        self.writerow(dict(zip(fields, fields)))
+
+    def writerow(self, row):
+        if six.PY2:
+            row = dict((_encode(key), _encode(value)) for key, value in row.items())
+
+        self._writer.writerow(row)
+        line = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._stream.write(line.decode('utf-8') if six.PY2 else line)
+
+
+def _encode(value):
+    return value.encode('utf-8') if isinstance(value, six.text_type) else value
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, six.binary_type) else value
+
+
+def _csv_rows(stream):
+    """Read dictionaries from CSV rows, with a header, from a text stream.
+
+    The :mod:`csv` module of Python 2 only reads byte strings, so there each line
+    is encoded as UTF-8 and the values of each row are decoded again.
+    """
+    if not six.PY2:
+        for row in csv.DictReader(stream):
+            yield row
+        return
+
+    for row in csv.DictReader(line.encode('utf-8') for line in stream):
+        yield dict((_decode(key), _decode(value)) for key, value in row.items())
+
+
+def load_snapshot(stream, fmt='ndjson'):
+    """Read a snapshot written by the ``snapshot`` CLI command.
+
+    Server names are interned since the same names are repeated in every snapshot
+    of the same load balancer and compared when computing changes between them.
+
+    .. versionadded:: 2.0.0
+
+    :param stream: Text stream to read from.
+    :param str fmt: Either ``ndjson`` or ``csv``. Values in CSV snapshots that look like
+        numbers are converted to numbers.
+    :return: Dictionary of server name to :class:`warthog.client.NodeStats`.
+    :rtype: dict
+    :raises ValueError: If the format is unknown or a record is not valid JSON.
+    """
+    # pylint: disable=protected-access
+    out = {}
+
+    if fmt == 'csv':
+        for row in _csv_rows(stream):
+            server = warthog.core._intern(row.pop('server'))
+            status = row.pop('status') or None
+            stats = dict((key, _parse_value(value)) for key, value in row.items()
+                         if value != '')
+            out[server] = warthog.client.NodeStats(server, status, stats)
+    elif fmt == 'ndjson':
+        import json
+
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            server = warthog.core._intern(record['server'])
+            out[server] = warthog.client.NodeStats(
+                server, record.get('status'), record.get('stats') or {})
+    else:
+        raise ValueError('Unknown snapshot format: {0}'.format(fmt))
+
+    return out
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.tokens
+~~~~~~~~~~~~~~
+
+Persistent cache of session tokens for reuse between processes, kept in the
+keyring of the operating system when available and a private file otherwise.
+"""
+
+import errno
+import json
+import os
+import os.path
+import stat
+import tempfile
+import threading
+import time
+
+import warthog.core
+
+# pylint: disable=import-error,invalid-name
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import keyring
+    import keyring.errors
+except ImportError:
+    keyring = None
+
+# Default location of the token cache. The file is only readable and writable
+# by the current user.
+DEFAULT_TOKEN_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.warthog')
+
+DEFAULT_TOKEN_CACHE_FILE = os.path.join(DEFAULT_TOKEN_CACHE_DIR, 'tokens')
+
+# Name of the service tokens are stored under in the keyring of the operating system
+KEYRING_SERVICE = 'warthog'
+
+# Sessions on the load balancer expire after being idle for a while (ten
+# minutes by default). Cached tokens that haven't been used for longer than
+# this are assumed to have expired and are not used.
+DEFAULT_TOKEN_TTL = 300.0
+
+
+def _write_private(path, data):
+    """Atomically replace the file at the given path with the given bytes,
+    making sure it is only ever readable by the current user.
+
+    The bytes are written to a new, uniquely named file in the same directory
+    (created exclusively, with mode 0600) which is then renamed over the path so
+    that readers and concurrent writers never see a partially written file.
+    """
+    fd, tmp = tempfile.mkstemp(
+        prefix='.{0}.'.format(os.path.basename(path)), dir=os.path.dirname(path) or '.')
+    try:
+        try:
+            os.fchmod(fd, 0o600)
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        os.rename(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+def _read_private(path):
+    """Read the file at the given path, returning ``None`` if it does not exist
+    or is accessible by users other than the current user.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+
+    try:
+        mode = os.fstat(fd).st_mode
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            warthog.core.get_log().warning(
+                'Ignoring %s since it is accessible by other users', path)
+            return None
+
+        chunks = []
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+    finally:
+        os.close(fd)
+
+
+class _FileLock(object):
+    """Exclusive lock between processes held on a separate lock file next to the
+    file it protects, a no-op on platforms without ``fcntl``.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+
+class TokenCache(object):
+    """Cache of session tokens stored in a file that persists between processes,
+    keyed by load balancer and user.
+
+    When the `keyring <https://pypi.python.org/pypi/keyring>`_ library is installed,
+    tokens are stored in the keyring of the operating system (Keychain on OS X, the
+    Credential Locker on Windows, the Secret Service on Linux) which encrypts them with
+    a key local to the machine and user. The cache file then only holds when each token
+    was last used, so a copy of it (a backup, a bug report) exposes no tokens.
+
+    Without ``keyring``, or if storing a token in the keyring fails, the token is stored
+    as plain JSON in the cache file instead. The file is created with permissions that
+    only allow the current user to read or write it and is ignored if other users can
+    access it, but anyone who can read it (the same user, root, or a copy of it) can use
+    the tokens in it until they expire.
+
+    Updates of the file are written to a temporary file and renamed into place while
+    holding a lock file so that concurrent processes don't lose each other's updates.
+
+    Tokens that haven't been used for longer than the TTL are treated as expired.
+    A token that is still in the cache may have been expired or closed by the load
+    balancer anyway so callers must be prepared for it to be rejected.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, path=None, ttl=DEFAULT_TOKEN_TTL, clock=None, use_keyring=None):
+        """Optionally set the location of the cache file, how long tokens may be idle
+        before they are assumed to have expired, and whether to use the keyring.
+
+        :param str|unicode path: Path of the file to store cached tokens (or when they
+            were last used) in.
+        :param float ttl: Max number of seconds since a token was last used before
+            it is assumed to have expired.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        :param bool use_keyring: ``False`` to always store tokens in the cache file. The
+            default is to use the keyring if the ``keyring`` library is installed.
+        """
+        self._path = path if path is not None else DEFAULT_TOKEN_CACHE_FILE
+        self._ttl = ttl
+        self._use_keyring = keyring is not None and use_keyring is not False
+        self._store_in_keyring = self._use_keyring
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        """Max number of seconds since a token was last used before it is assumed
+        to have expired.
+        """
+        return self._ttl
+
+    @staticmethod
+    def _entry_key(scheme_host, username):
+        return '{0} {1}'.format(scheme_host, username)
+
+    def _store_token(self, key, token):
+        """Store a token in the keyring and return the entry for the cache file, which
+        holds the token itself if the keyring can't be used.
+        """
+        if self._store_in_keyring:
+            try:
+                keyring.set_password(KEYRING_SERVICE, key, token)
+                return {'keyring': True}
+            except keyring.errors.KeyringError as e:
+                # Only warn once, the keyring is unlikely to start working
+                self._store_in_keyring = False
+                self._logger.warning(
+                    'Unable to store token in keyring, using %s instead: %s', self._path, e)
+        return {'token': token}
+
+    def _load_token(self, key, entry):
+        if not entry.get('keyring'):
+            return entry.get('token')
+        if not self._use_keyring:
+            return None
+        try:
+            return keyring.get_password(KEYRING_SERVICE, key)
+        except keyring.errors.KeyringError as e:
+            self._logger.warning('Unable to get token from keyring: %s', e)
+            return None
+
+    def _delete_token(self, key, entry):
+        if not entry.get('keyring') or not self._use_keyring:
+            return
+        try:
+            keyring.delete_password(KEYRING_SERVICE, key)
+        except keyring.errors.KeyringError as e:
+            self._logger.debug('Unable to remove token from keyring: %s', e)
+
+    @staticmethod
+    def _ensure_dir(path):
+        parent = os.path.dirname(path)
+        if parent and not os.path.isdir(parent):
+            try:
+                os.makedirs(parent, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def _load(self):
+        """Load all entries from the cache file, discarding the contents if they
+        can't be parsed.
+        """
+        data = _read_private(self._path)
+        if data is None:
+            return {}
+
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            self._logger.warning('Discarding unreadable token cache %s: %s', self._path, e)
+            return {}
+
+    def _save(self, entries):
+        _write_private(self._path, json.dumps(entries).encode('utf-8'))
+
+    def _update(self):
+        """Lock the cache file against updates from this and other processes."""
+        self._ensure_dir(self._path)
+        return _FileLock(self._path + '.lock')
+
+    def get(self, scheme_host, username):
+        """Get the cached token for the given load balancer and user if there is
+        one and it has not expired.
+
+        :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
+        :param basestring username: Name of the user the token was created for.
+        :return: The cached token or ``None``.
+        :rtype: unicode|None
+        """
+        key = self._entry_key(scheme_host, username)
+        with self._lock:
+            entry = self._load().get(key)
+
+        if entry is None or self._clock() - entry['used'] > self._ttl:
+            return None
+        return self._load_token(key, entry)
+
+    def put(self, scheme_host, username, token):
+        """Store or refresh the last-used time of the token for the given load
+        balancer and user, dropping any expired entries.
+
+        :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
+        :param basestring username: Name of the user the token was created for.
+        :param basestring token: Session token to cache.
+        """
+        now = self._clock()
+        key = self._entry_key(scheme_host, username)
+
+        with self._lock:
+            with self._update():
+                entries = {}
+                for k, v in self._load().items():
+                    if now - v['used'] <= self._ttl:
+                        entries[k] = v
+                    elif k != key:
+                        self._delete_token(k, v)
+
+                entry = self._store_token(key, token)
+                entry['used'] = now
+                entries[key] = entry
+                self._save(entries)
+
+    def remove(self, scheme_host, username):
+        """Remove the token for the given load balancer and user from the cache.
+
+        :param basestring scheme_host: Scheme, host, and port combination of the load balancer.
+        :param basestring username: Name of the user the token was created for.
+        :return: The token that was removed, even if it had expired, or ``None``.
+        :rtype: unicode|None
+        """
+        key = self._entry_key(scheme_host, username)
+        with self._lock:
+            with self._update():
+                entries = self._load()
+                entry = entries.pop(key, None)
+                if entry is None:
+                    return None
+
+                token = self._load_token(key, entry)
+                self._delete_token(key, entry)
+                self._save(entries)
+
+        return token
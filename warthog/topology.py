@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#
+# Warthog - Simple client for A10 load balancers
+#
+# Copyright 2014-2016 Smarter Travel
+#
+# Available under the MIT license. See LICENSE for details.
+#
+
+"""
+warthog.topology
+~~~~~~~~~~~~~~~~
+
+In-memory indexes of the service groups, members, and virtual servers configured
+on a load balancer for answering questions like "which service groups is this
+server in" and "how many other members of them are up" without API requests.
+"""
+
+import collections
+import threading
+import time
+
+import warthog.core
+import warthog.exceptions
+
+# Simple immutable struct for a single member (server and port) of a service group
+Member = collections.namedtuple('Member', ['server', 'port'])
+
+# Simple immutable struct for a single port of a virtual server
+VirtualPort = collections.namedtuple('VirtualPort', ['virtual_server', 'port', 'protocol'])
+
+
+class Topology(object):
+    """Indexes of service groups and their members, the service group behind each
+    virtual server port, and the status of each server, built from a few bulk requests.
+
+    The structure (service groups and virtual servers) changes rarely and is refreshed
+    when it is older than ``max_age`` seconds. The status of servers is refreshed with
+    a single bulk request when it is older than ``status_max_age`` seconds. When the
+    structure is refreshed, only the indexes for service groups that changed are updated.
+
+    Servers claimed with :meth:`claim` are treated as disabled on top of every refresh
+    until the load balancer reports them as disabled or the claim is released, so that
+    a refresh made before a disable request lands doesn't undo the claim. Refreshes are
+    made one at a time and a check and claim are made together under a single lock.
+
+    This class is thread safe.
+
+    .. versionadded:: 2.0.0
+    """
+    _logger = warthog.core.get_log()
+
+    def __init__(self, client, max_age=300.0, status_max_age=5.0, clock=None):
+        """Set the client to fetch the topology with and how long to use it for.
+
+        :param warthog.client.WarthogClient client: Client to fetch the topology with.
+        :param float max_age: Max number of seconds to use service groups and virtual
+            servers for before refreshing them.
+        :param float status_max_age: Max number of seconds to use the status of servers
+            for before refreshing it.
+        :param callable clock: Function to get the current time in seconds. It is
+            typically only necessary to set this parameter for unit testing purposes.
+        """
+        self._client = client
+        self._max_age = max_age
+        self._status_max_age = status_max_age
+        self._clock = clock if clock is not None else time.time
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.RLock()
+
+        self._group_members = {}
+        self._server_groups = collections.defaultdict(set)
+        self._vport_groups = {}
+        self._statuses = {}
+        self._claims = set()
+        self._refreshed = None
+        self._status_refreshed = None
+
+    def refresh(self):
+        """Fetch service groups, virtual servers, and the status of every server,
+        updating the indexes for anything that changed.
+        """
+        with self._refresh_lock:
+            groups = self._client.get_service_groups()
+            vservers = self._client.get_virtual_servers()
+
+            with self._lock:
+                changed = self._apply_groups(groups)
+                self._vport_groups = {}
+                for name, ports in vservers.items():
+                    for port, protocol, group in ports:
+                        self._vport_groups[VirtualPort(name, port, protocol)] = group
+                self._refreshed = self._clock()
+
+            self._logger.debug('Refreshed topology, %s of %s service groups changed',
+                               changed, len(groups))
+            self.refresh_status()
+
+    def _apply_groups(self, groups):
+        """Update the indexes for service groups that were added, removed, or had
+        their members changed and return the number of them.
+        """
+        changed = 0
+        for name in set(self._group_members) - set(groups):
+            self._set_members(name, [])
+            del self._group_members[name]
+            changed += 1
+
+        for name, members in groups.items():
+            members = [Member(server, port) for server, port in members]
+            if self._group_members.get(name) != members:
+                self._set_members(name, members)
+                changed += 1
+        return changed
+
+    def _set_members(self, name, members):
+        for member in self._group_members.get(name, []):
+            self._server_groups[member.server].discard(name)
+            if not self._server_groups[member.server]:
+                del self._server_groups[member.server]
+        for member in members:
+            self._server_groups[member.server].add(name)
+        self._group_members[name] = members
+
+    def refresh_status(self):
+        """Fetch the status of every server with a single bulk request, keeping servers
+        with pending claims disabled until the load balancer reports them as disabled.
+        """
+        with self._refresh_lock:
+            states = self._client.get_node_states()
+            with self._lock:
+                statuses = dict((server, state.status) for server, state in states.items())
+                for server in list(self._claims):
+                    if statuses.get(server) == warthog.core.STATUS_DISABLED:
+                        self._claims.discard(server)
+                    else:
+                        statuses[server] = warthog.core.STATUS_DISABLED
+                self._statuses = statuses
+                self._status_refreshed = self._clock()
+
+    def invalidate_status(self):
+        """Force the status of servers to be refreshed the next time it is needed."""
+        with self._lock:
+            self._status_refreshed = None
+
+    def _ensure_fresh(self):
+        # Checked while holding the refresh lock so that threads waiting on a refresh
+        # in progress use its result instead of each making another one.
+        with self._refresh_lock:
+            now = self._clock()
+            if self._refreshed is None or now - self._refreshed >= self._max_age:
+                self.refresh()
+            elif self._status_refreshed is None or now - self._status_refreshed >= \
+                    self._status_max_age:
+                self.refresh_status()
+
+    def groups(self, server):
+        """Get the names of the service groups a server is a member of.
+
+        :param basestring server: Name of the server.
+        :rtype: list
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return sorted(self._server_groups.get(server, ()))
+
+    def members(self, group):
+        """Get the members of a service group.
+
+        :param basestring group: Name of the service group.
+        :rtype: list
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._group_members.get(group, []))
+
+    def service_group(self, virtual_server, port, protocol):
+        """Get the name of the service group behind a virtual server port, or ``None``.
+
+        :param basestring virtual_server: Name of the virtual server.
+        :param int port: Port number.
+        :param basestring protocol: Protocol of the port, e.g. ``tcp`` or ``http``.
+        :rtype: basestring
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._vport_groups.get(VirtualPort(virtual_server, port, protocol))
+
+    def status(self, server):
+        """Get the most recently known status of a server, or ``None`` if it is unknown.
+
+        :param basestring server: Name of the server.
+        :rtype: basestring
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._statuses.get(server)
+
+    def set_status(self, server, status):
+        """Record a change in the status of a server made by this process so that it
+        is reflected without waiting for the next refresh. Any claim on the server is
+        released.
+
+        :param basestring server: Name of the server.
+        :param basestring status: One of the ``STATUS_*`` constants.
+        """
+        with self._lock:
+            self._claims.discard(server)
+            self._statuses[server] = status
+
+    def _remaining(self, server):
+        out = {}
+        for group in self._server_groups.get(server, ()):
+            others = set(member.server for member in self._group_members[group])
+            others.discard(server)
+            out[group] = len([other for other in others
+                              if self._statuses.get(other) == warthog.core.STATUS_ENABLED])
+        return out
+
+    def remaining_capacity(self, server):
+        """Get the number of other members of each service group the server is in that
+        are up (enabled), for deciding whether it is safe to take the server out of rotation.
+
+        :param basestring server: Name of the server.
+        :return: Dictionary of service group name to number of other members that are up.
+        :rtype: dict
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._remaining(server)
+
+    def claim(self, server, min_available=1):
+        """Check that at least ``min_available`` other members of every service group
+        the server is in are up and, if so, record the server as disabled so that
+        concurrent checks for other servers account for it.
+
+        The claim is kept through refreshes until the load balancer reports the server
+        as disabled or it is released with :meth:`release`.
+
+        :param basestring server: Name of the server about to be disabled.
+        :param int min_available: Min number of other members that must remain up.
+        :raises warthog.exceptions.WarthogCapacityError: If any service group would be
+            left with fewer than ``min_available`` members up.
+        """
+        # Nothing may refresh the status between checking capacity and claiming the server
+        with self._refresh_lock:
+            self._ensure_fresh()
+            with self._lock:
+                short = dict((group, count) for group, count in self._remaining(server).items()
+                             if count < min_available)
+                if short:
+                    raise warthog.exceptions.WarthogCapacityError(
+                        'Disabling {0} would leave fewer than {1} members up in: {2}'.format(
+                            server, min_available, ', '.join(sorted(short))),
+                        server=server, groups=short)
+                self._claims.add(server)
+                self._statuses[server] = warthog.core.STATUS_DISABLED
+
+    def release(self, server):
+        """Release the claim on a server that could not be disabled and force the status
+        of servers to be refreshed the next time it is needed.
+
+        :param basestring server: Name of the server that was claimed.
+        """
+        with self._lock:
+            self._claims.discard(server)
+            self._status_refreshed = None
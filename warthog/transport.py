@@ -37,7 +37,7 @@ DEFAULT_SSL_VERSION = warthog.ssl.PROTOCOL_TLSv1_2
 DEFAULT_CERT_VERIFY = True
 
 
-def get_transport_factory(verify=None, ssl_version=None):
+def get_transport_factory(verify=None, ssl_version=None, shared=False):
     """Get a new callable that returns :class:`requests.Session` instances that
     have been configured according to the given parameters.
 
@@ -52,12 +52,19 @@ def get_transport_factory(verify=None, ssl_version=None):
         Using the requests/urllib3 default is no longer an option. Passing a ``None`` value
         for ``ssl_version`` will result in using the Warthog default (TLS v1).
 
+    .. versionchanged:: 2.0.0
+        Added the optional ``shared`` parameter to reuse a single session (and its
+        pool of connections) for all requests.
+
     :param bool|None verify: Should SSL certificates by verified when connecting
         over HTTPS? Default is ``True``. If you have chosen not to verify certificates
         warnings about this emitted by the requests library will be suppressed.
     :param int|None ssl_version: Explicit version of SSL to use for HTTPS connections
         to an A10 load balancer. The version is a constant as specified by the
         :mod:`ssl` module. The default is TLSv1.
+    :param bool shared: ``True`` to have the callable return the same session instance
+        every time so that connections to the load balancer are kept alive and reused,
+        ``False`` to return a new session each time. Default is ``False``.
     :return: A callable to return new configured session instances for making HTTP(S)
         requests
     :rtype: callable
@@ -84,6 +91,10 @@ def get_transport_factory(verify=None, ssl_version=None):
     if not verify:
         warnings.filterwarnings("ignore", category=InsecureRequestWarning)
 
+    if shared:
+        shared_transport = factory()
+        return lambda: shared_transport
+
     return factory
 
 